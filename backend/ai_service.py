@@ -4,20 +4,43 @@ Provides summarization and text generation features
 """
 from groq import Groq
 from config import Config
+from llm_cache import llm_cache
+from category_classifier import category_classifier
+from scoring import score_ngo
+import json
+
+CATEGORY_LIST = """Education, Health, Environment, Child Welfare, Women Empowerment, Elderly Care, 
+Animal Welfare, Disaster Relief, Social Welfare, Poverty Alleviation"""
 
 class AIService:
+    MODEL = "mixtral-8x7b-32768"
+    
+    # Bump when a prompt changes so cached answers to the old one are not reused
+    SUMMARY_PROMPT_VERSION = 1
+    CATEGORIES_PROMPT_VERSION = 1
+    
+    # Completion tokens reserved per NGO in a batched enrichment prompt
+    BATCH_TOKENS_PER_NGO = 120
+    
     def __init__(self):
         self.client = None
         if Config.GROQ_API_KEY:
-            self.client = Groq(api_key=Config.GROQ_API_KEY)
+            self.client = Groq(api_key=Config.GROQ_API_KEY, base_url=Config.GROQ_BASE_URL)
     
-    def generate_summary(self, text, max_length=150):
+    def generate_summary(self, text, max_length=150, strict=False):
         """
         Generate a concise summary of NGO description
+        With strict=True API errors are raised instead of falling back to
+        the truncated text, so callers can retry.
         """
         if not self.client:
             return text[:max_length] + "..." if len(text) > max_length else text
         
+        cache_key = llm_cache.key(self.MODEL, self.SUMMARY_PROMPT_VERSION, 'summary', text, max_length)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             prompt = f"""Summarize the following NGO description in 2-3 sentences (maximum {max_length} characters).
 Focus on their main mission and impact:
@@ -30,75 +53,120 @@ Summary:"""
                 messages=[
                     {"role": "user", "content": prompt}
                 ],
-                model="mixtral-8x7b-32768",
+                model=self.MODEL,
                 max_tokens=100,
                 temperature=0.3
             )
             
             summary = response.choices[0].message.content.strip()
+            llm_cache.put(cache_key, summary)
             return summary
         
         except Exception as e:
+            if strict:
+                raise
             print(f"AI summarization error: {str(e)}")
             return text[:max_length] + "..." if len(text) > max_length else text
     
-    def suggest_categories(self, mission_text):
+    def suggest_categories(self, mission_text, strict=False):
         """
         Suggest relevant categories based on NGO mission
+        The local classifier answers when it is confident, or whenever no LLM
+        is configured. With strict=True API errors are raised instead of
+        returning [].
         """
+        local, confidence = category_classifier.suggest(mission_text)
+        if local and (confidence >= Config.CLASSIFIER_CONFIDENCE or not self.client):
+            return local
+        
         if not self.client:
             return []
         
+        cache_key = llm_cache.key(self.MODEL, self.CATEGORIES_PROMPT_VERSION, 'categories', mission_text)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            prompt = f"""Based on this NGO mission, suggest 1-3 relevant categories from this list:
-Education, Health, Environment, Child Welfare, Women Empowerment, Elderly Care, 
-Animal Welfare, Disaster Relief, Social Welfare, Poverty Alleviation
-
-Mission: {mission_text}
-
-Return only category names separated by commas:"""
-            
-            response = self.client.chat.completions.create(
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                model="mixtral-8x7b-32768",
-                max_tokens=50,
-                temperature=0.2
-            )
-            
-            categories_text = response.choices[0].message.content.strip()
-            categories = [cat.strip() for cat in categories_text.split(',')]
+            categories = self.ask_categories(mission_text)
+            llm_cache.put(cache_key, categories)
             return categories
         
         except Exception as e:
+            if strict:
+                raise
             print(f"AI category suggestion error: {str(e)}")
             return []
     
-    def calculate_transparency_score(self, ngo):
+    def ask_categories(self, mission_text):
         """
-        Calculate transparency score based on data completeness
+        One uncached LLM call for the categories of a mission
         """
-        score = 0
+        prompt = f"""Based on this NGO mission, suggest 1-3 relevant categories from this list:
+{CATEGORY_LIST}
+
+Mission: {mission_text}
+
+Return only category names separated by commas:"""
         
-        # Basic info (30 points)
-        if ngo.name: score += 5
-        if ngo.mission: score += 10
-        if ngo.description: score += 15
+        response = self.client.chat.completions.create(
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            model=self.MODEL,
+            max_tokens=50,
+            temperature=0.2
+        )
         
-        # Contact info (20 points)
-        if ngo.email: score += 10
-        if ngo.phone: score += 5
-        if ngo.website: score += 5
+        categories_text = response.choices[0].message.content.strip()
+        return [cat.strip() for cat in categories_text.split(',')]
+    
+    def enrich_batch(self, ngos):
+        """
+        Summaries and categories for several NGOs in one call
+        `ngos` is a list of {'id', 'description', 'mission'} dicts. Returns
+        {id: {'summary': ..., 'categories': [...]}} for the NGOs the model
+        answered; raises on API errors and unparseable replies.
+        """
+        prompt = f"""For each NGO below, summarize its description in 2-3 sentences (maximum 150 characters),
+focusing on its main mission and impact, and pick 1-3 relevant categories from this list:
+{CATEGORY_LIST}
+
+NGOs:
+{json.dumps(ngos, ensure_ascii=False)}
+
+Return only a JSON array with one object per NGO, like
+[{{"id": 1, "summary": "...", "categories": ["Education"]}}]"""
         
-        # Location (20 points)
-        if ngo.address: score += 10
-        if ngo.city and ngo.state: score += 10
+        response = self.client.chat.completions.create(
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            model=self.MODEL,
+            max_tokens=self.BATCH_TOKENS_PER_NGO * len(ngos),
+            temperature=0.2
+        )
         
-        # Verification (30 points)
-        if ngo.registration_no: score += 20
-        if ngo.verified: score += 10
+        # Models like to wrap JSON in prose or code fences
+        content = response.choices[0].message.content
+        start, end = content.find('['), content.rfind(']')
+        if start == -1 or end < start:
+            raise ValueError('No JSON array in enrichment reply')
         
-        return min(score, 100)
+        results = {}
+        for item in json.loads(content[start:end + 1]):
+            if isinstance(item, dict) and str(item.get('id', '')).isdigit():
+                results[int(item['id'])] = {
+                    'summary': (item.get('summary') or '').strip(),
+                    'categories': [str(cat).strip() for cat in item.get('categories') or []]
+                }
+        return results
+    
+    def calculate_transparency_score(self, ngo):
+        """
+        Calculate transparency score based on data completeness
+        The rules live in scoring.py, which can also rescore the whole table.
+        """
+        return score_ngo(ngo)
 
 ai_service = AIService()
\ No newline at end of file
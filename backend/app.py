@@ -1,14 +1,30 @@
 """
 Enhanced Flask Application with Blacklist Support
 """
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 from models import db, NGO, Category, User, VolunteerPost, Event, Application, BlacklistRecord
 from config import Config
 from ai_service import ai_service
-import jwt
+from loaders import with_ngo_relationships, with_ngo_fieldset, parse_ngo_fieldset
+from pagination import keyset_paginate
+from search import apply_search
+from autocomplete import autocomplete_index
+from stats import stats_counters, ngo_snapshot, naive_utc
+from geo import map_clusters, parse_bbox, nearest_ngos
+from index_sync import NGOIndexSync
+from http_cache import conditional_response, data_versions, make_etag, latest
+from fragment_cache import render_ngos, stitched_response
+from auth import authenticate, issue_token, revoke_tokens
+from hashing import HashingBusy
+from enrichment import enrichment_queue
+from category_classifier import category_classifier
+from similarity import similar_ngos, IndexNotBuilt
+from ngo_import import NGOImport, READERS, CONTENT_TYPES
+from ngo_export import EXPORT_FORMATS, EXPORT_COLUMNS, EXPORT_RELATIONSHIPS
 from functools import wraps
-from datetime import datetime, timedelta
+from datetime import datetime
+import time
 
 def create_app():
     app = Flask(__name__)
@@ -33,8 +49,7 @@ def token_required(f):
         try:
             if token.startswith('Bearer '):
                 token = token[7:]
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
+            current_user = authenticate(token, app.config['SECRET_KEY'])
             if not current_user:
                 return jsonify({'message': 'User not found'}), 401
         except:
@@ -55,8 +70,7 @@ def admin_required(f):
         try:
             if token.startswith('Bearer '):
                 token = token[7:]
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
+            current_user = authenticate(token, app.config['SECRET_KEY'])
             if not current_user or current_user.role != 'admin':
                 return jsonify({'message': 'Admin access required'}), 403
         except:
@@ -66,8 +80,53 @@ def admin_required(f):
     
     return decorated
 
+def keyset_response(query, per_page, fields=None, include=None):
+    """Serve a page of NGOs in cursor mode (?cursor=&order=name|transparency)"""
+    order = request.args.get('order', 'name')
+    
+    try:
+        ngos, next_cursor = keyset_paginate(query, order, request.args.get('cursor'), per_page)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    extra = {'next_cursor': next_cursor}
+    
+    # Counting the whole filtered set is what cursor mode avoids, so it is opt-in
+    if request.args.get('include_total') == 'true':
+        extra['total'] = query.order_by(None).count()
+    
+    return stitched_response('ngos', render_ngos(ngos, fields, include), **extra)
+
+# Picks up NGO writes other workers and bulk jobs made to the indexes above
+ngo_index_sync = NGOIndexSync(
+    [autocomplete_index, map_clusters, similar_ngos],
+    Config.INDEX_SYNC_SECONDS,
+    Config.INDEX_SYNC_OVERLAP_SECONDS,
+    Config.INDEX_SYNC_MAX_ROWS
+)
+
+def refresh_ngo_indexes(ngo, before=None):
+    """Bring the in-process indexes up to date after an NGO change was committed"""
+    autocomplete_index.update_ngo(ngo)
+    map_clusters.update_ngo(ngo)
+    similar_ngos.update_ngo(ngo)
+    stats_counters.record_ngo_change(before, ngo_snapshot(ngo))
+
+enrichment_queue.init_app(app, on_enriched=refresh_ngo_indexes)
+category_classifier.init_app(app)
+map_clusters.init_app(app)
+
+@app.before_request
+def resume_enrichment():
+    # NGOs a restart left pending; a no-op after the first request of each worker
+    enrichment_queue.resume_pending()
+
 # ============= AUTH ROUTES =============
 
+@app.errorhandler(HashingBusy)
+def hashing_busy(e):
+    return jsonify({'message': 'Too many sign-in attempts right now, please retry shortly'}), 503, {'Retry-After': '1'}
+
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -95,37 +154,39 @@ def login():
     if not user or not user.check_password(data['password']):
         return jsonify({'message': 'Invalid credentials'}), 401
     
-    token = jwt.encode({
-        'user_id': user.id,
-        'exp': datetime.utcnow() + timedelta(days=7)
-    }, app.config['SECRET_KEY'], algorithm='HS256')
+    token = issue_token(user, app.config['SECRET_KEY'])
     
     return jsonify({
         'token': token,
         'user': user.to_dict()
     })
 
+@app.route('/api/auth/logout', methods=['POST'])
+@token_required
+def logout(current_user):
+    # Revokes every token of the user, on all devices
+    user = User.query.get_or_404(current_user.id)
+    revoke_tokens(user)
+    db.session.commit()
+    
+    return jsonify({'message': 'Logged out successfully'})
+
 # ============= NGO ROUTES =============
 
-@app.route('/api/ngos', methods=['GET'])
-def get_ngos():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', Config.ITEMS_PER_PAGE, type=int)
+def apply_ngo_filters(query, args):
+    """Apply the directory filters shared by the NGO listing routes"""
+    category = args.get('category')
+    state = args.get('state')
+    city = args.get('city')
+    district = args.get('district')
+    verified = args.get('verified')
+    exclude_blacklisted = args.get('exclude_blacklisted', 'true') == 'true'
     
-    # Filters
-    category = request.args.get('category')
-    state = request.args.get('state')
-    city = request.args.get('city')
-    district = request.args.get('district')
-    verified = request.args.get('verified')
-    search = request.args.get('search')
-    exclude_blacklisted = request.args.get('exclude_blacklisted', 'true') == 'true'
-    
-    query = NGO.query.filter_by(active=True)
+    query = query.filter(NGO.active == True)
     
     # Exclude blacklisted by default
     if exclude_blacklisted:
-        query = query.filter_by(blacklisted=False)
+        query = query.filter(NGO.blacklisted == False)
     
     if category:
         query = query.join(NGO.categories).filter(Category.slug == category)
@@ -142,29 +203,167 @@ def get_ngos():
     if verified == 'true':
         query = query.filter(NGO.verified == True)
     
+    return query
+
+@app.route('/api/ngos', methods=['GET'])
+def get_ngos():
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', Config.ITEMS_PER_PAGE, type=int)
+    search = request.args.get('search')
+    
+    try:
+        fields, include = parse_ngo_fieldset(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    # Relationships are loaded by render_ngos() for fragments that are not cached
+    query = apply_ngo_filters(with_ngo_fieldset(NGO.query, fields, ()), request.args)
+    
     if search:
-        query = query.filter(
-            db.or_(
-                NGO.name.ilike(f'%{search}%'),
-                NGO.mission.ilike(f'%{search}%'),
-                NGO.description.ilike(f'%{search}%'),
-                NGO.darpan_id.ilike(f'%{search}%')
-            )
-        )
+        # Cursor mode orders by its own sort key, so relevance ranking is skipped there
+        query = apply_search(query, search, rank='cursor' not in request.args)
+    
+    if 'cursor' in request.args:
+        return keyset_response(query, per_page, fields, include)
     
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
+    return stitched_response(
+        'ngos', render_ngos(pagination.items, fields, include),
+        total=pagination.total,
+        pages=pagination.pages,
+        current_page=page
+    )
+
+@app.route('/api/ngos/export', methods=['GET'])
+def export_ngos():
+    """
+    Every NGO matching the get_ngos() filters as CSV or NDJSON (?format=),
+    streamed over a server-side cursor instead of page by page
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'message': 'format must be csv or ndjson'}), 400
+    
+    try:
+        fields, include = parse_ngo_fieldset(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    # By default exactly what the import reads back
+    fields = EXPORT_COLUMNS if fields is None else fields
+    include = EXPORT_RELATIONSHIPS if include is None else include
+    
+    query = apply_ngo_filters(with_ngo_fieldset(NGO.query, fields, include), request.args)
+    
+    search = request.args.get('search')
+    if search:
+        query = apply_search(query, search, rank=False)
+    
+    # yield_per streams rows on Postgres and selectinloads categories per batch
+    query = query.order_by(NGO.id).yield_per(Config.EXPORT_BATCH_SIZE)
+    
+    mimetype, serialize = EXPORT_FORMATS[export_format]
+    return Response(
+        stream_with_context(serialize(query, fields, include)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=ngos.{export_format}'}
+    )
+
+@app.route('/api/ngos/nearby', methods=['GET'])
+def get_nearby_ngos():
+    """
+    NGOs within ?radius_km= of ?lat=&lng=, nearest first
+    Without a radius the search widens until ?k= NGOs are found; either way
+    it stops at NEARBY_MAX_RADIUS_KM
+    """
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    radius_km = request.args.get('radius_km', type=float)
+    k = min(request.args.get('k', Config.ITEMS_PER_PAGE, type=int), Config.NEARBY_MAX_RESULTS)
+    
+    if lat is None or lng is None or not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        return jsonify({'message': 'Valid lat and lng are required'}), 400
+    
+    if radius_km is not None and not radius_km > 0:
+        return jsonify({'message': 'radius_km must be positive'}), 400
+    
+    try:
+        fields, include = parse_ngo_fieldset(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    candidates = apply_ngo_filters(NGO.query, request.args).filter(
+        NGO.latitude.isnot(None),
+        NGO.longitude.isnot(None)
+    ).with_entities(NGO.id, NGO.latitude, NGO.longitude)
+    
+    ids, distances = nearest_ngos(candidates, lat, lng, k, radius_km)
+    
+    ngos = with_ngo_fieldset(NGO.query, fields, include).filter(NGO.id.in_(ids)).all()
+    by_id = {ngo.id: ngo for ngo in ngos}
+    
     return jsonify({
-        'ngos': [ngo.to_dict() for ngo in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page
+        'ngos': [
+            dict(by_id[ngo_id].to_dict(fields, include), distance_km=round(distance, 3))
+            for ngo_id, distance in zip(ids, distances) if ngo_id in by_id
+        ]
+    })
+
+@app.route('/api/ngos/<int:id>/similar', methods=['GET'])
+def get_similar_ngos(id):
+    """Active NGOs whose name, mission and description read most like this one's"""
+    limit = min(request.args.get('limit', 10, type=int), Config.SIMILARITY_MAX_RESULTS)
+    
+    try:
+        fields, include = parse_ngo_fieldset(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    ngo = NGO.query.with_entities(NGO.id, NGO.name, NGO.mission, NGO.description).filter(NGO.id == id).first_or_404()
+    
+    # Over-fetch, since inactive and blacklisted NGOs are dropped below
+    ngo_index_sync.sync_if_stale()
+    try:
+        matches = similar_ngos.similar(ngo, max(limit, 1) * 3)
+    except IndexNotBuilt:
+        return jsonify({'message': 'Similar NGOs are not available yet, the index has not been built'}), 503
+    
+    ngos = with_ngo_fieldset(NGO.query, fields, include).filter(
+        NGO.id.in_([ngo_id for ngo_id, _ in matches]),
+        NGO.active == True,
+        NGO.blacklisted == False
+    ).all()
+    by_id = {ngo.id: ngo for ngo in ngos}
+    
+    return jsonify({
+        'ngos': [
+            dict(by_id[ngo_id].to_dict(fields, include), similarity=round(score, 4))
+            for ngo_id, score in matches if ngo_id in by_id
+        ][:limit],
+        # Some NGO changes are not reflected until similarity.py rebuilds the index
+        'index_behind': similar_ngos.rebuild_due
     })
 
 @app.route('/api/ngos/<int:id>', methods=['GET'])
 def get_ngo(id):
-    ngo = NGO.query.get_or_404(id)
-    return jsonify(ngo.to_dict())
+    try:
+        fields, include = parse_ngo_fieldset(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    # Embedded categories can change without touching the NGO row
+    updated_at = NGO.query.with_entities(NGO.updated_at).filter(NGO.id == id).first_or_404().updated_at
+    (categories_version, categories_updated_at), = data_versions('categories')
+    
+    def build():
+        ngo = with_ngo_fieldset(NGO.query, fields, include).filter(NGO.id == id).first_or_404()
+        return jsonify(ngo.to_dict(fields, include))
+    
+    return conditional_response(
+        make_etag('ngo', id, updated_at, categories_version),
+        latest(updated_at, categories_updated_at),
+        build
+    )
 
 @app.route('/api/ngos', methods=['POST'])
 @token_required
@@ -187,29 +386,69 @@ def create_ngo(current_user):
         verified=False
     )
     
-    # AI-powered features
-    if ngo.description and ai_service.client:
-        ngo.description = ai_service.generate_summary(ngo.description)
-    
-    if ngo.mission and ai_service.client:
-        suggested_cats = ai_service.suggest_categories(ngo.mission)
-        for cat_name in suggested_cats:
-            category = Category.query.filter_by(name=cat_name).first()
-            if category:
-                ngo.categories.append(category)
+    # AI summary and categories are filled in by the enrichment workers
+    if ai_service.client and (ngo.description or ngo.mission):
+        ngo.enrichment_status = 'pending'
+    else:
+        ngo.enrichment_status = 'skipped'
+        # Without an LLM the local classifier still categorizes; a prediction is
+        # cheap, and training never runs here (see category_classifier.py)
+        if ngo.mission:
+            names = ai_service.suggest_categories(ngo.mission)
+            ngo.categories = Category.query.filter(Category.name.in_(names)).all() if names else []
     
     ngo.transparency_score = ai_service.calculate_transparency_score(ngo)
     
     db.session.add(ngo)
     db.session.commit()
+    refresh_ngo_indexes(ngo)
+    
+    if ngo.enrichment_status == 'pending':
+        enrichment_queue.submit(ngo.id)
     
     return jsonify(ngo.to_dict()), 201
 
+@app.route('/api/ngos/import', methods=['POST'])
+@admin_required
+def import_ngos(current_user):
+    """
+    Bulk create or update NGOs from an NDJSON or CSV body (?format=, or the
+    Content-Type), streamed rather than read into memory
+    """
+    import_format = request.args.get('format') or CONTENT_TYPES.get(request.mimetype)
+    if import_format not in READERS:
+        return jsonify({'message': 'format must be ndjson or csv'}), 400
+    
+    start = time.time()
+    ngo_import = NGOImport()
+    ngo_import.run(READERS[import_format](request.stream))
+    report = ngo_import.report(time.time() - start)
+    
+    # Rows were written in bulk: this worker's indexes catch up now, the
+    # others' within INDEX_SYNC_SECONDS, or rebuild if too much changed
+    ngo_index_sync.sync()
+    stats_counters.reconcile()
+    
+    return jsonify(report)
+
+@app.route('/api/ngos/<int:id>/enrichment', methods=['GET'])
+def get_ngo_enrichment(id):
+    row = db.session.query(NGO.enrichment_status, NGO.enrichment_error).filter(NGO.id == id).first()
+    if row is None:
+        return jsonify({'message': 'NGO not found'}), 404
+    
+    return jsonify({
+        'id': id,
+        'status': row.enrichment_status,
+        'error': row.enrichment_error
+    })
+
 @app.route('/api/ngos/<int:id>', methods=['PUT'])
 @admin_required
 def update_ngo(current_user, id):
     ngo = NGO.query.get_or_404(id)
     data = request.get_json()
+    before = ngo_snapshot(ngo)
     
     for key, value in data.items():
         if hasattr(ngo, key):
@@ -218,14 +457,17 @@ def update_ngo(current_user, id):
     ngo.transparency_score = ai_service.calculate_transparency_score(ngo)
     
     db.session.commit()
+    refresh_ngo_indexes(ngo, before)
     return jsonify(ngo.to_dict())
 
 @app.route('/api/ngos/<int:id>/verify', methods=['POST'])
 @admin_required
 def verify_ngo(current_user, id):
     ngo = NGO.query.get_or_404(id)
+    before = ngo_snapshot(ngo)
     ngo.verified = True
     db.session.commit()
+    refresh_ngo_indexes(ngo, before)
     return jsonify({'message': 'NGO verified successfully'})
 
 # ============= BLACKLIST ROUTES =============
@@ -240,7 +482,12 @@ def get_blacklisted_ngos():
     blacklisted_by = request.args.get('blacklisted_by')
     search = request.args.get('search')
     
-    query = NGO.query.filter_by(blacklisted=True)
+    try:
+        fields, include = parse_ngo_fieldset(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    query = with_ngo_fieldset(NGO.query.filter_by(blacklisted=True), fields, ())
     
     if state:
         query = query.filter(NGO.state.ilike(f'%{state}%'))
@@ -258,20 +505,24 @@ def get_blacklisted_ngos():
             )
         )
     
+    if 'cursor' in request.args:
+        return keyset_response(query, per_page, fields, include)
+    
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
-    return jsonify({
-        'ngos': [ngo.to_dict() for ngo in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page
-    })
+    return stitched_response(
+        'ngos', render_ngos(pagination.items, fields, include),
+        total=pagination.total,
+        pages=pagination.pages,
+        current_page=page
+    )
 
 @app.route('/api/ngos/<int:id>/blacklist', methods=['POST'])
 @admin_required
 def blacklist_ngo(current_user, id):
     ngo = NGO.query.get_or_404(id)
     data = request.get_json()
+    before = ngo_snapshot(ngo)
     
     ngo.blacklisted = True
     
@@ -287,6 +538,7 @@ def blacklist_ngo(current_user, id):
     
     db.session.add(blacklist_record)
     db.session.commit()
+    refresh_ngo_indexes(ngo, before)
     
     return jsonify({'message': 'NGO blacklisted successfully'})
 
@@ -294,6 +546,7 @@ def blacklist_ngo(current_user, id):
 @admin_required
 def unblacklist_ngo(current_user, id):
     ngo = NGO.query.get_or_404(id)
+    before = ngo_snapshot(ngo)
     ngo.blacklisted = False
     
     # Remove blacklist record
@@ -301,14 +554,20 @@ def unblacklist_ngo(current_user, id):
         db.session.delete(ngo.blacklist_info)
     
     db.session.commit()
+    refresh_ngo_indexes(ngo, before)
     return jsonify({'message': 'NGO removed from blacklist'})
 
 # ============= CATEGORY ROUTES =============
 
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
-    categories = Category.query.all()
-    return jsonify([cat.to_dict() for cat in categories])
+    (version, updated_at), = data_versions('categories')
+    
+    def build():
+        categories = Category.query.all()
+        return jsonify([cat.to_dict() for cat in categories])
+    
+    return conditional_response(make_etag('categories', version), updated_at, build)
 
 # ============= VOLUNTEER ROUTES =============
 
@@ -339,6 +598,7 @@ def create_volunteer_post(current_user):
     
     db.session.add(post)
     db.session.commit()
+    stats_counters.record_volunteer_post(post)
     
     return jsonify(post.to_dict()), 201
 
@@ -364,24 +624,73 @@ def create_event(current_user):
         ngo_id=data['ngo_id'],
         title=data['title'],
         description=data.get('description'),
-        event_date=datetime.fromisoformat(data['event_date']),
+        event_date=naive_utc(datetime.fromisoformat(data['event_date'])),
         location=data.get('location'),
         registration_link=data.get('registration_link')
     )
     
     db.session.add(event)
     db.session.commit()
+    stats_counters.record_event(event)
     
     return jsonify(event.to_dict()), 201
 
 # ============= MAP DATA ROUTE =============
 
+def map_point(ngo):
+    return {
+        'id': ngo.id,
+        'name': ngo.name,
+        'lat': ngo.latitude,
+        'lng': ngo.longitude,
+        'city': ngo.city,
+        'state': ngo.state,
+        'verified': ngo.verified,
+        'blacklisted': ngo.blacklisted,
+        'categories': [cat.name for cat in ngo.categories]
+    }
+
 @app.route('/api/ngos/map', methods=['GET'])
 def get_ngos_map_data():
-    """Get NGOs with coordinates for map display"""
+    """
+    Get NGOs with coordinates for map display
+    With ?zoom= the response is {clusters, points}: grid clusters below
+    MAP_CLUSTER_MAX_ZOOM (503 while they are first built), individual NGOs
+    inside the required ?bbox= from there on
+    """
     exclude_blacklisted = request.args.get('exclude_blacklisted', 'true') == 'true'
+    zoom = request.args.get('zoom', type=int)
+    
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    if zoom is not None and zoom < Config.MAP_CLUSTER_MAX_ZOOM:
+        ngo_index_sync.sync_if_stale()
+        map_clusters.build_in_background()
+        if not map_clusters.loaded:
+            return jsonify({'message': 'Map clusters are being built, please retry shortly'}), 503, {'Retry-After': '5'}
+    elif zoom is not None and bbox is None:
+        # Individual NGOs are only listed for the visible part of the map
+        return jsonify({'message': f'bbox is required from zoom {Config.MAP_CLUSTER_MAX_ZOOM} on'}), 400
+    
+    (ngos_version, ngos_updated_at), (categories_version, categories_updated_at) = data_versions('ngos', 'categories')
+    
+    return conditional_response(
+        make_etag('map', ngos_version, categories_version),
+        latest(ngos_updated_at, categories_updated_at),
+        lambda: build_map_data(exclude_blacklisted, zoom, bbox)
+    )
+
+def build_map_data(exclude_blacklisted, zoom, bbox):
+    if zoom is not None and zoom < Config.MAP_CLUSTER_MAX_ZOOM:
+        return jsonify({
+            'clusters': map_clusters.clusters(zoom, bbox, include_blacklisted=not exclude_blacklisted),
+            'points': []
+        })
     
-    query = NGO.query.filter(
+    query = with_ngo_relationships(NGO.query, ('categories',)).filter(
         NGO.active == True,
         NGO.latitude.isnot(None),
         NGO.longitude.isnot(None)
@@ -390,21 +699,17 @@ def get_ngos_map_data():
     if exclude_blacklisted:
         query = query.filter(NGO.blacklisted == False)
     
-    ngos = query.all()
-    
-    map_data = []
-    for ngo in ngos:
-        map_data.append({
-            'id': ngo.id,
-            'name': ngo.name,
-            'lat': ngo.latitude,
-            'lng': ngo.longitude,
-            'city': ngo.city,
-            'state': ngo.state,
-            'verified': ngo.verified,
-            'blacklisted': ngo.blacklisted,
-            'categories': [cat.name for cat in ngo.categories]
-        })
+    if bbox:
+        west, south, east, north = bbox
+        query = query.filter(
+            NGO.longitude.between(west, east),
+            NGO.latitude.between(south, north)
+        )
+    
+    map_data = [map_point(ngo) for ngo in query.all()]
+    
+    if zoom is not None:
+        return jsonify({'clusters': [], 'points': map_data})
     
     return jsonify(map_data)
 
@@ -412,46 +717,16 @@ def get_ngos_map_data():
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    total_ngos = NGO.query.filter_by(active=True, blacklisted=False).count()
-    verified_ngos = NGO.query.filter_by(active=True, verified=True, blacklisted=False).count()
-    blacklisted_ngos = NGO.query.filter_by(blacklisted=True).count()
-    total_volunteers = VolunteerPost.query.join(NGO).filter(
-        VolunteerPost.active == True,
-        NGO.blacklisted == False
-    ).count()
-    upcoming_events = Event.query.join(NGO).filter(
-        Event.event_date >= datetime.utcnow(),
-        NGO.blacklisted == False
-    ).count()
-    
-    # NGOs by category (excluding blacklisted)
-    categories_data = []
-    for category in Category.query.all():
-        count = len([ngo for ngo in category.ngos if ngo.active and not ngo.blacklisted])
-        if count > 0:
-            categories_data.append({
-                'name': category.name,
-                'count': count
-            })
-    
-    # NGOs by state (excluding blacklisted)
-    states_data = db.session.query(
-        NGO.state, db.func.count(NGO.id)
-    ).filter(
-        NGO.active == True,
-        NGO.blacklisted == False,
-        NGO.state.isnot(None)
-    ).group_by(NGO.state).all()
+    versions = data_versions('ngos', 'categories', 'events', 'volunteer_posts')
     
-    return jsonify({
-        'total_ngos': total_ngos,
-        'verified_ngos': verified_ngos,
-        'blacklisted_ngos': blacklisted_ngos,
-        'total_volunteers': total_volunteers,
-        'upcoming_events': upcoming_events,
-        'categories': categories_data,
-        'states': [{'name': state, 'count': count} for state, count in states_data]
-    })
+    # Upcoming events expire with time, so the tag also rolls over every reconcile period
+    period = int(time.time() // Config.STATS_RECONCILE_SECONDS)
+    
+    def build():
+        stats_counters.reconcile_if_stale(versions)
+        return jsonify(stats_counters.to_dict())
+    
+    return conditional_response(make_etag('stats', versions, period), None, build)
 
 # ============= SEARCH ROUTE =============
 
@@ -462,19 +737,32 @@ def search():
     if not query_text:
         return jsonify({'results': []})
     
-    ngos = NGO.query.filter(
-        db.or_(
-            NGO.name.ilike(f'%{query_text}%'),
-            NGO.mission.ilike(f'%{query_text}%'),
-            NGO.description.ilike(f'%{query_text}%'),
-            NGO.darpan_id.ilike(f'%{query_text}%')
-        ),
+    try:
+        fields, include = parse_ngo_fieldset(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    query = with_ngo_fieldset(NGO.query, fields, ()).filter(
         NGO.active == True,
         NGO.blacklisted == False
-    ).limit(10).all()
+    )
+    ngos = apply_search(query, query_text).limit(10).all()
+    
+    return stitched_response('results', render_ngos(ngos, fields, include))
+
+@app.route('/api/autocomplete', methods=['GET'])
+def autocomplete():
+    query_text = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    
+    # Built on first use per worker, then kept current by the write routes
+    # and by catching up with writes made elsewhere
+    ngo_index_sync.sync_if_stale()
+    if not autocomplete_index.loaded:
+        autocomplete_index.rebuild()
     
     return jsonify({
-        'results': [ngo.to_dict() for ngo in ngos]
+        'results': autocomplete_index.lookup(query_text, limit)
     })
 
 if __name__ == '__main__':
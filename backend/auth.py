@@ -0,0 +1,117 @@
+"""
+JWT issuing and verification
+Tokens carry the user's role and token version. A TTL-bounded in-process
+cache of every user's current (role, token version) lets the auth decorators
+verify requests without a database round-trip; bumping a user's token
+version revokes every token issued before it.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+import jwt
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, User
+from config import Config
+
+class ClaimsCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # user id -> (role, token version, expires at)
+        self._purge_at = time.monotonic() + ttl
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None or entry[2] < time.monotonic():
+            return None
+        return entry[:2]
+
+    def put(self, user_id, role, token_version):
+        now = time.monotonic()
+        with self._lock:
+            # Expired entries are swept once per TTL, so the cache only holds
+            # users seen in the last two TTLs however many sign in over time
+            if now >= self._purge_at:
+                self._entries = {key: entry for key, entry in self._entries.items() if entry[2] >= now}
+                self._purge_at = now + self.ttl
+            self._entries[user_id] = (role, token_version, now + self.ttl)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+claims_cache = ClaimsCache(Config.AUTH_CACHE_TTL_SECONDS)
+
+class AuthenticatedUser:
+    """What the auth decorators hand to a route instead of a loaded User"""
+    __slots__ = ('id', 'role')
+
+    def __init__(self, id, role):
+        self.id = id
+        self.role = role
+
+def issue_token(user, secret_key):
+    return jwt.encode({
+        'user_id': user.id,
+        'role': user.role,
+        'ver': user.token_version or 0,
+        'exp': datetime.utcnow() + timedelta(days=7)
+    }, secret_key, algorithm='HS256')
+
+def current_claims(user_id):
+    """(role, token version) of a user, from the cache or one small query"""
+    claims = claims_cache.get(user_id)
+    if claims is None:
+        row = db.session.query(User.role, User.token_version).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        claims = (row.role, row.token_version or 0)
+        claims_cache.put(user_id, *claims)
+    return claims
+
+def authenticate(token, secret_key):
+    """
+    Verify a token; returns None for unknown users and raises
+    jwt.InvalidTokenError for bad or revoked tokens
+    """
+    data = jwt.decode(token, secret_key, algorithms=['HS256'])
+    claims = current_claims(data['user_id'])
+    if claims is None:
+        return None
+
+    role, token_version = claims
+    if data.get('ver', 0) != token_version:
+        raise jwt.InvalidTokenError('Token has been revoked')
+
+    # The cached role wins over the one in the token so demotions apply before expiry
+    return AuthenticatedUser(data['user_id'], role)
+
+def revoke_tokens(user):
+    """Invalidate every token issued to a user so far (commit to apply)"""
+    user.token_version = (user.token_version or 0) + 1
+
+# Forget cached claims of users whose role or token version was committed in
+# this process; other workers pick the change up within AUTH_CACHE_TTL_SECONDS
+@event.listens_for(Session, 'before_flush')
+def _collect_users(session, flush_context, instances):
+    changed = session.info.setdefault('changed_users', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.id)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_users(session):
+    for user_id in session.info.pop('changed_users', ()):
+        claims_cache.invalidate(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_users(session):
+    session.info.pop('changed_users', None)
@@ -0,0 +1,114 @@
+"""
+Typeahead index for NGO names, DARPAN IDs and locations
+Keeps normalized labels in a sorted in-memory array and answers prefix
+queries with bisect, so lookups never touch the database
+"""
+import bisect
+import threading
+from models import NGO
+
+# Location suggestions are shared by every NGO in that place
+LOCATION_FIELDS = ('state', 'city', 'district')
+
+# Entries are (normalized label, type, label, ngo id); locations use id 0
+LOCATION_ID = 0
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = []        # sorted entries
+        self._ngo_entries = {}    # ngo id -> entries contributed by that NGO
+        self._location_refs = {}  # location entry -> number of NGOs there
+        self.loaded = False
+
+    def _entries_for(self, ngo):
+        if not ngo.active or ngo.blacklisted:
+            return []
+
+        entries = [(normalize(ngo.name), 'ngo', ngo.name, ngo.id)]
+        if ngo.darpan_id:
+            entries.append((normalize(ngo.darpan_id), 'darpan_id', ngo.darpan_id, ngo.id))
+        for field in LOCATION_FIELDS:
+            value = (getattr(ngo, field) or '').strip()
+            if value:
+                entries.append((normalize(value), field, value, LOCATION_ID))
+        return entries
+
+    def _add(self, entry):
+        if entry[3] == LOCATION_ID:
+            self._location_refs[entry] = self._location_refs.get(entry, 0) + 1
+            if self._location_refs[entry] > 1:
+                return
+        bisect.insort(self._entries, entry)
+
+    def _discard(self, entry):
+        if entry[3] == LOCATION_ID:
+            self._location_refs[entry] -= 1
+            if self._location_refs[entry] > 0:
+                return
+            del self._location_refs[entry]
+
+        position = bisect.bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+    def rebuild(self):
+        """Build the index from the database (needs an app context)"""
+        rows = NGO.query.filter(NGO.active == True, NGO.blacklisted == False).with_entities(
+            NGO.id, NGO.name, NGO.darpan_id, NGO.state, NGO.city, NGO.district,
+            NGO.active, NGO.blacklisted
+        ).yield_per(10000)
+
+        ngo_entries, location_refs = {}, {}
+        for row in rows:
+            entries = self._entries_for(row)
+            ngo_entries[row.id] = entries
+            for entry in entries:
+                if entry[3] == LOCATION_ID:
+                    location_refs[entry] = location_refs.get(entry, 0) + 1
+
+        sorted_entries = sorted(
+            [entry for owned in ngo_entries.values() for entry in owned if entry[3] != LOCATION_ID]
+            + list(location_refs)
+        )
+
+        with self._lock:
+            self._entries, self._ngo_entries, self._location_refs = sorted_entries, ngo_entries, location_refs
+            self.loaded = True
+
+    def mark_stale(self):
+        """Rebuild from the database on next use"""
+        self.loaded = False
+
+    def update_ngo(self, ngo):
+        """Re-index an NGO after it was created or changed"""
+        entries = self._entries_for(ngo)
+        with self._lock:
+            for entry in self._ngo_entries.pop(ngo.id, []):
+                self._discard(entry)
+            for entry in entries:
+                self._add(entry)
+            if entries:
+                self._ngo_entries[ngo.id] = entries
+
+    def lookup(self, prefix, limit=10):
+        """Return up to `limit` suggestions whose label starts with `prefix`"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        results = []
+        with self._lock:
+            position = bisect.bisect_left(self._entries, (prefix,))
+            while position < len(self._entries) and len(results) < limit:
+                text, kind, label, ngo_id = self._entries[position]
+                if not text.startswith(prefix):
+                    break
+                results.append({'id': ngo_id or None, 'label': label, 'type': kind})
+                position += 1
+        return results
+
+autocomplete_index = PrefixIndex()
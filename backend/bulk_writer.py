@@ -0,0 +1,339 @@
+"""
+Batched NGO writer for the scrapers
+Buffers scraped records and writes each batch in a handful of statements:
+an INSERT ... ON CONFLICT DO UPDATE per natural key (darpan_id, then
+registration_no), a name lookup for records that carry neither, and one
+bulk insert into ngo_categories resolved from a cached category map. A
+batch that fails is rolled back and retried row by row so one bad record
+only loses itself. Given a FetchStateStore, records whose content did not
+change since the last run are dropped before they reach the database, and
+the state of a source page is only saved once every record on it is.
+StagedNGOWriter does the keyed upserts on Postgres by COPYing each batch into
+a temporary staging table and merging from there.
+"""
+import csv
+import io
+from datetime import datetime
+from sqlalchemy import func, or_, bindparam, select, Table, Column, MetaData
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, NGO, Category, ngo_categories
+from http_cache import mark_changed
+from scoring import rescore_ids
+from config import Config
+
+# NGO columns a scraped record may set
+SCRAPED_FIELDS = (
+    'name', 'registration_no', 'darpan_id', 'mission', 'description',
+    'founded_year', 'email', 'phone', 'website', 'address', 'city', 'state',
+    'district', 'latitude', 'longitude', 'registered_with', 'registration_date',
+    'act_name', 'type_of_ngo'
+)
+
+# NGO columns a record may set only when it creates the NGO
+INSERT_ONLY_FIELDS = ('enrichment_status',)
+
+# Natural keys an upsert can conflict on, in order of preference
+NGO_KEYS = ('darpan_id', 'registration_no')
+
+_DIALECT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+class UnsupportedDialect(RuntimeError):
+    """The database has no INSERT ... ON CONFLICT the bulk writers can use"""
+
+def dialect_insert(table):
+    """An INSERT that supports ON CONFLICT on the current database"""
+    dialect = db.engine.dialect.name
+    if dialect not in _DIALECT_INSERTS:
+        raise UnsupportedDialect(f'Bulk upserts are not supported on {dialect}')
+    return _DIALECT_INSERTS[dialect](table)
+
+def record_key(ngo_data):
+    """(column, value) that identifies a scraped NGO: its first natural key, else its name"""
+    key = next((key for key in NGO_KEYS if ngo_data.get(key)), 'name')
+    return key, ngo_data.get(key)
+
+class NGOBatchWriter:
+    def __init__(self, batch_size=Config.SCRAPER_BATCH_SIZE, fetch_state=None, on_error=None):
+        self.batch_size = batch_size
+        self.fetch_state = fetch_state
+        self.on_error = on_error  # on_error(ngo_data, exception) for records that could not be saved
+        self.saved = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.flushes = 0
+        self._buffer = []
+        self._pages = []            # pages with records in the buffer, see add_page()
+        self._committed_pages = []  # pages written since the last take_committed_pages()
+        self._category_ids = None
+
+    def add(self, ngo_data, source):
+        """Queue one scraped NGO; writes a batch once enough are buffered"""
+        self._queue(ngo_data, source, None)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def add_page(self, page, records, source):
+        """
+        Queue every NGO of one source page; the page's fetch state staged in
+        the FetchStateStore is saved only once all of them are committed
+        """
+        self._pages.append(page)
+        for ngo_data in records:
+            self._queue(ngo_data, source, page)
+        # A page is never split over two batches
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def take_committed_pages(self):
+        """Pages whose records and fetch state have been committed since the last call"""
+        pages, self._committed_pages = self._committed_pages, []
+        return pages
+
+    def _queue(self, ngo_data, source, page):
+        state = None
+        if self.fetch_state is not None:
+            # Records identical to what the last run wrote are skipped
+            state_key = '{}|{}={}'.format(source, *record_key(ngo_data))
+            digest = self.fetch_state.changed(state_key, ngo_data)
+            if digest is None:
+                self.unchanged += 1
+                return
+            state = (state_key, digest)
+        self._buffer.append((ngo_data, source, state, page))
+
+    def flush(self):
+        """Write everything buffered so far, with the fetch state of its pages"""
+        batch, self._buffer = self._buffer, []
+        pages, self._pages = self._pages, []
+        if not batch and not pages:
+            return
+        self.flushes += 1
+
+        try:
+            self._write(batch, pages)
+            db.session.commit()
+            self._committed(batch, pages)
+            return
+        except UnsupportedDialect:
+            # Every row would fail the same way
+            db.session.rollback()
+            raise
+        except Exception as e:
+            db.session.rollback()
+            print(f"Batch of {len(batch)} NGOs failed ({str(e)}), retrying one by one...")
+
+        # Each page's state goes in with its last record, unless one of its records failed
+        remaining = dict.fromkeys(pages, 0)
+        for item in batch:
+            if item[3] is not None:
+                remaining[item[3]] += 1
+        failed_pages = set()
+
+        empty = [page for page, count in remaining.items() if count == 0]
+        if empty:
+            try:
+                self._write([], empty)
+                db.session.commit()
+                self._committed([], empty)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error saving page state: {str(e)}")
+                failed_pages.update(empty)
+
+        for item in batch:
+            page = item[3]
+            done = []
+            if page is not None:
+                remaining[page] -= 1
+                if remaining[page] == 0 and page not in failed_pages:
+                    done = [page]
+            try:
+                self._write([item], done)
+                db.session.commit()
+                self._committed([item], done)
+            except Exception as e:
+                db.session.rollback()
+                self.failed += 1
+                print(f"Error saving NGO {item[0].get('name')}: {str(e)}")
+                if page is not None:
+                    failed_pages.add(page)
+                if self.on_error is not None:
+                    self.on_error(item[0], e)
+
+        if self.fetch_state is not None:
+            for page in failed_pages:
+                self.fetch_state.discard(page)
+
+    def _committed(self, batch, pages=()):
+        self.saved += len(batch)
+        self._committed_pages.extend(pages)
+        if self.fetch_state is not None:
+            self.fetch_state.committed([item[2] for item in batch if item[2] is not None], pages)
+
+    def category_ids(self):
+        """Category name -> id, loaded once per writer"""
+        if self._category_ids is None:
+            self._category_ids = dict(db.session.query(Category.name, Category.id).all())
+        return self._category_ids
+
+    def _write(self, batch, pages=()):
+        if batch:
+            self._write_ngos(batch)
+
+        # Fetch state commits with the rows it describes
+        if self.fetch_state is not None:
+            self.fetch_state.save([item[2] for item in batch if item[2] is not None], pages)
+
+    def _write_ngos(self, batch):
+        now = datetime.utcnow()
+
+        # Postgres refuses to upsert the same row twice in one statement, so
+        # collapse duplicates within the batch; the last record wins
+        groups = {key: {} for key in NGO_KEYS + ('name',)}
+        categories = {}
+        for ngo_data, source, _, _ in batch:
+            row = {field: ngo_data.get(field) for field in SCRAPED_FIELDS + INSERT_ONLY_FIELDS}
+            row.update(source=source, scraped_at=now, updated_at=now)
+
+            key, value = record_key(row)
+            groups[key][value] = row
+            categories.setdefault((key, value), set()).update(ngo_data.get('categories') or ())
+
+        ids = {}
+        for key in NGO_KEYS:
+            if groups[key]:
+                for ngo_id, value in self._upsert(list(groups[key].values()), key):
+                    ids[(key, value)] = ngo_id
+        if groups['name']:
+            for ngo_id, name in self._save_by_name(groups['name']):
+                ids[('name', name)] = ngo_id
+
+        category_ids = self.category_ids()
+        links = [
+            {'ngo_id': ids[record], 'category_id': category_ids[name]}
+            for record, names in categories.items()
+            for name in names if name in category_ids and record in ids
+        ]
+        if links:
+            db.session.execute(dialect_insert(ngo_categories).on_conflict_do_nothing(), links)
+
+        mark_changed(db.session, {'ngos'})
+        rescore_ids(ids.values())
+
+    def _upsert(self, rows, key):
+        """Insert or update rows on a unique key; returns (id, key value) pairs"""
+        table = NGO.__table__
+        stmt = self._on_conflict_update(dialect_insert(table), key)
+        saved = db.session.execute(stmt.returning(table.c.id, table.c[key]), rows).all()
+        return self._with_unchanged(saved, rows, key)
+
+    def _on_conflict_update(self, stmt, key):
+        table = NGO.__table__
+
+        # Fields missing from a scrape leave what is already stored alone
+        updates = {
+            field: func.coalesce(stmt.excluded[field], table.c[field])
+            for field in SCRAPED_FIELDS if field != key
+        }
+        updates['source'] = stmt.excluded.source
+
+        # Rows whose fields all match are left alone, keeping their updated_at
+        changed = or_(*[table.c[field].is_distinct_from(value) for field, value in updates.items()])
+        updates.update(scraped_at=stmt.excluded.scraped_at, updated_at=stmt.excluded.updated_at)
+
+        return stmt.on_conflict_do_update(index_elements=[table.c[key]], set_=updates, where=changed)
+
+    def _with_unchanged(self, saved, rows, key):
+        # Rows skipped by the WHERE are not returned, but still need their ids
+        table = NGO.__table__
+        missing = {row[key] for row in rows} - {value for _, value in saved}
+        if missing:
+            column = table.c[key]
+            saved += db.session.query(table.c.id, column).filter(column.in_(missing)).all()
+        return saved
+
+    def _save_by_name(self, rows_by_name):
+        """Records without a registration key are matched on name, as before"""
+        table = NGO.__table__
+        existing = dict(
+            db.session.query(NGO.name, func.min(NGO.id))
+            .filter(NGO.name.in_(list(rows_by_name)))
+            .group_by(NGO.name)
+            .all()
+        )
+
+        saved = [(ngo_id, name) for name, ngo_id in existing.items()]
+        fields = SCRAPED_FIELDS + ('source',)
+        updates = [
+            dict({f'new_{field}': rows_by_name[name][field] for field in fields + ('scraped_at',)}, ngo_id=ngo_id)
+            for name, ngo_id in existing.items()
+        ]
+        if updates:
+            values = {field: func.coalesce(bindparam(f'new_{field}'), table.c[field]) for field in fields}
+            changed = or_(*[table.c[field].is_distinct_from(value) for field, value in values.items()])
+            values.update(scraped_at=bindparam('new_scraped_at'), updated_at=bindparam('new_scraped_at'))
+            stmt = table.update().where(table.c.id == bindparam('ngo_id'), changed).values(values)
+            db.session.execute(stmt, updates)
+
+        new_rows = [row for name, row in rows_by_name.items() if name not in existing]
+        if new_rows:
+            stmt = dialect_insert(table).returning(table.c.id, table.c.name)
+            saved += db.session.execute(stmt, new_rows).all()
+        return saved
+
+class StagedNGOWriter(NGOBatchWriter):
+    """
+    NGOBatchWriter for large imports: on Postgres each keyed batch is COPYed
+    into a session-local staging table and merged with one INSERT ... SELECT
+    ... ON CONFLICT, instead of going through executemany. Other databases
+    use the plain batched upsert.
+    """
+    STAGED_FIELDS = SCRAPED_FIELDS + INSERT_ONLY_FIELDS + ('source', 'scraped_at', 'updated_at')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        ngo_columns = NGO.__table__.c
+        self._staging = Table(
+            'ngo_import_staging', MetaData(),
+            *[Column(field, ngo_columns[field].type) for field in self.STAGED_FIELDS],
+            prefixes=['TEMPORARY'], postgresql_on_commit='DROP'
+        )
+
+    def _upsert(self, rows, key):
+        if db.engine.dialect.name != 'postgresql':
+            return super()._upsert(rows, key)
+
+        # The table lives until the commit, so each keyed group starts afresh
+        connection = db.session.connection()
+        connection.execute(CreateTable(self._staging, if_not_exists=True))
+        connection.execute(self._staging.delete())
+        self._copy(connection, rows)
+
+        table = NGO.__table__
+        stmt = dialect_insert(table).from_select(
+            list(self.STAGED_FIELDS), select(*[self._staging.c[field] for field in self.STAGED_FIELDS])
+        )
+        stmt = self._on_conflict_update(stmt, key)
+        saved = connection.execute(stmt.returning(table.c.id, table.c[key])).all()
+        return self._with_unchanged(saved, rows, key)
+
+    def _copy(self, connection, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        for row in rows:
+            # In COPY's CSV format an unquoted empty field is NULL
+            writer.writerow(['' if row[field] is None else row[field] for field in self.STAGED_FIELDS])
+        buffer.seek(0)
+
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {self._staging.name} ({', '.join(self.STAGED_FIELDS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
@@ -0,0 +1,289 @@
+"""
+Local category classifier
+A multinomial naive Bayes model over hashed bag-of-words features (see
+text_features.py), trained from the existing ngo_categories assignments.
+Scoring is a single matrix product, so one mission classifies in well under
+a millisecond and a whole table goes through in passes of CHUNK_SIZE NGOs.
+AIService.suggest_categories asks it first and only calls the LLM when the
+model is unsure, or not at all when no Groq key is configured. Training
+reads the whole table, so it never runs on a request: requests use the last
+published weights and start a background retrain when they are due one.
+
+    python category_classifier.py --benchmark   # accuracy and latency against the LLM
+    python category_classifier.py --apply       # categorize NGOs that have none
+"""
+import argparse
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+from models import db, NGO, Category, ngo_categories
+from text_features import hashed_counts, ngo_text
+from bulk_writer import dialect_insert
+from http_cache import mark_changed
+from config import Config
+
+# NGOs per batched pass; the feature matrix of a chunk is chunk x dim float32
+CHUNK_SIZE = 500
+
+# A trained model, published with one assignment so a prediction never mixes
+# the arrays of two trainings
+ClassifierWeights = namedtuple('ClassifierWeights', 'names category_ids log_prior log_likelihood')
+
+class NaiveBayesTrainer:
+    def __init__(self, dim, categories):
+        self.dim = dim
+        self.names = [category.name for category in categories]
+        self.category_ids = [category.id for category in categories]
+        self._term_counts = np.zeros((dim, len(categories)), dtype=np.float64)
+        self._doc_counts = np.zeros(len(categories), dtype=np.float64)
+
+    def add(self, texts, labels):
+        """Add documents with a (len(texts), categories) 0/1 label matrix"""
+        self._term_counts += hashed_counts(texts, self.dim).T @ labels
+        self._doc_counts += labels.sum(axis=0)
+
+    def weights(self):
+        """The trained ClassifierWeights, or None when no document was added"""
+        if not self._doc_counts.sum():
+            return None
+        # Laplace smoothing, so unseen words and empty categories stay finite
+        log_likelihood = np.log(
+            (self._term_counts + 1.0) / (self._term_counts.sum(axis=0) + self.dim)
+        ).astype(np.float32)
+        log_prior = np.log(
+            (self._doc_counts + 1.0) / (self._doc_counts.sum() + len(self.names))
+        ).astype(np.float32)
+        log_likelihood.flags.writeable = log_prior.flags.writeable = False
+        return ClassifierWeights(tuple(self.names), tuple(self.category_ids), log_prior, log_likelihood)
+
+def predict_proba(weights, texts):
+    """(len(texts), categories) probabilities"""
+    scores = hashed_counts(texts, weights.log_likelihood.shape[0]) @ weights.log_likelihood + weights.log_prior
+    scores -= scores.max(axis=1, keepdims=True)
+    probabilities = np.exp(scores)
+    return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+class CategoryClassifier:
+    """
+    Requests only read the published weights; training runs on a background
+    thread (started when the weights are due a refresh) or from the CLI
+    """
+
+    def __init__(self, dim, max_age):
+        self.dim = dim
+        self.max_age = max_age
+        self.app = None
+        self.weights = None  # ClassifierWeights, None until there was something to learn
+        self._trained_at = 0
+        self._training = None  # the background training thread
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Background training runs in this app's context"""
+        self.app = app
+
+    @property
+    def loaded(self):
+        return self.weights is not None
+
+    def rebuild(self):
+        """Train on every categorized NGO, one chunk at a time, and publish the weights"""
+        trainer = NaiveBayesTrainer(self.dim, Category.query.order_by(Category.id).all())
+        column = {category_id: index for index, category_id in enumerate(trainer.category_ids)}
+
+        for rows, assigned in labeled_chunks():
+            labels = np.zeros((len(rows), len(trainer.names)), dtype=np.float64)
+            position = {row.id: index for index, row in enumerate(rows)}
+            for ngo_id, category_id in assigned:
+                labels[position[ngo_id], column[category_id]] = 1.0
+            trainer.add([ngo_text(None, row.mission, row.description) for row in rows], labels)
+
+        self.weights = trainer.weights()
+        self._trained_at = time.monotonic()
+
+    def _stale(self):
+        if not self._trained_at:
+            return True
+        # With nothing categorized yet, look again sooner than a full retrain interval
+        max_age = self.max_age if self.weights is not None else Config.CLASSIFIER_UNTRAINED_RETRY_SECONDS
+        return time.monotonic() - self._trained_at > max_age
+
+    def refresh_if_stale(self):
+        """Start a background training when the weights are due one; never waits for it"""
+        if not self._stale() or self.app is None:
+            return
+        with self._lock:
+            # Threads do not survive a fork, so a child sees its parent's as finished
+            if not self._stale() or (self._training is not None and self._training.is_alive()):
+                return
+            self._training = threading.Thread(target=self._train, name='classifier-training', daemon=True)
+            self._training.start()
+
+    def _train(self):
+        with self.app.app_context():
+            try:
+                self.rebuild()
+            except Exception as e:
+                print(f"Category classifier training failed: {str(e)}")
+                # Try again after the untrained interval, not on every request
+                self._trained_at = time.monotonic()
+
+    def predict_proba(self, texts):
+        """(len(texts), categories) probabilities from the published weights"""
+        return predict_proba(self.weights, texts)
+
+    def suggest(self, text, limit=3):
+        """
+        (category names, confidence) for one text; ([], 0.0) when the model
+        has nothing to go on, including while the first training runs
+        """
+        self.refresh_if_stale()
+        weights = self.weights
+        if weights is None or not text:
+            return [], 0.0
+
+        probabilities = predict_proba(weights, [text])[0]
+        ranked = np.argsort(probabilities)[::-1][:limit]
+        names = [weights.names[index] for index in ranked
+                 if index == ranked[0] or probabilities[index] >= Config.CLASSIFIER_MIN_PROBABILITY]
+        return names, float(probabilities[ranked[0]])
+
+    def classify_table(self, apply=False):
+        """
+        Classify every NGO without categories in batched passes; with
+        apply=True confident predictions are written. Returns (confident, unsure).
+        """
+        # The CLI trains in the foreground
+        if self._stale():
+            self.rebuild()
+        weights = self.weights
+        if weights is None:
+            return 0, 0
+
+        confident = unsure = 0
+        last_id = 0
+        while True:
+            rows = db.session.query(NGO.id, NGO.mission, NGO.description).filter(
+                NGO.id > last_id, ~NGO.categories.any()
+            ).order_by(NGO.id).limit(CHUNK_SIZE).all()
+            if not rows:
+                return confident, unsure
+            last_id = rows[-1].id
+
+            probabilities = predict_proba(weights, [ngo_text(None, row.mission, row.description) for row in rows])
+            best = probabilities.argmax(axis=1)
+            sure = probabilities[np.arange(len(rows)), best] >= Config.CLASSIFIER_CONFIDENCE
+            confident += int(sure.sum())
+            unsure += int((~sure).sum())
+
+            if apply and sure.any():
+                links = [
+                    {'ngo_id': row.id, 'category_id': weights.category_ids[index]}
+                    for row, index, ok in zip(rows, best, sure) if ok
+                ]
+                now = datetime.utcnow()
+                db.session.execute(dialect_insert(ngo_categories).on_conflict_do_nothing(), links)
+                db.session.execute(
+                    NGO.__table__.update().where(NGO.id.in_([link['ngo_id'] for link in links])).values(updated_at=now)
+                )
+                mark_changed(db.session, {'ngos'})
+                db.session.commit()
+
+category_classifier = CategoryClassifier(Config.CLASSIFIER_FEATURES, Config.CLASSIFIER_RETRAIN_SECONDS)
+
+def labeled_chunks(chunk=CHUNK_SIZE):
+    """(NGO rows, [(ngo_id, category_id)]) for categorized NGOs, in id order"""
+    last_id = 0
+    while True:
+        rows = db.session.query(NGO.id, NGO.mission, NGO.description).filter(
+            NGO.id > last_id, NGO.categories.any()
+        ).order_by(NGO.id).limit(chunk).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        assigned = db.session.query(ngo_categories.c.ngo_id, ngo_categories.c.category_id).filter(
+            ngo_categories.c.ngo_id.in_([row.id for row in rows])
+        ).all()
+        yield rows, assigned
+
+def benchmark(folds=5, llm_samples=20):
+    """Cross-validated accuracy and per-call latency, against the LLM when configured"""
+    from ai_service import ai_service
+
+    categories = Category.query.order_by(Category.id).all()
+    column = {category.id: index for index, category in enumerate(categories)}
+    texts, truth = [], []
+    for rows, assigned in labeled_chunks():
+        labels = {}
+        for ngo_id, category_id in assigned:
+            labels.setdefault(ngo_id, set()).add(column[category_id])
+        for row in rows:
+            texts.append(ngo_text(None, row.mission, row.description))
+            truth.append(labels[row.id])
+    if len(texts) < folds:
+        print(f"Need at least {folds} categorized NGOs, found {len(texts)}")
+        return
+
+    correct, latencies = 0, []
+    order = np.random.default_rng(0).permutation(len(texts))
+    for fold in range(folds):
+        held_out = order[fold::folds]
+        held_out_set = set(held_out.tolist())
+        trainer = NaiveBayesTrainer(category_classifier.dim, categories)
+        train = [index for index in range(len(texts)) if index not in held_out_set]
+        labels = np.zeros((len(train), len(categories)))
+        for position, index in enumerate(train):
+            labels[position, list(truth[index])] = 1.0
+        trainer.add([texts[index] for index in train], labels)
+        weights = trainer.weights()
+
+        for index in held_out:
+            start = time.perf_counter()
+            best = int(predict_proba(weights, [texts[index]])[0].argmax())
+            latencies.append(time.perf_counter() - start)
+            correct += best in truth[index]
+
+    print(f"Local: top-1 accuracy {correct / len(texts):.1%} over {len(texts)} NGOs "
+          f"({folds}-fold), {np.median(latencies) * 1000:.2f} ms per call")
+
+    if not ai_service.client:
+        print("LLM: skipped, GROQ_API_KEY is not set")
+        return
+
+    by_name = {category.name: index for index, category in enumerate(categories)}
+    correct, latencies = 0, []
+    sample = order[:llm_samples]
+    for index in sample:
+        start = time.perf_counter()
+        try:
+            names = ai_service.ask_categories(texts[index])
+        except Exception as e:
+            print(f"LLM error: {str(e)}")
+            names = []
+        latencies.append(time.perf_counter() - start)
+        correct += bool(names) and by_name.get(names[0]) in truth[index]
+    print(f"LLM: top-1 accuracy {correct / len(sample):.1%} over {len(sample)} NGOs, "
+          f"{np.median(latencies) * 1000:.0f} ms per call")
+
+def main():
+    parser = argparse.ArgumentParser(description='Local NGO category classifier')
+    parser.add_argument('--benchmark', action='store_true', help='compare accuracy and latency with the LLM')
+    parser.add_argument('--apply', action='store_true', help='assign categories to NGOs that have none')
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        if args.benchmark:
+            benchmark()
+            return
+
+        start = time.time()
+        confident, unsure = category_classifier.classify_table(apply=args.apply)
+        elapsed = time.time() - start
+        action = 'Categorized' if args.apply else 'Would categorize'
+        print(f"{action} {confident} NGOs, {unsure} below the confidence threshold, in {elapsed:.1f}s")
+
+if __name__ == '__main__':
+    main()
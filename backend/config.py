@@ -11,8 +11,64 @@ class Config:
     # Flask
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     
+    # How long a worker trusts its cached copy of a user's role and token version
+    AUTH_CACHE_TTL_SECONDS = int(os.getenv('AUTH_CACHE_TTL_SECONDS', 60))
+    
+    # Password hashing pool, per worker process: cost, parallelism (0 hashes
+    # inline), and how much work may queue up before logins are turned away
+    # with 503; keep it below the gunicorn threads per worker (8)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 4))
+    PASSWORD_HASH_TIMEOUT = 10  # seconds
+    
     # API Keys
     GROQ_API_KEY = os.getenv('GROQ_API_KEY', '')
+    GROQ_BASE_URL = os.getenv('GROQ_BASE_URL') or None  # point at a local stub in development
+    
+    # Background AI enrichment of new NGOs
+    ENRICHMENT_WORKERS = int(os.getenv('ENRICHMENT_WORKERS', 2))
+    ENRICHMENT_MAX_ATTEMPTS = 3
+    ENRICHMENT_RETRY_DELAY = 2  # seconds, doubled after every failed attempt
+    ENRICHMENT_STALE_SECONDS = 600  # a 'running' NGO untouched this long is queued again
+    
+    # Local category classifier (category_classifier.py): the LLM is only asked
+    # when the top category's probability is below CLASSIFIER_CONFIDENCE
+    CLASSIFIER_FEATURES = 2 ** 14  # hashed bag-of-words buckets
+    CLASSIFIER_CONFIDENCE = float(os.getenv('CLASSIFIER_CONFIDENCE', 0.8))
+    CLASSIFIER_MIN_PROBABILITY = 0.2  # further categories need at least this
+    CLASSIFIER_RETRAIN_SECONDS = 3600
+    CLASSIFIER_UNTRAINED_RETRY_SECONDS = 300  # when no NGO had categories to learn from
+    
+    # Where `python scoring.py --changed-since-last-run` remembers its last run
+    SCORING_STATE_PATH = os.getenv('SCORING_STATE_PATH', 'scoring_state.json')
+    
+    # "Similar NGOs" vector index (similarity.py), memory-mapped from this directory
+    SIMILARITY_INDEX_DIR = os.getenv('SIMILARITY_INDEX_DIR', 'similarity_index')
+    SIMILARITY_FEATURES = 2 ** 12  # hashed bag-of-words buckets, kept small so the SVD sample fits in memory
+    SIMILARITY_DIMENSIONS = int(os.getenv('SIMILARITY_DIMENSIONS', 128))  # SVD embedding width
+    SIMILARITY_SVD_SAMPLE = int(os.getenv('SIMILARITY_SVD_SAMPLE', 5000))  # NGOs the projection is fitted on
+    SIMILARITY_MAX_RESULTS = 50
+    SIMILARITY_OVERLAY_MAX = int(os.getenv('SIMILARITY_OVERLAY_MAX', 20000))  # NGOs re-embedded in memory between builds
+    
+    # Bulk enrichment backfill (enrich_backfill.py): several NGOs per prompt,
+    # calls limited by request rate and by a token budget
+    BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', 4))
+    BACKFILL_REQUESTS_PER_SECOND = float(os.getenv('BACKFILL_REQUESTS_PER_SECOND', 0.5))
+    BACKFILL_TOKENS_PER_MINUTE = int(os.getenv('BACKFILL_TOKENS_PER_MINUTE', 30000))
+    BACKFILL_NGOS_PER_PROMPT = 10
+    BACKFILL_MAX_PROMPT_TOKENS = 6000
+    BACKFILL_WRITE_BATCH = 200
+    
+    # Bulk import (POST /api/ngos/import)
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 2000))  # rows per staged merge
+    IMPORT_MAX_ERRORS = 1000  # row errors listed in the report; the rest are only counted
+    
+    # LLM response cache: entries kept in memory per worker, and in a SQLite
+    # file shared by all workers that survives restarts
+    LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', 'llm_cache.db')
+    LLM_CACHE_MEMORY_ENTRIES = int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', 2048))
+    LLM_CACHE_DISK_ENTRIES = int(os.getenv('LLM_CACHE_DISK_ENTRIES', 200000))
     
     # Admin
     ADMIN_EMAIL = os.getenv('ADMIN_EMAIL', 'admin@example.com')
@@ -21,6 +77,49 @@ class Config:
     # Pagination
     ITEMS_PER_PAGE = 20
     
+    # NGOs fetched per round trip of the server-side cursor behind /api/ngos/export
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+    
+    # Rows each data_versions scope (see http_cache.py) is spread over, so
+    # concurrent writers rarely bump the same one
+    DATA_VERSION_SHARDS = int(os.getenv('DATA_VERSION_SHARDS', 8))
+    
+    # Upper bound of the serialized NGO fragment cache, per worker
+    FRAGMENT_CACHE_MAX_BYTES = int(os.getenv('FRAGMENT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    
+    # Stats counters are re-checked against the database this often
+    STATS_RECONCILE_SECONDS = int(os.getenv('STATS_RECONCILE_SECONDS', 300))
+    
+    # Per-worker NGO indexes (autocomplete, map clusters, similar NGOs) look for writes made
+    # elsewhere this often, see index_sync.py
+    INDEX_SYNC_SECONDS = float(os.getenv('INDEX_SYNC_SECONDS', 5))
+    INDEX_SYNC_OVERLAP_SECONDS = 60  # rows re-read from before the last check, for late commits
+    INDEX_SYNC_MAX_ROWS = 5000  # larger changes rebuild the indexes instead
+    
+    # Map: zoom levels below this get clusters, from this level on individual NGOs
+    MAP_CLUSTER_MAX_ZOOM = 12
+    
+    # Nearby search
+    NEARBY_MAX_RESULTS = 100
+    NEARBY_INITIAL_RADIUS_KM = 5
+    NEARBY_MAX_RADIUS_KM = 500
+    
     # Scraper settings
     SCRAPER_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    SCRAPER_DELAY = 2  # seconds between requests
\ No newline at end of file
+    SCRAPER_DELAY = 2  # seconds between requests to the same host
+    SCRAPER_BURST = 1  # requests a host may receive back to back
+    SCRAPER_MAX_WORKERS = int(os.getenv('SCRAPER_MAX_WORKERS', 8))
+    SCRAPER_MAX_IN_FLIGHT = int(os.getenv('SCRAPER_MAX_IN_FLIGHT', 8))
+    SCRAPER_TIMEOUT = 30  # seconds
+    SCRAPER_BATCH_SIZE = int(os.getenv('SCRAPER_BATCH_SIZE', 500))  # NGOs per upsert statement
+    SCRAPER_PARSER = os.getenv('SCRAPER_PARSER', 'lxml')  # 'lxml' or 'bs4', see parsers.py
+    SCRAPER_PARSE_WORKERS = int(os.getenv('SCRAPER_PARSE_WORKERS', os.cpu_count() or 2))  # parser processes
+    SCRAPER_CHECKPOINT_DIR = os.getenv('SCRAPER_CHECKPOINT_DIR', 'scrape_checkpoints')
+    
+    # Listing pages of each live source (scrapper.py --live): a URL with a {page}
+    # placeholder, and how many pages to walk (check robots.txt and the terms
+    # of service first)
+    GIVEINDIA_LISTING_URL = os.getenv('GIVEINDIA_LISTING_URL', 'https://www.giveindia.org/certified-indian-ngos?page={page}')
+    GIVEINDIA_PAGES = int(os.getenv('GIVEINDIA_PAGES', 50))
+    NGO_DARPAN_LISTING_URL = os.getenv('NGO_DARPAN_LISTING_URL', 'https://ngodarpan.gov.in/index.php/home/statewise_ngo/{page}')
+    NGO_DARPAN_PAGES = int(os.getenv('NGO_DARPAN_PAGES', 500))
@@ -0,0 +1,201 @@
+"""
+Bulk AI enrichment backfill
+Enriches NGOs that never went through enrichment, such as bulk imports, or
+that failed it; NGOs the live enrichment queue owns are left alone. Several
+NGOs are packed into each prompt. Calls run concurrently under a request rate
+and a token budget, with retries and exponential backoff, and results are
+written back in batches.
+
+    python enrich_backfill.py --workers 4 --rate 0.5 --tokens-per-minute 30000
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from sqlalchemy import func, or_, bindparam
+from models import db, NGO, Category, ngo_categories
+from ai_service import ai_service
+from scrape_engine import TokenBucket
+from bulk_writer import dialect_insert
+from http_cache import mark_changed
+from config import Config
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+def pending_ngos(limit=None, chunk=1000):
+    """
+    NGOs left to enrich, in id order
+    Chunks are read by id so the batched writes can commit in between.
+    """
+    last_id, seen = 0, 0
+    while limit is None or seen < limit:
+        size = chunk if limit is None else min(chunk, limit - seen)
+        rows = db.session.query(NGO.id, NGO.description, NGO.mission).filter(
+            NGO.id > last_id,
+            # 'pending' and 'running' NGOs belong to the live queue (enrichment.py)
+            or_(NGO.enrichment_status.is_(None), NGO.enrichment_status == 'failed'),
+            or_(NGO.description.isnot(None), NGO.mission.isnot(None))
+        ).order_by(NGO.id).limit(size).all()
+        if not rows:
+            return
+        for row in rows:
+            yield {'id': row.id, 'description': row.description, 'mission': row.mission}
+        last_id, seen = rows[-1].id, seen + len(rows)
+
+def pack(ngos, per_prompt, max_prompt_tokens):
+    """Group NGOs into prompts of up to `per_prompt` NGOs and `max_prompt_tokens` of input"""
+    batch, tokens = [], 0
+    for ngo in ngos:
+        cost = estimate_tokens((ngo['description'] or '') + (ngo['mission'] or ''))
+        if batch and (len(batch) >= per_prompt or tokens + cost > max_prompt_tokens):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(ngo)
+        tokens += cost
+    if batch:
+        yield batch
+
+class Backfill:
+    def __init__(self, workers, rate, tokens_per_minute, per_prompt, max_prompt_tokens,
+                 write_batch, max_attempts=5, retry_delay=2):
+        self.workers = workers
+        self.per_prompt = per_prompt
+        self.max_prompt_tokens = max_prompt_tokens
+        self.write_batch = write_batch
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.requests = TokenBucket(rate, burst=1)
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, burst=tokens_per_minute)
+        self._done = []    # (id, summary or None, category names)
+        self._failed = []  # ids
+        self.enriched = 0
+        self.failed = 0
+        self.tokens_used = 0
+
+    def _call(self, batch):
+        prompt_tokens = sum(estimate_tokens((ngo['description'] or '') + (ngo['mission'] or '')) for ngo in batch)
+        cost = min(prompt_tokens + ai_service.BATCH_TOKENS_PER_NGO * len(batch), self.tokens.capacity)
+
+        for attempt in range(1, self.max_attempts + 1):
+            self.requests.acquire()
+            self.tokens.acquire(cost)
+            try:
+                return ai_service.enrich_batch(batch), cost
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    raise
+                delay = self.retry_delay * 2 ** (attempt - 1) + random.uniform(0, self.retry_delay)
+                print(f"Enrichment call for {len(batch)} NGOs failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _collect(self, batch, future):
+        try:
+            results, cost = future.result()
+            self.tokens_used += cost
+        except Exception as e:
+            print(f"Giving up on NGOs {batch[0]['id']}-{batch[-1]['id']}: {str(e)}")
+            results = {}
+
+        for ngo in batch:
+            result = results.get(ngo['id'])
+            if result is None:
+                self._failed.append(ngo['id'])
+                continue
+            summary = result['summary'] if ngo['description'] and result['summary'] else None
+            self._done.append((ngo['id'], summary, result['categories']))
+
+        if len(self._done) + len(self._failed) >= self.write_batch:
+            self.flush()
+
+    def flush(self):
+        """Write collected results in one transaction"""
+        if not self._done and not self._failed:
+            return
+        now = datetime.utcnow()
+        table = NGO.__table__
+
+        if self._done:
+            stmt = table.update().where(table.c.id == bindparam('ngo_id')).values(
+                description=func.coalesce(bindparam('summary'), table.c.description),
+                enrichment_status='done',
+                enrichment_error=None,
+                updated_at=now
+            )
+            db.session.execute(stmt, [{'ngo_id': ngo_id, 'summary': summary} for ngo_id, summary, _ in self._done])
+
+            category_ids = dict(db.session.query(Category.name, Category.id).all())
+            links = [
+                {'ngo_id': ngo_id, 'category_id': category_ids[name]}
+                for ngo_id, _, names in self._done
+                for name in names if name in category_ids
+            ]
+            if links:
+                db.session.execute(dialect_insert(ngo_categories).on_conflict_do_nothing(), links)
+
+        if self._failed:
+            db.session.execute(
+                table.update().where(table.c.id.in_(self._failed)).values(
+                    enrichment_status='failed',
+                    enrichment_error='No result from batch enrichment',
+                    updated_at=now
+                )
+            )
+
+        mark_changed(db.session, {'ngos'})
+        db.session.commit()
+        self.enriched += len(self._done)
+        self.failed += len(self._failed)
+        self._done, self._failed = [], []
+
+    def run(self, limit=None):
+        batches = pack(pending_ngos(limit), self.per_prompt, self.max_prompt_tokens)
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='backfill') as pool:
+            while True:
+                # Read ahead only as far as the workers can use
+                while len(pending) < self.workers * 2:
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    pending[pool.submit(self._call, batch)] = batch
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._collect(pending.pop(future), future)
+        self.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize and categorize NGOs in bulk')
+    parser.add_argument('--workers', type=int, default=Config.BACKFILL_WORKERS)
+    parser.add_argument('--rate', type=float, default=Config.BACKFILL_REQUESTS_PER_SECOND,
+                        help='chat completion requests per second')
+    parser.add_argument('--tokens-per-minute', type=int, default=Config.BACKFILL_TOKENS_PER_MINUTE)
+    parser.add_argument('--per-prompt', type=int, default=Config.BACKFILL_NGOS_PER_PROMPT,
+                        help='NGOs packed into one prompt')
+    parser.add_argument('--limit', type=int, help='enrich at most this many NGOs')
+    args = parser.parse_args()
+
+    if not ai_service.client:
+        print("GROQ_API_KEY is not set, nothing to do")
+        return
+
+    from app import app
+    with app.app_context():
+        backfill = Backfill(
+            args.workers, args.rate, args.tokens_per_minute, args.per_prompt,
+            Config.BACKFILL_MAX_PROMPT_TOKENS, Config.BACKFILL_WRITE_BATCH
+        )
+        start = time.time()
+        backfill.run(args.limit)
+        elapsed = time.time() - start
+        print(f"Enriched {backfill.enriched} NGOs, {backfill.failed} failed, "
+              f"~{backfill.tokens_used} tokens in {elapsed:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Background AI enrichment of NGOs
+New NGOs are saved right away with enrichment_status='pending'; the LLM
+summary and category suggestions then run on a small worker pool with
+retries, so request latency never depends on the LLM. Clients poll
+GET /api/ngos/<id>/enrichment for the outcome.
+
+A worker claims an NGO by moving it from 'pending' to 'running', so a row is
+enriched once however many processes queue it. NGOs still pending after a
+restart, or left running by a process that died, are queued again by the
+first request each process serves.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from models import db, NGO, Category
+from ai_service import ai_service
+from stats import ngo_snapshot
+from config import Config
+
+class EnrichmentQueue:
+    def __init__(self, workers, max_attempts, retry_delay, stale_after):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.stale_after = stale_after  # seconds a 'running' NGO may go without progress
+        self.app = None
+        self.on_enriched = None
+        self._executor = None
+        self._pid = None
+        self._resumed_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, on_enriched=None):
+        """`on_enriched(ngo, before)` runs after an enrichment commits"""
+        self.app = app
+        self.on_enriched = on_enriched
+
+    def _pool(self):
+        # Threads do not survive a fork, so each worker starts its own pool
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='enrichment')
+            self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, ngo_id):
+        """Queue an NGO whose enrichment_status is 'pending'; call after the commit"""
+        return self._pool().submit(self._run, ngo_id)
+
+    def resume_pending(self):
+        """
+        Queue the NGOs a previous process left pending or running; once per
+        process, inside an app context
+        """
+        with self._lock:
+            if self._resumed_pid == os.getpid():
+                return
+            self._resumed_pid = os.getpid()
+        if not ai_service.client:
+            return
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        NGO.query.filter(NGO.enrichment_status == 'running', NGO.updated_at < cutoff).update(
+            {'enrichment_status': 'pending'}, synchronize_session=False
+        )
+        db.session.commit()
+
+        ids = [ngo_id for ngo_id, in db.session.query(NGO.id).filter(NGO.enrichment_status == 'pending').order_by(NGO.id)]
+        if ids:
+            print(f"Resuming enrichment of {len(ids)} NGOs")
+        for ngo_id in ids:
+            self.submit(ngo_id)
+
+    def _run(self, ngo_id):
+        with self.app.app_context():
+            if not self._claim(ngo_id):
+                return
+
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    enriched = self._enrich(ngo_id)
+                    break
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Enrichment of NGO {ngo_id} failed (attempt {attempt}): {str(e)}")
+                    if attempt == self.max_attempts:
+                        self._set_status(ngo_id, 'failed', str(e)[:255])
+                        return
+                    time.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+            # Outside the retries: the enrichment is committed, whatever happens here
+            if enriched is not None and self.on_enriched is not None:
+                try:
+                    self.on_enriched(*enriched)
+                except Exception as e:
+                    print(f"Refreshing indexes after enriching NGO {ngo_id} failed: {str(e)}")
+
+    def _claim(self, ngo_id):
+        """Move a pending NGO to 'running'; False when another worker got to it first"""
+        claimed = NGO.query.filter(NGO.id == ngo_id, NGO.enrichment_status == 'pending').update(
+            {'enrichment_status': 'running', 'enrichment_error': None}, synchronize_session=False
+        )
+        db.session.commit()
+        return claimed == 1
+
+    def _set_status(self, ngo_id, status, error=None):
+        ngo = db.session.get(NGO, ngo_id)
+        if ngo is not None:
+            ngo.enrichment_status = status
+            ngo.enrichment_error = error
+            db.session.commit()
+
+    def _enrich(self, ngo_id):
+        """(ngo, snapshot before) once the results are committed, None if the NGO is gone"""
+        ngo = db.session.get(NGO, ngo_id)
+        if ngo is None:
+            return None
+        before = ngo_snapshot(ngo)
+
+        # Both results land in one commit, so a retry starts from the original text
+        if ngo.description:
+            ngo.description = ai_service.generate_summary(ngo.description, strict=True)
+
+        if ngo.mission:
+            names = ai_service.suggest_categories(ngo.mission, strict=True)
+            for category in Category.query.filter(Category.name.in_(names)).all():
+                if category not in ngo.categories:
+                    ngo.categories.append(category)
+
+        ngo.transparency_score = ai_service.calculate_transparency_score(ngo)
+        ngo.enrichment_status = 'done'
+        ngo.enrichment_error = None
+        db.session.commit()
+        return ngo, before
+
+enrichment_queue = EnrichmentQueue(
+    Config.ENRICHMENT_WORKERS,
+    Config.ENRICHMENT_MAX_ATTEMPTS,
+    Config.ENRICHMENT_RETRY_DELAY,
+    Config.ENRICHMENT_STALE_SECONDS
+)
@@ -0,0 +1,98 @@
+"""
+Fetch state for incremental re-scraping
+Remembers the ETag, Last-Modified and content hash of every source page and
+the content hash of every scraped record, so a nightly run sends conditional
+requests, skips pages that did not change and only writes records that did.
+"""
+import hashlib
+import json
+from datetime import datetime
+from models import db, FetchState
+from bulk_writer import dialect_insert
+
+def content_hash(content):
+    """sha256 of raw page bytes or of a scraped record"""
+    if not isinstance(content, bytes):
+        content = json.dumps(content, sort_keys=True, default=str).encode()
+    return hashlib.sha256(content).hexdigest()
+
+class FetchStateStore:
+    def __init__(self):
+        self._states = None  # key -> (etag, last_modified, content hash)
+        self._pending = {}
+
+    def load(self):
+        if self._states is None:
+            rows = db.session.query(
+                FetchState.key, FetchState.etag, FetchState.last_modified, FetchState.content_hash
+            ).all()
+            self._states = {row.key: (row.etag, row.last_modified, row.content_hash) for row in rows}
+        return self._states
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since for a page fetched before"""
+        etag, last_modified, _ = self.load().get(url, (None, None, None))
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def unchanged(self, key, digest):
+        state = self.load().get(key)
+        return state is not None and state[2] == digest
+
+    def changed(self, key, content):
+        """The content hash of a record if it differs from the stored one, else None"""
+        digest = content_hash(content)
+        return None if self.unchanged(key, digest) else digest
+
+    def stage(self, key, digest, etag=None, last_modified=None):
+        """Remember a page; written by the save() that names it"""
+        self._pending[key] = self._row(key, digest, etag, last_modified)
+
+    def stage_response(self, url, response, digest):
+        """Remember a fetched page unless nothing about it changed"""
+        state = (response.headers.get('ETag'), response.headers.get('Last-Modified'), digest)
+        if self.load().get(url) != state:
+            self.stage(url, digest, *state[:2])
+
+    def discard(self, key):
+        """Forget a staged page whose records could not all be saved, so it is fetched again"""
+        self._pending.pop(key, None)
+
+    def _row(self, key, digest, etag=None, last_modified=None):
+        return {
+            'key': key,
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_hash': digest,
+            'fetched_at': datetime.utcnow()
+        }
+
+    def save(self, records=(), pages=()):
+        """
+        Write the given (key, digest) records and staged pages in the current
+        transaction; call committed() with the same arguments once it commits
+        """
+        rows = [self._pending[key] for key in pages if key in self._pending]
+        rows += [self._row(key, digest) for key, digest in records]
+        if not rows:
+            return
+        table = FetchState.__table__
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={name: stmt.excluded[name] for name in ('etag', 'last_modified', 'content_hash', 'fetched_at')}
+        )
+        db.session.execute(stmt, rows)
+
+    def committed(self, records=(), pages=()):
+        states = self.load()
+        for key in pages:
+            row = self._pending.pop(key, None)
+            if row is not None:
+                states[key] = (row['etag'], row['last_modified'], row['content_hash'])
+        for key, digest in records:
+            states[key] = (None, None, digest)
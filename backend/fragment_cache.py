@@ -0,0 +1,139 @@
+"""
+Serialized-fragment cache for NGO payloads
+Keeps the JSON encoding of NGO.to_dict() per (NGO, version, fieldset) in a
+size-bounded LRU so list endpoints stitch cached bytes together and only
+load relationships for, and serialize, the NGOs that missed
+"""
+import json
+import threading
+from collections import OrderedDict
+from flask import Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import NGO, Category, OfficeBearer, BlacklistRecord
+from loaders import with_ngo_fieldset
+from http_cache import data_versions
+from config import Config
+
+class FragmentCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> encoded fragment
+        self._keys_by_ngo = {}         # ngo id -> keys of its fragments
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return fragment
+
+    def put(self, key, fragment):
+        if len(fragment) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = fragment
+            self._size += len(fragment)
+            self._keys_by_ngo.setdefault(key[0], set()).add(key)
+
+            while self._size > self.max_bytes:
+                old_key, old_fragment = self._entries.popitem(last=False)
+                self._size -= len(old_fragment)
+                self._forget(old_key)
+
+    def _forget(self, key):
+        keys = self._keys_by_ngo.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_ngo[key[0]]
+
+    def invalidate(self, ngo_id):
+        """Drop every cached fragment of one NGO"""
+        with self._lock:
+            for key in self._keys_by_ngo.pop(ngo_id, ()):
+                self._size -= len(self._entries.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_ngo.clear()
+            self._size = 0
+
+fragment_cache = FragmentCache(Config.FRAGMENT_CACHE_MAX_BYTES)
+
+def encode(data):
+    return json.dumps(data, sort_keys=True, separators=(',', ':')).encode()
+
+def render_ngos(ngos, fields=None, include=None):
+    """
+    Encoded to_dict() fragments of a page of NGOs, in order
+    The page only needs its columns loaded: relationships are loaded in one
+    batch for the NGOs whose fragment is not cached.
+    """
+    # Category rows are embedded in every payload, so their version is part of the key
+    (categories_version, _), = data_versions('categories')
+    fieldset = (tuple(fields) if fields is not None else None, tuple(include) if include is not None else None)
+    keys = [(ngo.id, ngo.updated_at, categories_version) + fieldset for ngo in ngos]
+    fragments = [fragment_cache.get(key) for key in keys]
+
+    missing = [ngo.id for ngo, fragment in zip(ngos, fragments) if fragment is None]
+    if missing:
+        loaded = with_ngo_fieldset(NGO.query, fields, include).filter(
+            NGO.id.in_(missing)
+        ).populate_existing().all()
+        by_id = {ngo.id: ngo for ngo in loaded}
+
+        for position, ngo in enumerate(ngos):
+            if fragments[position] is None:
+                fragment = encode(by_id.get(ngo.id, ngo).to_dict(fields, include))
+                fragment_cache.put(keys[position], fragment)
+                fragments[position] = fragment
+
+    return fragments
+
+def stitched_response(list_key, fragments, **extra):
+    """
+    A JSON object response whose `list_key` array is made of pre-encoded fragments
+    """
+    parts = [b'{', encode(list_key), b':[', b','.join(fragments), b']']
+    for key, value in sorted(extra.items()):
+        parts += [b',', encode(key), b':', encode(value)]
+    parts.append(b'}')
+    return Response(b''.join(parts), mimetype='application/json')
+
+# Drop fragments of NGOs written in a committed transaction right away instead
+# of waiting for their updated_at to change the key
+@event.listens_for(Session, 'before_flush')
+def _collect_invalidations(session, flush_context, instances):
+    pending = session.info.setdefault('fragment_invalidations', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, NGO) and obj.id is not None:
+            pending.add(obj.id)
+        elif isinstance(obj, Category):
+            pending.add(None)
+        elif isinstance(obj, (OfficeBearer, BlacklistRecord)) and obj.ngo_id is not None:
+            pending.add(obj.ngo_id)
+
+@event.listens_for(Session, 'after_commit')
+def _apply_invalidations(session):
+    pending = session.info.pop('fragment_invalidations', set())
+    if None in pending:
+        fragment_cache.clear()
+        return
+    for ngo_id in pending:
+        fragment_cache.invalidate(ngo_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('fragment_invalidations', None)
@@ -0,0 +1,314 @@
+"""
+Geospatial helpers for the NGO map and "near me" search
+Keeps a pyramid of grid clusters (one level per map zoom) in memory so low
+zoom levels are answered with pre-aggregated cells instead of every point,
+and answers radius / k-nearest queries with an indexed bounding-box
+prefilter refined by a vectorized haversine
+
+    python geo.py --benchmark                 # nearby-search latency over 1M synthetic NGOs
+"""
+import argparse
+import math
+import threading
+import time
+import numpy as np
+from models import db, NGO
+from config import Config
+
+def parse_bbox(value):
+    """
+    Parse a Leaflet-style "west,south,east,north" bounding box
+    Returns None when no box was given, raises ValueError when it is malformed
+    """
+    if not value:
+        return None
+
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4 or not all(math.isfinite(part) for part in parts):
+        raise ValueError('bbox must be west,south,east,north')
+
+    west, south, east, north = parts
+    if west > east or south > north:
+        raise ValueError('bbox must be west,south,east,north')
+    if not (-180 <= west and east <= 180 and -90 <= south and north <= 90):
+        raise ValueError('bbox must lie within longitudes -180..180 and latitudes -90..90')
+    return west, south, east, north
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+def bounding_box(lat, lng, radius_km):
+    """Return (south, north, west, east) of a box enclosing the circle"""
+    delta_lat = radius_km / KM_PER_DEGREE
+    south, north = max(lat - delta_lat, -90.0), min(lat + delta_lat, 90.0)
+
+    # Longitude degrees shrink towards the poles, so size the box at its widest point
+    cos_lat = math.cos(math.radians(max(abs(south), abs(north))))
+    delta_lng = 180.0 if cos_lat < 1e-6 else min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+    return south, north, max(lng - delta_lng, -180.0), min(lng + delta_lng, 180.0)
+
+def haversine_km(lat, lng, lats, lngs):
+    """Great-circle distance from one point to arrays of points"""
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def nearest_ngos(query, lat, lng, k, radius_km=None):
+    """
+    The k nearest rows of an (id, latitude, longitude) NGO query
+    Only rows within `radius_km` are returned; without a radius the search
+    widens from NEARBY_INITIAL_RADIUS_KM until k rows are found. Either way
+    the radius stops at NEARBY_MAX_RADIUS_KM, so a request never scans the
+    whole table. Returns (ids, distances), nearest first.
+    """
+    k = max(k, 1)
+    if radius_km is not None:
+        radius_km = min(radius_km, Config.NEARBY_MAX_RADIUS_KM)
+    radius = radius_km if radius_km is not None else Config.NEARBY_INITIAL_RADIUS_KM
+
+    while True:
+        south, north, west, east = bounding_box(lat, lng, radius)
+        rows = query.filter(
+            NGO.latitude.between(south, north),
+            NGO.longitude.between(west, east)
+        ).all()
+
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        coords = np.array([(row[1], row[2]) for row in rows], dtype=np.float64).reshape(-1, 2)
+        distances = haversine_km(lat, lng, coords[:, 0], coords[:, 1])
+
+        # The box corners lie outside the circle
+        within = distances <= radius
+        ids, distances = ids[within], distances[within]
+
+        if radius_km is not None or len(ids) >= k or radius >= Config.NEARBY_MAX_RADIUS_KM:
+            break
+        radius = min(radius * 4, Config.NEARBY_MAX_RADIUS_KM)
+
+    if len(ids) > k:
+        nearest = np.argpartition(distances, k - 1)[:k]
+        ids, distances = ids[nearest], distances[nearest]
+
+    order = np.argsort(distances, kind='stable')
+    return ids[order].tolist(), distances[order].tolist()
+
+def cell_size(zoom):
+    # A 256px map tile spans 360 / 2^zoom degrees; cluster cells are a quarter of that
+    return 360.0 / (2 ** (zoom + 2))
+
+def grid_cell(zoom, lat, lng):
+    size = cell_size(zoom)
+    return int(math.floor((lng + 180) / size)), int(math.floor((lat + 90) / size))
+
+class ClusterPyramid:
+    """
+    Requests only read the cells; the full build runs on a background thread
+    (started when the pyramid is not loaded), single NGO changes are applied
+    in place with update_ngo()
+    """
+
+    def __init__(self, levels):
+        self.levels = levels
+        self.app = None
+        self._building = None  # the background build thread
+        self._lock = threading.Lock()
+        # zoom -> {(blacklisted, cell x, cell y): [count, sum of lat, sum of lng]}
+        self._cells = [{} for _ in range(levels)]
+        self._points = {}  # ngo id -> (blacklisted, lat, lng)
+        self.loaded = False
+
+    @staticmethod
+    def _point_for(ngo):
+        if not ngo.active or ngo.latitude is None or ngo.longitude is None:
+            return None
+        return bool(ngo.blacklisted), ngo.latitude, ngo.longitude
+
+    def init_app(self, app):
+        """Background builds run in this app's context"""
+        self.app = app
+
+    def _add(self, cells, point, sign):
+        blacklisted, lat, lng = point
+        for zoom in range(self.levels):
+            key = (blacklisted,) + grid_cell(zoom, lat, lng)
+            cell = cells[zoom].setdefault(key, [0, 0.0, 0.0])
+            cell[0] += sign
+            cell[1] += sign * lat
+            cell[2] += sign * lng
+            if cell[0] <= 0:
+                del cells[zoom][key]
+
+    def rebuild(self):
+        """Build every level from the database (needs an app context)"""
+        rows = NGO.query.filter(
+            NGO.active == True,
+            NGO.latitude.isnot(None),
+            NGO.longitude.isnot(None)
+        ).with_entities(
+            NGO.id, NGO.active, NGO.blacklisted, NGO.latitude, NGO.longitude
+        ).yield_per(10000)
+
+        cells = [{} for _ in range(self.levels)]
+        points = {}
+        for row in rows:
+            point = self._point_for(row)
+            points[row.id] = point
+            self._add(cells, point, +1)
+
+        with self._lock:
+            self._cells, self._points = cells, points
+            self.loaded = True
+
+    def build_in_background(self):
+        """Start a full build when the pyramid is not loaded; never waits for it"""
+        if self.loaded or self.app is None:
+            return
+        with self._lock:
+            # Threads do not survive a fork, so a child sees its parent's as finished
+            if self.loaded or (self._building is not None and self._building.is_alive()):
+                return
+            self._building = threading.Thread(target=self._build, name='map-cluster-build', daemon=True)
+            self._building.start()
+
+    def _build(self):
+        with self.app.app_context():
+            try:
+                self.rebuild()
+            except Exception as e:
+                print(f"Map cluster build failed: {str(e)}")
+
+    def mark_stale(self):
+        """Rebuild from the database, in the background, on next use"""
+        self.loaded = False
+
+    def update_ngo(self, ngo):
+        """Move an NGO between cells after its position or status changed"""
+        point = self._point_for(ngo)
+        with self._lock:
+            previous = self._points.pop(ngo.id, None)
+            if previous == point:
+                if point is not None:
+                    self._points[ngo.id] = point
+                return
+            if previous is not None:
+                self._add(self._cells, previous, -1)
+            if point is not None:
+                self._add(self._cells, point, +1)
+                self._points[ngo.id] = point
+
+    def clusters(self, zoom, bbox=None, include_blacklisted=False):
+        """Return the cluster cells of one zoom level that intersect `bbox`"""
+        zoom = max(0, min(zoom, self.levels - 1))
+        merged = {}
+
+        with self._lock:
+            level = self._cells[zoom]
+            if bbox is not None:
+                west, south, east, north = bbox
+                min_x, min_y = grid_cell(zoom, south, west)
+                max_x, max_y = grid_cell(zoom, north, east)
+
+            for (blacklisted, x, y), (count, sum_lat, sum_lng) in level.items():
+                if blacklisted and not include_blacklisted:
+                    continue
+                if bbox is not None and not (min_x <= x <= max_x and min_y <= y <= max_y):
+                    continue
+                cell = merged.setdefault((x, y), [0, 0.0, 0.0])
+                cell[0] += count
+                cell[1] += sum_lat
+                cell[2] += sum_lng
+
+        return [
+            {
+                'lat': sum_lat / count,
+                'lng': sum_lng / count,
+                'count': count,
+                'cell': f'{zoom}/{x}/{y}'
+            }
+            for (x, y), (count, sum_lat, sum_lng) in merged.items()
+        ]
+
+map_clusters = ClusterPyramid(Config.MAP_CLUSTER_MAX_ZOOM)
+
+BENCHMARK_SOURCE = 'nearby-benchmark'
+
+# Roughly the mainland, where the synthetic NGOs are scattered
+INDIA_BOUNDS = (8.0, 34.0, 69.0, 89.0)  # south, north, west, east
+
+def benchmark(size=1000000, queries=100, k=20, radius_km=10):
+    """
+    Latency of nearest_ngos() over `size` synthetic NGOs, for a fixed radius
+    and for k-nearest, against a scan that computes every distance. Point
+    DATABASE_URL at a scratch database: the rows are inserted for real (so
+    the planner has statistics) and deleted again at the end.
+    """
+    rng = np.random.default_rng(0)
+    south, north, west, east = INDIA_BOUNDS
+    table = NGO.__table__
+
+    start = time.perf_counter()
+    for offset in range(0, size, 10000):
+        count = min(10000, size - offset)
+        lats = rng.uniform(south, north, count)
+        lngs = rng.uniform(west, east, count)
+        db.session.execute(table.insert(), [
+            {'name': f'Nearby {offset + i}', 'latitude': float(lat), 'longitude': float(lng),
+             'active': True, 'blacklisted': False, 'source': BENCHMARK_SOURCE}
+            for i, (lat, lng) in enumerate(zip(lats, lngs))
+        ])
+        db.session.commit()
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(db.text('ANALYZE ngos'))
+        db.session.commit()
+    print(f"Inserted {size} synthetic NGOs in {time.perf_counter() - start:.0f}s")
+
+    candidates = NGO.query.filter(
+        NGO.active == True,
+        NGO.blacklisted == False,
+        NGO.latitude.isnot(None),
+        NGO.longitude.isnot(None)
+    ).with_entities(NGO.id, NGO.latitude, NGO.longitude)
+    probes = np.column_stack([rng.uniform(south, north, queries), rng.uniform(west, east, queries)])
+
+    def full_scan(query, lat, lng, k, radius_km):
+        rows = np.array(query.all(), dtype=np.float64)
+        distances = haversine_km(lat, lng, rows[:, 1], rows[:, 2])
+        return np.argsort(distances)[:k]
+
+    try:
+        runs = [
+            (f'within {radius_km} km', nearest_ngos, queries, (k, radius_km)),
+            (f'{k} nearest', nearest_ngos, queries, (k, None)),
+            ('full scan', full_scan, 3, (k, None)),
+        ]
+        for label, search, count, args in runs:
+            latencies = []
+            for lat, lng in probes[:count]:
+                started = time.perf_counter()
+                search(candidates, lat, lng, *args)
+                latencies.append((time.perf_counter() - started) * 1000)
+            print(f"{label:>15}: p50 {np.percentile(latencies, 50):.1f} ms, "
+                  f"p95 {np.percentile(latencies, 95):.1f} ms")
+    finally:
+        db.session.rollback()
+        db.session.execute(table.delete().where(table.c.source == BENCHMARK_SOURCE))
+        db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark nearby NGO search')
+    parser.add_argument('--benchmark', action='store_true', help='time nearby searches over synthetic NGOs')
+    parser.add_argument('--size', type=int, default=1000000, help='synthetic NGOs for --benchmark')
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        return
+
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        benchmark(args.size)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+"""
+gunicorn settings: gunicorn -c gunicorn.conf.py app:app
+Threaded workers serve several requests per process, which the password
+hashing pool (hashing.py) and the per-worker caches rely on.
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 2))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = 60
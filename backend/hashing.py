@@ -0,0 +1,131 @@
+"""
+Password hashing off the request thread
+Hashes run in a small bounded thread pool (hashlib releases the GIL while
+it hashes) with a cap on queued work. When a login burst fills the queue,
+callers get HashingBusy right away instead of piling up and starving the
+rest of the API.
+
+Both bounds are per process, and only mean something when a process serves
+several requests at once: gunicorn's gthread workers, as configured in
+gunicorn.conf.py. There PASSWORD_HASH_MAX_PENDING must stay below the
+worker's thread count, so hashing never holds every request thread. Sync
+workers handle one request at a time and gain nothing from the pool; run
+them with PASSWORD_HASH_WORKERS=0 to hash inline.
+
+    python hashing.py --benchmark   # login throughput and /api/ngos latency during a login burst
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+from config import Config
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full or a hash waited too long"""
+
+class PasswordHasher:
+    def __init__(self, workers, max_pending, method, timeout):
+        self.method = method
+        self.timeout = timeout
+        # No pool means hashing inline on the request thread
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash') if workers else None
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _run(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise HashingBusy()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+password_hasher = PasswordHasher(
+    Config.PASSWORD_HASH_WORKERS,
+    Config.PASSWORD_HASH_MAX_PENDING,
+    Config.PASSWORD_HASH_METHOD,
+    Config.PASSWORD_HASH_TIMEOUT
+)
+
+def benchmark(seconds=10, threads=8, logins=16, readers=4):
+    """
+    One gthread worker process under a login burst: `logins` clients sign in
+    back to back while `readers` clients list NGOs, all served by `threads`
+    request threads. Runs once hashing inline and once through the pool.
+    Needs a seeded database (python init_db.py).
+    """
+    import models
+    from app import app
+    # Run as a script this module is __main__, whose HashingBusy the app's
+    # error handler would not recognize
+    from hashing import PasswordHasher
+
+    client = app.test_client()
+    credentials = {'email': Config.ADMIN_EMAIL, 'password': Config.ADMIN_PASSWORD}
+    hashers = [
+        ('inline', PasswordHasher(0, 1, Config.PASSWORD_HASH_METHOD, Config.PASSWORD_HASH_TIMEOUT)),
+        ('pool', PasswordHasher(Config.PASSWORD_HASH_WORKERS, Config.PASSWORD_HASH_MAX_PENDING,
+                                Config.PASSWORD_HASH_METHOD, Config.PASSWORD_HASH_TIMEOUT)),
+    ]
+
+    for label, hasher in hashers:
+        models.password_hasher = hasher
+        server = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+        deadline = time.monotonic() + seconds
+        statuses, latencies = [], []
+
+        def log_in():
+            while time.monotonic() < deadline:
+                status = server.submit(lambda: client.post('/api/auth/login', json=credentials).status_code).result()
+                statuses.append(status)
+                if status == 503:
+                    time.sleep(1)  # Retry-After
+
+        def read():
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                server.submit(lambda: client.get('/api/ngos?per_page=20').status_code).result()
+                latencies.append((time.monotonic() - started) * 1000)
+
+        clients = [threading.Thread(target=log_in) for _ in range(logins)] + [threading.Thread(target=read) for _ in range(readers)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        server.shutdown()
+
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+        print(f"{label:>6}: {statuses.count(200) / seconds:.1f} logins/sec ({statuses.count(503)} turned away), "
+              f"/api/ngos p50 {p50:.0f} ms, p99 {p99:.0f} ms over {len(latencies)} calls")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark password hashing under load')
+    parser.add_argument('--benchmark', action='store_true', help='time logins and listings during a login burst')
+    parser.add_argument('--seconds', type=int, default=10, help='duration of each run')
+    parser.add_argument('--threads', type=int, default=8, help='request threads of the simulated worker')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.seconds, args.threads)
+    else:
+        parser.print_help()
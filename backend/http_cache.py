@@ -0,0 +1,165 @@
+"""
+Conditional GET support
+Every transaction that changes NGOs, categories, events or volunteer posts
+bumps a per-scope counter in data_versions. Read endpoints derive ETags from
+those versions (or from an entity's updated_at) and answer 304 Not Modified
+before building the response body.
+
+The bump happens once per transaction, right before it commits, so the row
+lock is held for as short as possible; and each scope is spread over
+DATA_VERSION_SHARDS rows, one picked at random per commit and summed on
+read, so concurrent writers rarely wait on the same row at all.
+"""
+import hashlib
+import random
+from datetime import datetime, timezone
+from flask import request, make_response
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session
+from models import db, NGO, Category, OfficeBearer, BlacklistRecord, Event, VolunteerPost, DataVersion
+from config import Config
+
+SCOPES = ('ngos', 'categories', 'events', 'volunteer_posts')
+
+MODEL_SCOPES = {
+    NGO: 'ngos',
+    OfficeBearer: 'ngos',
+    BlacklistRecord: 'ngos',
+    Category: 'categories',
+    Event: 'events',
+    VolunteerPost: 'volunteer_posts',
+}
+
+# Rows embedded in an NGO payload; changing them touches the NGO's updated_at,
+# which also keys the serialized-fragment cache
+NGO_CHILDREN = (OfficeBearer, BlacklistRecord)
+
+def shard_name(scope, shard):
+    """The data_versions row of one shard of a scope; shard 0 is the scope itself"""
+    return scope if shard == 0 else f'{scope}#{shard}'
+
+def seed_rows(shards=None):
+    shards = shards or Config.DATA_VERSION_SHARDS
+    return [{'scope': shard_name(scope, shard), 'version': 0} for scope in SCOPES for shard in range(shards)]
+
+@event.listens_for(DataVersion.__table__, 'after_create')
+def _seed_scopes(table, connection, **kw):
+    connection.execute(table.insert(), seed_rows())
+
+def mark_changed(session, scopes):
+    """
+    Bump these scopes when the session's transaction commits; Core
+    statements that bypass the ORM (bulk writes) must call this themselves
+    """
+    session.info.setdefault('data_version_scopes', set()).update(scopes)
+
+@event.listens_for(Session, 'before_flush')
+def _collect_scopes(session, flush_context, instances):
+    now = datetime.utcnow()
+    scopes = set()
+
+    changed = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty if session.is_modified(obj)
+    ]
+    for obj in changed:
+        scope = MODEL_SCOPES.get(type(obj))
+        if scope is None:
+            continue
+        scopes.add(scope)
+
+        # Category assignments only write ngo_categories, so stamp the NGO row explicitly
+        if isinstance(obj, NGO) and obj in session.dirty:
+            obj.updated_at = now
+
+        if isinstance(obj, NGO_CHILDREN) and obj.ngo_id is not None:
+            ngo = session.get(NGO, obj.ngo_id)
+            if ngo is not None and ngo not in session.deleted:
+                ngo.updated_at = now
+
+    mark_changed(session, scopes)
+
+@event.listens_for(Session, 'before_commit')
+def _bump_versions(session):
+    # Objects still pending are flushed by commit() only after this hook
+    session.flush()
+    scopes = session.info.pop('data_version_scopes', None)
+    if scopes:
+        bump_data_versions(session.connection(), scopes)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_scopes(session):
+    session.info.pop('data_version_scopes', None)
+
+def bump_data_versions(connection, scopes, now=None):
+    """Advance the version of each scope by one, in a randomly picked shard"""
+    now = now or datetime.utcnow()
+    table = DataVersion.__table__
+    shard = random.randrange(Config.DATA_VERSION_SHARDS)
+    # A fixed scope order keeps two writers from locking rows in opposite orders
+    for scope in sorted(scopes):
+        # Shard rows a database was not seeded with fall back to the scope's own row
+        for name in dict.fromkeys((shard_name(scope, shard), scope)):
+            result = connection.execute(
+                table.update().where(table.c.scope == name).values(
+                    version=table.c.version + 1, updated_at=now
+                )
+            )
+            if result.rowcount:
+                break
+        else:
+            connection.execute(table.insert().values(scope=scope, version=1, updated_at=now))
+
+def data_versions(*scopes):
+    """
+    Current (version, updated_at) of each scope, summed over its shards, in one query
+    """
+    rows = db.session.query(DataVersion.scope, DataVersion.version, DataVersion.updated_at).filter(
+        or_(*[or_(DataVersion.scope == scope, DataVersion.scope.like(f'{scope}#%')) for scope in scopes])
+    ).all()
+    found = {}
+    for name, version, updated_at in rows:
+        scope = name.split('#', 1)[0]
+        total, latest_at = found.get(scope, (0, None))
+        found[scope] = (total + version, latest(latest_at, updated_at))
+    return [found.get(scope, (0, None)) for scope in scopes]
+
+def make_etag(*parts):
+    """
+    Build an ETag from version parts plus the query string, since fieldsets
+    and filters change the body
+    """
+    digest = hashlib.sha1()
+    for part in parts + (request.query_string,):
+        digest.update(repr(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def conditional_response(etag, last_modified, build):
+    """
+    Answer 304 when the client's copy is current, otherwise call `build()`
+    and tag the response
+    `last_modified` is a naive UTC datetime or None.
+    """
+    if last_modified is not None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        not_modified = (
+            last_modified is not None
+            and request.if_modified_since is not None
+            and last_modified <= request.if_modified_since
+        )
+
+    response = make_response('', 304) if not_modified else make_response(build())
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Let clients and proxies store the body but revalidate before reusing it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def latest(*timestamps):
+    timestamps = [ts for ts in timestamps if ts is not None]
+    return max(timestamps) if timestamps else None
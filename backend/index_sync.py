@@ -0,0 +1,74 @@
+"""
+Keeping per-worker NGO indexes current
+The autocomplete index, the map cluster pyramid and the similar-NGOs overlay
+are built once per worker and then updated by that worker's own write
+routes, so writes made
+anywhere else (other workers, bulk imports, scrapers, scoring runs) would
+never reach them. At most every INDEX_SYNC_SECONDS this compares the 'ngos'
+data version with the one the indexes last saw, like
+StatsCounters.reconcile_if_stale() does for the counters; when it moved,
+the NGOs updated since the last check are fed to every index's
+update_ngo(), and a change too large for that marks the indexes stale so
+they rebuild on next use.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from models import NGO
+from http_cache import data_versions
+from config import Config
+
+# Everything the indexes' update_ngo() reads
+SYNC_COLUMNS = (
+    NGO.id, NGO.name, NGO.darpan_id, NGO.state, NGO.city, NGO.district,
+    NGO.active, NGO.blacklisted, NGO.latitude, NGO.longitude,
+    NGO.mission, NGO.description
+)
+
+class NGOIndexSync:
+    def __init__(self, indexes, interval, overlap, max_rows):
+        self.indexes = list(indexes)  # objects with update_ngo(ngo) and mark_stale()
+        self.interval = interval
+        self.overlap = timedelta(seconds=overlap)
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._checked_at = None  # time.monotonic() of the last check
+        self._version = None     # 'ngos' data version the indexes have caught up with
+        self._synced_at = None   # updated_at the next catch-up starts from
+
+    def sync_if_stale(self):
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.interval:
+            self.sync()
+
+    def sync(self):
+        """Catch the indexes up with NGO writes committed since the last check (needs an app context)"""
+        # One request thread catches up, the others go on with the index as it is
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            now = datetime.utcnow()
+            (version, _), = data_versions('ngos')
+            self._checked_at = time.monotonic()
+
+            # Indexes are built after the first check, so they start out current
+            if self._version is not None and version != self._version:
+                self._catch_up(self._synced_at - self.overlap)
+            self._version, self._synced_at = version, now
+        finally:
+            self._lock.release()
+
+    def _catch_up(self, since):
+        # Rows are stamped before their transaction commits, so the window
+        # reaches back `overlap` for transactions that committed late;
+        # re-applying a row is harmless
+        rows = NGO.query.with_entities(*SYNC_COLUMNS).filter(
+            NGO.updated_at >= since
+        ).order_by(NGO.id).limit(self.max_rows + 1).all()
+
+        if len(rows) > self.max_rows:
+            for index in self.indexes:
+                index.mark_stale()
+            return
+        for row in rows:
+            for index in self.indexes:
+                index.update_ngo(row)
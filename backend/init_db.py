@@ -1,14 +1,66 @@
 """
 Enhanced Database Initialization Script
 Seeds realistic NGO ecosystem data: NGOs, Users, Categories, Office Bearers, Events, Applications, Blacklist info
+
+    python init_db.py              # drop everything, recreate and seed
+    python init_db.py --upgrade    # bring an existing database up to the current models, keeping its data
 """
 
 from app import create_app
-from models import db, Category, User, NGO, VolunteerPost, Event, Application, OfficeBearer, BlacklistRecord
+from models import db, Category, User, NGO, VolunteerPost, Event, Application, OfficeBearer, BlacklistRecord, DataVersion
 from config import Config
+from http_cache import seed_rows
+from search import ensure_search_index
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn, CreateIndex
 from datetime import datetime, timedelta, date
+import argparse
 import random
 
+def upgrade_database():
+    """
+    Add what newer models expect to a database created by an older version:
+    missing tables (data_versions, fetch_states), missing columns
+    (users.token_version, ngos.enrichment_status, ngos.enrichment_error),
+    missing indexes and data_versions shard rows. Existing rows are kept.
+    """
+    app = create_app()
+
+    with app.app_context():
+        inspector = inspect(db.engine)
+        existing_tables = set(inspector.get_table_names())
+
+        print("Creating missing tables...")
+        db.create_all()
+
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    raise RuntimeError(f"{table.name}.{column.name} is NOT NULL without a server default, add it by hand")
+                print(f"Adding column {table.name}.{column.name}...")
+                column_ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                db.session.execute(db.text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+
+            # Reflection skips expression indexes on some databases, so let the database check
+            for index in table.indexes:
+                db.session.execute(CreateIndex(index, if_not_exists=True))
+
+        # Shard rows added since the table was created
+        present = {scope for scope, in db.session.query(DataVersion.scope).all()}
+        missing = [row for row in seed_rows() if row['scope'] not in present]
+        if missing:
+            db.session.execute(DataVersion.__table__.insert(), missing)
+
+        db.session.commit()
+        ensure_search_index()
+        print("✅ Database schema is up to date")
+
 def init_database():
     app = create_app()
 
@@ -215,4 +267,12 @@ def init_database():
         print("=" * 70)
 
 if __name__ == "__main__":
-    init_database()
+    parser = argparse.ArgumentParser(description='Create and seed, or upgrade, the database')
+    parser.add_argument('--upgrade', action='store_true',
+                        help='add missing tables, columns and indexes instead of starting over')
+    args = parser.parse_args()
+
+    if args.upgrade:
+        upgrade_database()
+    else:
+        init_database()
@@ -0,0 +1,118 @@
+"""
+Memoization cache for LLM calls
+Results are keyed on a hash of the model, the prompt version, the method and
+its input, so identical text never reaches the API twice. Lookups go to a
+per-worker in-memory LRU first, then to a SQLite file shared by all workers
+that survives restarts. Both tiers are size bounded; bumping a prompt version
+makes old entries unreachable until they age out.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+class LLMCache:
+    # Disk eviction runs every this many writes rather than on each one
+    EVICT_EVERY = 100
+
+    def __init__(self, path, memory_entries, disk_entries):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        # Guards the memory tier and the counters only, never held during disk IO
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> value
+        self._local = threading.local()  # one SQLite connection per thread
+        self._writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model, prompt_version, method, *inputs):
+        payload = json.dumps([model, prompt_version, method] + list(inputs), sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _db(self):
+        # Connections do not survive a fork, so each worker opens its own;
+        # each thread too, so lookups do not queue behind each other's IO
+        local = self._local
+        if getattr(local, 'connection', None) is None or local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS llm_cache '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, used_at REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_llm_cache_used_at ON llm_cache (used_at)')
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def get(self, key):
+        """The cached value, or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        value = None
+        try:
+            db = self._db()
+            row = db.execute('SELECT value FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                db.execute('UPDATE llm_cache SET used_at = ? WHERE key = ?', (time.time(), key))
+        except sqlite3.Error as e:
+            # The cache must never take the API call down with it
+            print(f"LLM cache read error: {str(e)}")
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+
+        try:
+            db = self._db()
+            db.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, value, used_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time())
+            )
+            if evict:
+                db.execute(
+                    'DELETE FROM llm_cache WHERE key IN '
+                    '(SELECT key FROM llm_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+                    (self.disk_entries,)
+                )
+        except sqlite3.Error as e:
+            print(f"LLM cache write error: {str(e)}")
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def to_dict(self):
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'memory_entries': len(self._memory)
+        }
+
+llm_cache = LLMCache(Config.LLM_CACHE_PATH, Config.LLM_CACHE_MEMORY_ENTRIES, Config.LLM_CACHE_DISK_ENTRIES)
@@ -0,0 +1,83 @@
+"""
+Eager-loading helpers for NGO serialization
+Picks a loader strategy for every relationship a response serializes so that
+list endpoints run a fixed number of queries per page instead of one per row
+"""
+from sqlalchemy.orm import selectinload, joinedload, load_only
+from models import NGO
+
+# Collections are fetched with one extra "WHERE ngo_id IN (...)" query per page;
+# the one-to-one blacklist record rides along on the main query as a LEFT JOIN.
+NGO_RELATIONSHIP_LOADERS = {
+    'categories': selectinload,
+    'office_bearers': selectinload,
+    'blacklist_info': joinedload,
+}
+
+# Relationships serialized by NGO.to_dict()
+NGO_RELATIONSHIPS = tuple(NGO_RELATIONSHIP_LOADERS)
+
+# Always loaded, whatever the fieldset: the primary key, the cursor sort keys
+# and the version that keys the fragment cache
+NGO_KEY_COLUMNS = ('id', 'name', 'transparency_score', 'updated_at')
+
+
+def ngo_loader_options(relationships=NGO_RELATIONSHIPS):
+    """
+    Build loader options for the given NGO relationships
+    """
+    return [NGO_RELATIONSHIP_LOADERS[name](getattr(NGO, name)) for name in relationships]
+
+
+def with_ngo_relationships(query, relationships=NGO_RELATIONSHIPS):
+    """
+    Eager-load the relationships a response is going to serialize
+    """
+    return query.options(*ngo_loader_options(relationships))
+
+
+def _split_names(value):
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def parse_ngo_fieldset(args):
+    """
+    Read ?fields= and ?include= into (columns, relationships) for NGO.to_dict()
+
+    `fields` may name columns and relationships, `include` only relationships.
+    Either value is None when the client did not restrict it. Raises
+    ValueError on unknown names.
+    """
+    fields = _split_names(args.get('fields'))
+    include = _split_names(args.get('include'))
+
+    for name in fields or []:
+        if name not in NGO.SERIALIZED_COLUMNS and name not in NGO_RELATIONSHIPS:
+            raise ValueError(f'Unknown field: {name}')
+
+    for name in include or []:
+        if name not in NGO_RELATIONSHIPS:
+            raise ValueError(f'Unknown relationship: {name}')
+
+    if fields is None:
+        return None, include
+
+    columns = ['id'] + [name for name in fields if name in NGO.SERIALIZED_COLUMNS and name != 'id']
+    relationships = [name for name in NGO_RELATIONSHIPS if name in fields or name in (include or [])]
+    return columns, relationships
+
+
+def with_ngo_fieldset(query, columns=None, relationships=None):
+    """
+    Push a fieldset down into the SELECT: only the requested columns are
+    fetched and only the requested relationships are loaded
+    """
+    options = ngo_loader_options(NGO_RELATIONSHIPS if relationships is None else relationships)
+
+    if columns is not None:
+        loaded = dict.fromkeys(NGO_KEY_COLUMNS + tuple(columns))
+        options.append(load_only(*[getattr(NGO, name) for name in loaded]))
+
+    return query.options(*options)
@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from datetime import date, datetime
+from hashing import password_hasher
 
 db = SQLAlchemy()
 
@@ -47,6 +47,12 @@ class NGO(db.Model):
     blacklisted = db.Column(db.Boolean, default=False)  # Added blacklist flag
     transparency_score = db.Column(db.Integer, default=0)
     
+    # AI summary and category suggestion, run in the background (see enrichment.py):
+    # pending, running, done, failed, or skipped when no LLM is configured;
+    # None until enrich_backfill.py gets to NGOs that were imported in bulk
+    enrichment_status = db.Column(db.String(20))
+    enrichment_error = db.Column(db.String(255))
+    
     # Metadata
     source = db.Column(db.String(100))
     scraped_at = db.Column(db.DateTime)
@@ -60,39 +66,43 @@ class NGO(db.Model):
     office_bearers = db.relationship('OfficeBearer', backref='ngo', lazy=True, cascade='all, delete-orphan')
     blacklist_info = db.relationship('BlacklistRecord', backref='ngo', uselist=False, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'registration_no': self.registration_no,
-            'darpan_id': self.darpan_id,
-            'mission': self.mission,
-            'description': self.description,
-            'founded_year': self.founded_year,
-            'email': self.email,
-            'phone': self.phone,
-            'website': self.website,
-            'address': self.address,
-            'city': self.city,
-            'state': self.state,
-            'district': self.district,
-            'country': self.country,
-            'latitude': self.latitude,
-            'longitude': self.longitude,
-            'registered_with': self.registered_with,
-            'registration_date': self.registration_date.isoformat() if self.registration_date else None,
-            'act_name': self.act_name,
-            'type_of_ngo': self.type_of_ngo,
-            'verified': self.verified,
-            'active': self.active,
-            'blacklisted': self.blacklisted,
-            'transparency_score': self.transparency_score,
-            'categories': [cat.to_dict() for cat in self.categories],
-            'office_bearers': [ob.to_dict() for ob in self.office_bearers],
-            'blacklist_info': self.blacklist_info.to_dict() if self.blacklist_info else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    # Fields NGO.to_dict() can serialize, used to validate ?fields= and ?include=
+    SERIALIZED_COLUMNS = (
+        'id', 'name', 'registration_no', 'darpan_id', 'mission', 'description',
+        'founded_year', 'email', 'phone', 'website', 'address', 'city', 'state',
+        'district', 'country', 'latitude', 'longitude', 'registered_with',
+        'registration_date', 'act_name', 'type_of_ngo', 'verified', 'active',
+        'blacklisted', 'transparency_score', 'enrichment_status', 'created_at',
+        'updated_at'
+    )
+    SERIALIZED_RELATIONSHIPS = ('categories', 'office_bearers', 'blacklist_info')
+    
+    def to_dict(self, fields=None, include=None):
+        """
+        Serialize the NGO; `fields` limits the columns and `include` the
+        relationships (None means all of them)
+        """
+        data = {}
+        for field in fields if fields is not None else self.SERIALIZED_COLUMNS:
+            value = getattr(self, field)
+            data[field] = value.isoformat() if isinstance(value, (date, datetime)) else value
+        
+        relationships = include if include is not None else self.SERIALIZED_RELATIONSHIPS
+        if 'categories' in relationships:
+            data['categories'] = [cat.to_dict() for cat in self.categories]
+        if 'office_bearers' in relationships:
+            data['office_bearers'] = [ob.to_dict() for ob in self.office_bearers]
+        if 'blacklist_info' in relationships:
+            data['blacklist_info'] = self.blacklist_info.to_dict() if self.blacklist_info else None
+        
+        return data
+
+# Sort keys used by cursor pagination (see pagination.py)
+db.Index('ix_ngos_name_id', NGO.name, NGO.id)
+db.Index('ix_ngos_transparency_id', db.func.coalesce(NGO.transparency_score, 0), NGO.id)
+
+# Bounding-box prefilter of nearby search (see geo.py)
+db.Index('ix_ngos_lat_lng', NGO.latitude, NGO.longitude)
 
 class Category(db.Model):
     __tablename__ = 'categories'
@@ -157,13 +167,15 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     name = db.Column(db.String(255))
     role = db.Column(db.String(50), default='user')
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # bumped to revoke issued tokens
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Both raise hashing.HashingBusy when the hashing pool is saturated
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
     
     def to_dict(self):
         return {
@@ -247,4 +259,23 @@ class Application(db.Model):
             'message': self.message,
             'status': self.status,
             'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+    
+    # Version counters of cached resource families, bumped by every transaction
+    # that changes one; each family is spread over a few shard rows (see http_cache.py)
+    scope = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class FetchState(db.Model):
+    __tablename__ = 'fetch_states'
+    
+    # A source page URL, or a scraped record as "<source>|<key>=<value>"
+    key = db.Column(db.String(2048), primary_key=True)
+    etag = db.Column(db.String(255))
+    last_modified = db.Column(db.String(64))
+    content_hash = db.Column(db.String(64))
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
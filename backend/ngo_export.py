@@ -0,0 +1,64 @@
+"""
+Streaming NGO export
+Serializers that turn a yield_per() NGO query into CSV or NDJSON text a few
+hundred rows at a time, so GET /api/ngos/export can stream the whole
+directory with flat memory. Unless the client picks ?fields=, both formats
+carry exactly what POST /api/ngos/import reads back: the scraped NGO fields
+plus categories, joined by '; ' in CSV.
+"""
+import csv
+import io
+import json
+from bulk_writer import SCRAPED_FIELDS
+
+# Columns and relationships exported when the client does not pick any
+EXPORT_COLUMNS = SCRAPED_FIELDS
+EXPORT_RELATIONSHIPS = ('categories',)
+
+# NGOs serialized per chunk of the response body
+CHUNK_ROWS = 200
+
+def ndjson_lines(ngos, fields=EXPORT_COLUMNS, include=EXPORT_RELATIONSHIPS):
+    lines = []
+    for ngo in ngos:
+        lines.append(json.dumps(ngo.to_dict(fields, include)))
+        if len(lines) >= CHUNK_ROWS:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def csv_lines(ngos, fields=EXPORT_COLUMNS, include=EXPORT_RELATIONSHIPS):
+    """CSV has no room for nested records, so only categories are exported"""
+    columns = list(fields)
+    with_categories = 'categories' in include
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns + (['categories'] if with_categories else []))
+
+    # The header goes out before the first query returns
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    for count, ngo in enumerate(ngos, 1):
+        data = ngo.to_dict(columns, ())
+        row = ['' if data[column] is None else data[column] for column in columns]
+        if with_categories:
+            row.append('; '.join(category.name for category in ngo.categories))
+        writer.writerow(row)
+
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+# format -> (mimetype, serializer)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', csv_lines),
+    'ndjson': ('application/x-ndjson', ndjson_lines),
+}
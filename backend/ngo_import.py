@@ -0,0 +1,197 @@
+"""
+Bulk NGO import
+Reads an NDJSON or CSV dump record by record straight off the request
+stream, validates each row, resolves its categories and hands it to a
+StagedNGOWriter (see bulk_writer.py), so a partner extract of hundreds of
+thousands of NGOs is never held in memory and is written in batches instead
+of a commit per NGO. Rows are matched to existing NGOs on darpan_id, then
+registration_no, then name, exactly like scraped ones.
+
+No LLM calls are made during the import: new NGOs with text to work on are
+left with no enrichment_status for enrich_backfill.py ('pending' belongs to
+the live enrichment queue, see enrichment.py).
+"""
+import csv
+import json
+import re
+from datetime import date
+from models import db, NGO, Category
+from ai_service import ai_service
+from bulk_writer import StagedNGOWriter, SCRAPED_FIELDS
+from config import Config
+
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# Category lists in a CSV cell
+CATEGORY_SEPARATORS = re.compile(r'[;|]')
+
+def _lines(stream, invalid):
+    """
+    Decoded lines of a binary stream; lines that are not valid UTF-8 are
+    decoded with replacement characters and their numbers added to `invalid`
+    """
+    for line_no, raw in enumerate(stream, 1):
+        try:
+            yield raw.decode('utf-8')
+        except UnicodeDecodeError:
+            invalid.add(line_no)
+            yield raw.decode('utf-8', errors='replace')
+
+def read_ndjson(stream):
+    """(line number, record, error) for each non-empty line"""
+    invalid = set()
+    for line_no, line in enumerate(_lines(stream, invalid), 1):
+        if line_no in invalid:
+            yield line_no, None, 'Invalid UTF-8'
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f'Invalid JSON: {str(e)}'
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, 'Each line must be a JSON object'
+            continue
+        yield line_no, record, None
+
+def read_csv(stream):
+    """(line number, record, error) for each row after the header"""
+    invalid = set()
+    reader = csv.DictReader(_lines(stream, invalid))
+    if reader.fieldnames and invalid:
+        yield 1, None, 'Invalid UTF-8 in the header'
+        return
+    first_line = 2  # of the next row; quoted values may span several lines
+    for record in reader:
+        lines = range(first_line, reader.line_num + 1)
+        first_line = reader.line_num + 1
+        if invalid.intersection(lines):
+            yield reader.line_num, None, 'Invalid UTF-8'
+            continue
+        if None in record:
+            yield reader.line_num, None, 'More fields than the header has columns'
+            continue
+        yield reader.line_num, record, None
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+CONTENT_TYPES = {
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv',
+}
+
+def _clean(field, value):
+    """The value of one NGO column, converted to its type; raises ValueError"""
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == '':
+        return None
+
+    column_type = NGO.__table__.c[field].type
+    if isinstance(column_type, db.Integer):
+        value = int(value)
+        if field == 'founded_year' and not 1800 <= value <= date.today().year:
+            raise ValueError(f'{field} must be between 1800 and {date.today().year}')
+        return value
+    if isinstance(column_type, db.Float):
+        value = float(value)
+        limit = 90 if field == 'latitude' else 180
+        if not -limit <= value <= limit:
+            raise ValueError(f'{field} must be between -{limit} and {limit}')
+        return value
+    if isinstance(column_type, db.Date):
+        return date.fromisoformat(str(value))
+
+    value = str(value)
+    if column_type.length and len(value) > column_type.length:
+        raise ValueError(f'{field} is longer than {column_type.length} characters')
+    if field == 'email' and not EMAIL_RE.match(value):
+        raise ValueError('email is not a valid address')
+    return value
+
+class NGOImport:
+    def __init__(self, batch_size=Config.IMPORT_BATCH_SIZE, max_errors=Config.IMPORT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.invalid = 0
+        self.errors = []
+        self.error_count = 0
+        self.writer = StagedNGOWriter(batch_size, on_error=self._not_saved)
+        # Lowercased name -> canonical name
+        self._categories = {name.lower(): name for name, in db.session.query(Category.name).all()}
+
+    def _error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'message': message})
+
+    def _not_saved(self, ngo_data, e):
+        self._error(ngo_data['line'], 'Could not be saved: ' + str(e).splitlines()[0][:200])
+
+    def _categories_of(self, value):
+        if not value:
+            return []
+        names = value if isinstance(value, list) else CATEGORY_SEPARATORS.split(str(value))
+        resolved = []
+        for name in names:
+            name = str(name).strip()
+            if not name:
+                continue
+            if name.lower() not in self._categories:
+                raise ValueError(f"Unknown category '{name}'")
+            resolved.append(self._categories[name.lower()])
+        return resolved
+
+    def validate(self, record):
+        """The NGO fields of a raw record; raises ValueError with a message for the report"""
+        ngo_data = {}
+        for field in SCRAPED_FIELDS:
+            try:
+                ngo_data[field] = _clean(field, record.get(field))
+            except (TypeError, ValueError) as e:
+                raise ValueError(str(e) if field in str(e) else f'{field}: {str(e)}')
+        if not ngo_data['name']:
+            raise ValueError('name is required')
+        ngo_data['categories'] = self._categories_of(record.get('categories'))
+
+        # Only applies to NGOs this import creates; None leaves them to the backfill
+        has_text = ngo_data['description'] or ngo_data['mission']
+        ngo_data['enrichment_status'] = None if ai_service.client and has_text else 'skipped'
+        return ngo_data
+
+    def run(self, records, source='import'):
+        """Validate and write (line number, record, error) triples from one of READERS"""
+        for line, record, error in records:
+            self.rows += 1
+            if error is None:
+                try:
+                    ngo_data = self.validate(record)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                self.invalid += 1
+                self._error(line, error)
+                continue
+
+            ngo_data['line'] = line
+            self.writer.add(ngo_data, source)
+        self.writer.flush()
+
+    def report(self, elapsed):
+        elapsed = max(elapsed, 1e-6)
+        return {
+            'rows': self.rows,
+            'saved': self.writer.saved,
+            'failed': self.invalid + self.writer.failed,
+            'errors': self.errors,
+            'errors_truncated': self.error_count > len(self.errors),
+            'seconds': round(elapsed, 3),
+            'rows_per_sec': round(self.rows / elapsed, 1)
+        }
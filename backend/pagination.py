@@ -0,0 +1,85 @@
+"""
+Keyset (cursor) pagination
+Pages through NGO queries by the last seen sort key instead of OFFSET, so
+deep pages cost the same as the first one and no COUNT(*) is needed
+"""
+import base64
+import binascii
+import json
+from models import db, NGO
+
+# Sort orders available in cursor mode:
+# name -> (sort key expressions, descending, key values of a loaded NGO, types of those values)
+KEYSET_ORDERS = {
+    'name': (
+        (NGO.name, NGO.id),
+        False,
+        lambda ngo: [ngo.name, ngo.id],
+        (str, int)
+    ),
+    'transparency': (
+        (db.func.coalesce(NGO.transparency_score, 0), NGO.id),
+        True,
+        lambda ngo: [ngo.transparency_score or 0, ngo.id],
+        ((int, float), int)
+    ),
+}
+
+def encode_cursor(order, values):
+    """
+    Encode the sort key of the last row of a page as an opaque token
+    """
+    payload = json.dumps({'o': order, 'k': values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, order):
+    """
+    Decode a cursor token, raises ValueError if it is malformed or was
+    issued for a different sort order
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload['k']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValueError('Invalid cursor')
+
+    types = KEYSET_ORDERS[order][3]
+    if payload.get('o') != order or not isinstance(values, list) or len(values) != len(types):
+        raise ValueError('Invalid cursor')
+
+    # Anything else would reach the database as a bind parameter; bool is an int subclass
+    for value, value_type in zip(values, types):
+        if not isinstance(value, value_type) or isinstance(value, bool):
+            raise ValueError('Invalid cursor')
+
+    return values
+
+def keyset_paginate(query, order, cursor, per_page):
+    """
+    Fetch the page that follows `cursor` (or the first page when it is empty)
+    Returns (items, next_cursor); next_cursor is None on the last page
+    """
+    if order not in KEYSET_ORDERS:
+        raise ValueError(f'Invalid order: {order}')
+
+    columns, descending, key_values, _ = KEYSET_ORDERS[order]
+    per_page = max(per_page, 1)
+
+    if cursor:
+        values = decode_cursor(cursor, order)
+        key = db.tuple_(*columns)
+        last_seen = db.tuple_(*values)
+        query = query.filter(key < last_seen if descending else key > last_seen)
+
+    query = query.order_by(*[col.desc() if descending else col.asc() for col in columns])
+
+    # One extra row tells us whether another page exists without counting
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+
+    next_cursor = None
+    if len(rows) > per_page:
+        next_cursor = encode_cursor(order, key_values(items[-1]))
+
+    return items, next_cursor
@@ -0,0 +1,151 @@
+"""
+Transparency scoring
+The scoring rules are written down once, as data, and compiled two ways: a
+Python function for a single NGO object and a SQL expression that rescores
+rows in place with set-based UPDATEs, so changing a rule never needs every
+NGO loaded into Python.
+
+    python scoring.py                          # rescore the whole table
+    python scoring.py --changed-since-last-run # only NGOs updated since the previous run
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from sqlalchemy import case, func, and_, or_
+from models import db, NGO
+from http_cache import mark_changed
+from config import Config
+
+# (points, columns that must all be filled in)
+SCORE_RULES = (
+    # Basic info (30 points)
+    (5, ('name',)),
+    (10, ('mission',)),
+    (15, ('description',)),
+    # Contact info (20 points)
+    (10, ('email',)),
+    (5, ('phone',)),
+    (5, ('website',)),
+    # Location (20 points)
+    (10, ('address',)),
+    (10, ('city', 'state')),
+    # Verification (30 points)
+    (20, ('registration_no',)),
+    (10, ('verified',)),
+)
+
+MAX_SCORE = 100
+
+def rules_fingerprint():
+    return hashlib.sha256(repr((SCORE_RULES, MAX_SCORE)).encode()).hexdigest()
+
+def score_ngo(ngo):
+    """Score one NGO object (or anything with the same attributes)"""
+    score = sum(
+        points for points, columns in SCORE_RULES
+        if all(getattr(ngo, column) for column in columns)
+    )
+    return min(score, MAX_SCORE)
+
+def _filled(column):
+    # The SQL spelling of Python truthiness for the column's type
+    if isinstance(column.type, db.Boolean):
+        return column.is_(True)
+    return and_(column.isnot(None), column != '')
+
+def score_expression(table=None):
+    """The same score as a SQL expression over the ngos table"""
+    table = table if table is not None else NGO.__table__
+    total = sum(
+        case((and_(*[_filled(table.c[column]) for column in columns]), points), else_=0)
+        for points, columns in SCORE_RULES
+    )
+    return case((total > MAX_SCORE, MAX_SCORE), else_=total)
+
+def rescore(where):
+    """
+    Rescore the NGOs matching `where` in one UPDATE, touching only rows
+    whose score changes; returns the number of rows written. Commit to apply.
+    """
+    table = NGO.__table__
+    score = score_expression(table)
+    now = datetime.utcnow()
+    result = db.session.execute(
+        table.update()
+        .where(where, or_(table.c.transparency_score.is_(None), table.c.transparency_score != score))
+        .values(transparency_score=score, updated_at=now)
+    )
+    if result.rowcount:
+        mark_changed(db.session, {'ngos'})
+    return result.rowcount
+
+def rescore_ids(ids):
+    """Rescore specific NGOs, e.g. rows a bulk write just touched"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    return rescore(NGO.__table__.c.id.in_(ids))
+
+def _read_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def _write_state(path, state):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def rescore_table(chunk=10000, changed_since=None):
+    """
+    Rescore every NGO in id ranges of `chunk`, one UPDATE and commit per
+    range so memory and lock time stay bounded; returns (scanned, changed)
+    """
+    table = NGO.__table__
+    low, high = db.session.query(func.min(table.c.id), func.max(table.c.id)).one()
+    if low is None:
+        return 0, 0
+
+    scanned = changed = 0
+    for start in range(low, high + 1, chunk):
+        where = and_(table.c.id >= start, table.c.id < start + chunk)
+        if changed_since is not None:
+            where = and_(where, table.c.updated_at > changed_since)
+        scanned += db.session.query(func.count(table.c.id)).filter(where).scalar()
+        changed += rescore(where)
+        db.session.commit()
+    return scanned, changed
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute NGO transparency scores')
+    parser.add_argument('--changed-since-last-run', action='store_true',
+                        help='only rescore NGOs updated since the previous run with the same rules')
+    parser.add_argument('--chunk', type=int, default=10000, help='ids per UPDATE')
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        state = _read_state(Config.SCORING_STATE_PATH)
+        started_at = datetime.utcnow()
+
+        changed_since = None
+        if args.changed_since_last_run:
+            if state.get('rules') == rules_fingerprint() and state.get('last_run'):
+                changed_since = datetime.fromisoformat(state['last_run'])
+            else:
+                print("Scoring rules changed or no previous run, rescoring everything")
+
+        start = time.time()
+        scanned, changed = rescore_table(args.chunk, changed_since)
+        elapsed = max(time.time() - start, 1e-6)
+        print(f"Rescored {scanned} NGOs ({changed} changed) in {elapsed:.1f}s, {scanned / elapsed:.0f} rows/sec")
+
+        _write_state(Config.SCORING_STATE_PATH, {'rules': rules_fingerprint(), 'last_run': started_at.isoformat()})
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Concurrent fetch engine for the scrapers
+Fetches URLs on a thread pool over the scraper's shared requests.Session.
+Every host gets its own token bucket, so politeness is enforced per site
+instead of serializing the whole crawl, and the number of requests in
+flight is bounded.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second with bursts of up to `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+
+class HostRateLimiter:
+    """One token bucket per host"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
+
+class FetchEngine:
+    def __init__(self, session, workers, max_in_flight, rate_per_host, burst=1, timeout=30):
+        self.session = session
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.limiter = HostRateLimiter(rate_per_host, burst)
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+
+        # Let every worker keep its own pooled connection per host
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+    def fetch(self, url, **kwargs):
+        """GET one URL, waiting for its host's rate limit first"""
+        self.limiter.acquire(url)
+        with self._in_flight:
+            return self.session.get(url, timeout=self.timeout, **kwargs)
+
+    def _fetch_safe(self, url, kwargs):
+        try:
+            return self.fetch(url, **kwargs)
+        except Exception as e:
+            return e
+
+    def fetch_all(self, urls, headers_for=None, **kwargs):
+        """
+        Fetch URLs concurrently and yield (url, response or exception) as
+        they complete
+        URLs are consumed lazily, so `urls` can be a generator of any size.
+        `headers_for(url)` can add per-URL headers, such as conditional ones.
+        """
+        pending = {}
+        urls = iter(urls)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scraper-fetch') as pool:
+            while True:
+                # Keep a bounded backlog queued behind the workers
+                while len(pending) < self.max_in_flight * 2:
+                    url = next(urls, None)
+                    if url is None:
+                        break
+                    url_kwargs = kwargs
+                    if headers_for is not None:
+                        url_kwargs = dict(kwargs, headers={**kwargs.get('headers', {}), **headers_for(url)})
+                    pending[pool.submit(self._fetch_safe, url, url_kwargs)] = url
+
+                if not pending:
+                    return
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
@@ -0,0 +1,162 @@
+"""
+Checkpointed scrape jobs
+A job walks a fixed list of listing pages through three stages joined by a
+bounded queue: the fetch engine's threads download pages, a process pool
+parses them outside the GIL, and the calling thread writes the records in
+batches. Pages whose records are all committed go into a JSON checkpoint
+file, so a job that crashed restarts from there with resume=True; a page
+with a record that could not be saved is left for the next run.
+"""
+import json
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from fetch_state import content_hash
+from config import Config
+
+_DONE = object()
+
+class ScrapeJob:
+    def __init__(self, name, urls, parse_page, source):
+        self.name = name
+        # Checkpoints refer to pages by position, so keep the order stable
+        self.urls = list(dict.fromkeys(urls))
+        self.parse_page = parse_page  # must be picklable for the process pool
+        self.source = source
+
+class Checkpoint:
+    """Pages of a job whose records have been committed"""
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.next_page = 0  # every page before this one is done
+        self.done = set()   # done pages after next_page
+        if resume and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.next_page = data['next_page']
+            self.done = set(data['done'])
+
+    def is_done(self, page):
+        return page < self.next_page or page in self.done
+
+    def mark(self, pages):
+        if not pages:
+            return
+        self.done.update(pages)
+        while self.next_page in self.done:
+            self.done.remove(self.next_page)
+            self.next_page += 1
+
+        # Write then rename, so a crash never leaves a torn checkpoint
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'next_page': self.next_page, 'done': sorted(self.done)}, f)
+        os.replace(tmp_path, self.path)
+
+    def finish(self):
+        """The job completed; the next run starts from the first page"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def checkpoint_path(job):
+    filename = re.sub(r'[^\w-]+', '_', job.name) + '.json'
+    return os.path.join(Config.SCRAPER_CHECKPOINT_DIR, filename)
+
+def run_job(scraper, job, workers=Config.SCRAPER_PARSE_WORKERS, resume=False):
+    """
+    Run a job with `workers` parser processes; call inside an app context
+    """
+    os.makedirs(Config.SCRAPER_CHECKPOINT_DIR, exist_ok=True)
+    checkpoint = Checkpoint(checkpoint_path(job), resume)
+    pages = {url: page for page, url in enumerate(job.urls) if not checkpoint.is_done(page)}
+    if resume:
+        print(f"Resuming {job.name} from page {checkpoint.next_page}, {len(pages)} pages left")
+
+    fetch_state = scraper.fetch_state
+    writer = scraper.writer
+    # Loaded here so the fetch stage only reads memory, never the session
+    fetch_state.load()
+
+    # Bounds both the pages held in memory and the parses in flight
+    fetched = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+
+    def fetch_stage(pool):
+        try:
+            responses = scraper.engine.fetch_all(pages, headers_for=fetch_state.conditional_headers)
+            for url, response in responses:
+                if stop.is_set():
+                    break
+                digest = future = None
+                if not isinstance(response, Exception) and response.status_code == 200:
+                    # Servers without validators still get a byte-for-byte comparison
+                    digest = content_hash(response.content)
+                    if not fetch_state.unchanged(url, digest):
+                        future = pool.submit(job.parse_page, response.text)
+                fetched.put((pages[url], url, response, digest, future))
+        except Exception as e:
+            fetched.put(e)
+        finally:
+            fetched.put(_DONE)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        fetcher = threading.Thread(target=fetch_stage, args=(pool,), name='scraper-fetch-stage', daemon=True)
+        fetcher.start()
+
+        def checkpoint_committed():
+            checkpoint.mark([pages[url] for url in writer.take_committed_pages()])
+
+        try:
+            while True:
+                item = fetched.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                page, url, response, digest, future = item
+                if isinstance(response, Exception):
+                    print(f"Error fetching {url}: {str(response)}")
+                    continue
+                if response.status_code == 304:
+                    scraper.not_modified += 1
+                    writer.add_page(url, [], job.source)
+                    continue
+                if response.status_code != 200:
+                    print(f"Error fetching {url}: HTTP {response.status_code}")
+                    continue
+
+                records = []
+                if future is None:
+                    scraper.not_modified += 1
+                else:
+                    try:
+                        # Header and placeholder rows carry no name
+                        records = [ngo_data for ngo_data in future.result() if ngo_data.get('name')]
+                    except Exception as e:
+                        print(f"Error parsing {url}: {str(e)}")
+                        continue
+
+                # The page is checkpointed once all of its records are committed
+                fetch_state.stage_response(url, response, digest)
+                writer.add_page(url, scraper.categorize(records), job.source)
+                checkpoint_committed()
+
+            writer.flush()
+            checkpoint_committed()
+        finally:
+            stop.set()
+            # Unblock the fetch stage if it is waiting on a full queue
+            while fetcher.is_alive():
+                try:
+                    fetched.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    if all(checkpoint.is_done(page) for page in range(len(job.urls))):
+        checkpoint.finish()
+    else:
+        print(f"{job.name}: some pages failed, run with --resume to retry them")
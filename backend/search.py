@@ -0,0 +1,151 @@
+"""
+Full-text search over NGOs
+On Postgres a weighted tsvector column, maintained by the database on every
+write and served by a GIN index, replaces the ILIKE scan. Other databases
+(the SQLite development setup) keep using ILIKE.
+
+    python search.py                          # add the search column and index to an existing database
+    python search.py --benchmark              # full-text vs ILIKE latency over 1M synthetic NGOs
+"""
+import argparse
+import random
+import time
+from sqlalchemy import event, DDL
+from models import db, NGO
+
+SEARCH_CONFIG = 'english'
+
+# Name and DARPAN ID weigh more than the mission, which weighs more than the description
+SEARCH_VECTOR_DDL = [
+    f"""ALTER TABLE ngos ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(darpan_id, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(mission, '')), 'B') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'C')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_ngos_search_vector ON ngos USING GIN (search_vector)"
+]
+
+for statement in SEARCH_VECTOR_DDL:
+    event.listen(NGO.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+
+search_vector = db.literal_column('ngos.search_vector')
+
+def full_text_enabled():
+    return db.engine.dialect.name == 'postgresql'
+
+def apply_search(query, term, columns=None, rank=True):
+    """
+    Filter an NGO query by a search term
+    With full-text search, `rank=True` orders the results by relevance.
+    `columns` are the ILIKE fallback columns (name, mission, description and
+    DARPAN ID by default).
+    """
+    if full_text_enabled():
+        ts_query = db.func.websearch_to_tsquery(SEARCH_CONFIG, term)
+        query = query.filter(search_vector.op('@@')(ts_query))
+        if rank:
+            query = query.order_by(db.func.ts_rank(search_vector, ts_query).desc(), NGO.id)
+        return query
+
+    return apply_ilike(query, term, columns)
+
+def apply_ilike(query, term, columns=None):
+    """The substring match used where full-text search is not available"""
+    columns = columns or (NGO.name, NGO.mission, NGO.description, NGO.darpan_id)
+    return query.filter(db.or_(*[column.ilike(f'%{term}%') for column in columns]))
+
+def ensure_search_index():
+    """Add the search column and index to an existing Postgres database"""
+    if not full_text_enabled():
+        print("Full-text search needs Postgres, nothing to do")
+        return
+
+    for statement in SEARCH_VECTOR_DDL:
+        db.session.execute(db.text(statement))
+    db.session.commit()
+    print("Search index is up to date")
+
+BENCHMARK_SOURCE = 'search-benchmark'
+
+BENCHMARK_WORDS = (
+    'education', 'health', 'children', 'girls', 'women', 'rural', 'villages', 'water', 'sanitation',
+    'disaster', 'relief', 'elderly', 'care', 'animals', 'forest', 'livelihood', 'skills', 'meals',
+    'schools', 'nutrition', 'community', 'housing', 'literacy', 'hospital', 'clinics', 'farmers',
+    'tribal', 'youth', 'sports', 'disability', 'rights', 'climate', 'rivers', 'recycling', 'shelter'
+)
+
+def _synthetic_rows(rng, start, count):
+    def text(words):
+        return ' '.join(rng.choice(BENCHMARK_WORDS) for _ in range(words))
+    return [
+        {
+            'name': f'{text(2).title()} Trust {start + i}',
+            'darpan_id': f'BM/{start + i:07d}',
+            'mission': text(12),
+            'description': text(40),
+            'active': True,
+            'blacklisted': False,
+            'source': BENCHMARK_SOURCE
+        }
+        for i in range(count)
+    ]
+
+def benchmark(size=1000000, terms=('disaster relief', 'Trust 4242', 'no such ngo'), repeat=20):
+    """
+    Time the first page of /api/search through full-text search and through
+    the ILIKE scan over `size` synthetic NGOs. Point DATABASE_URL at a scratch
+    database: the rows are inserted for real (so the planner has statistics)
+    and deleted again at the end.
+    """
+    rng = random.Random(0)
+    table = NGO.__table__
+    start = time.perf_counter()
+    for offset in range(0, size, 10000):
+        db.session.execute(table.insert(), _synthetic_rows(rng, offset, min(10000, size - offset)))
+        db.session.commit()
+    if full_text_enabled():
+        db.session.execute(db.text('ANALYZE ngos'))
+        db.session.commit()
+    print(f"Inserted {size} synthetic NGOs in {time.perf_counter() - start:.0f}s")
+
+    paths = [('ILIKE', apply_ilike)]
+    if full_text_enabled():
+        paths.insert(0, ('full-text', apply_search))
+    else:
+        print("Full-text search needs Postgres, timing the ILIKE path only")
+
+    try:
+        for term in terms:
+            for label, search in paths:
+                query = search(NGO.query.filter(NGO.active == True, NGO.blacklisted == False), term)
+                latencies = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    query.limit(10).all()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                latencies.sort()
+                print(f"{term!r:>20} {label:>9}: p50 {latencies[len(latencies) // 2]:.1f} ms, "
+                      f"max {latencies[-1]:.1f} ms")
+    finally:
+        db.session.rollback()
+        db.session.execute(table.delete().where(table.c.source == BENCHMARK_SOURCE))
+        db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain or benchmark NGO full-text search')
+    parser.add_argument('--benchmark', action='store_true', help='compare full-text and ILIKE latency')
+    parser.add_argument('--size', type=int, default=1000000, help='synthetic NGOs for --benchmark')
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        if args.benchmark:
+            benchmark(args.size)
+        else:
+            ensure_search_index()
+
+if __name__ == '__main__':
+    main()
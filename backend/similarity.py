@@ -0,0 +1,364 @@
+"""
+"Similar NGOs" vector index
+Each NGO's name, mission and description are embedded on the CPU: hashed
+bag-of-words counts (see text_features.py), log/idf weighted, projected to
+SIMILARITY_DIMENSIONS dimensions with a randomized SVD fitted on a sample of NGOs, and
+L2-normalized so a dot product is the cosine similarity.
+
+The vectors live in one contiguous float32 matrix on disk that every worker
+memory-maps, so the OS page cache holds a single copy. Queries are scored
+against it in fixed-size row chunks with a running top-k. NGOs changed since
+the last build are re-embedded in memory (up to SIMILARITY_OVERLAY_MAX of
+them) and take precedence over their row in the file; rebuilding refits the
+projection and folds them in, and workers pick the new files up on their
+next query. Once more NGOs changed than that, `rebuild_due` is set and
+logged, and later changes wait for the next build. The previous generation of files
+is kept until the build after, for workers that are still switching over.
+
+Requests never build the index: until `python similarity.py` has run (from
+a deploy step or a cron job), searches raise IndexNotBuilt.
+
+    python similarity.py                          # rebuild the index from the database
+    python similarity.py --benchmark              # search latency on synthetic 100k and 1M NGO indexes
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+from sqlalchemy import func
+from models import db, NGO
+from text_features import hashed_counts, ngo_text
+from config import Config
+
+# NGOs embedded per pass while building
+BUILD_CHUNK = 1000
+# Rows scored per matrix product while searching (32 MB at 128 dimensions)
+SEARCH_CHUNK = 65536
+
+# Index files of one generation
+GENERATION_FILE = re.compile(r'^(?:vectors|ids)-([0-9a-f]+)\.npy$|^model-([0-9a-f]+)\.npz$')
+
+class IndexNotBuilt(RuntimeError):
+    """There are no index files yet; run similarity.py"""
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+def _weights(texts, idf):
+    return _normalize(np.log1p(hashed_counts(texts, len(idf))) * idf)
+
+def randomized_svd(matrix, rank, oversample=10, iterations=2, seed=0):
+    """The top `rank` right singular vectors of `matrix`, as a (columns, rank) matrix"""
+    rng = np.random.default_rng(seed)
+    sketch = matrix @ rng.standard_normal((matrix.shape[1], rank + oversample)).astype(np.float32)
+    for _ in range(iterations):
+        basis, _ = np.linalg.qr(sketch)
+        sketch = matrix @ (matrix.T @ basis)
+    basis, _ = np.linalg.qr(sketch)
+    _, _, vt = np.linalg.svd(basis.T @ matrix, full_matrices=False)
+    return vt[:rank].T
+
+def fit(texts, features, dimensions):
+    """(idf, components) of the embedding, fitted on a sample of NGO texts"""
+    counts = hashed_counts(texts, features)
+    document_frequency = (counts > 0).sum(axis=0)
+    idf = (np.log((1.0 + len(texts)) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+    weights = _normalize(np.log1p(counts) * idf)
+
+    # With fewer NGOs than dimensions the unused columns stay zero
+    components = np.zeros((features, dimensions), dtype=np.float32)
+    rank = min(dimensions, *weights.shape)
+    if rank:
+        components[:, :rank] = randomized_svd(weights, rank)
+    return idf, components
+
+def embed(texts, idf, components):
+    """(len(texts), dimensions) unit vectors"""
+    return _normalize(_weights(texts, idf) @ components).astype(np.float32)
+
+def _top_k(ids, scores, k):
+    """Keep the k best columns of each row of (queries, candidates) arrays"""
+    if scores.shape[1] <= k:
+        return ids, scores
+    keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(ids, keep, axis=1), np.take_along_axis(scores, keep, axis=1)
+
+class SimilarityIndex:
+    def __init__(self, directory, features, dimensions, sample_size, overlay_max):
+        self.directory = directory
+        self.features = features
+        self.dimensions = dimensions
+        self.sample_size = sample_size
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._version = None
+        self.ids = np.empty(0, dtype=np.int64)  # sorted, one per matrix row
+        self.vectors = np.empty((0, dimensions), dtype=np.float32)
+        self._idf = None
+        self._components = None
+        self.overlay_max = overlay_max
+        self._overlay = {}  # ngo id -> vector re-embedded since the build
+        self.rebuild_due = False  # changes were left out of the overlay
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def build(self):
+        """Refit the projection and embed every NGO into new index files; returns the NGO count"""
+        sample = db.session.query(NGO.name, NGO.mission, NGO.description).order_by(
+            func.random()
+        ).limit(self.sample_size).all()
+        idf, components = fit([ngo_text(*row) for row in sample], self.features, self.dimensions)
+        total = db.session.query(func.count(NGO.id)).scalar()
+
+        def chunks():
+            last_id, seen = 0, 0
+            while seen < total:
+                rows = db.session.query(NGO.id, NGO.name, NGO.mission, NGO.description).filter(
+                    NGO.id > last_id
+                ).order_by(NGO.id).limit(min(BUILD_CHUNK, total - seen)).all()
+                if not rows:
+                    return
+                yield (np.array([row.id for row in rows], dtype=np.int64),
+                       embed([ngo_text(row.name, row.mission, row.description) for row in rows], idf, components))
+                last_id, seen = rows[-1].id, seen + len(rows)
+
+        return self.write(idf, components, total, chunks())
+
+    def write(self, idf, components, total, chunks):
+        """
+        Write up to `total` (ids, vectors) chunks, in ascending id order, as a
+        new generation of index files and switch index.json over to it
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        generation = f'{time.time_ns():x}'
+        vectors = np.lib.format.open_memmap(
+            self._path(f'vectors-{generation}.npy'), mode='w+',
+            dtype=np.float32, shape=(max(total, 1), components.shape[1])
+        )
+        ids, count = [], 0
+        for chunk_ids, chunk_vectors in chunks:
+            vectors[count:count + len(chunk_ids)] = chunk_vectors
+            ids.append(chunk_ids)
+            count += len(chunk_ids)
+        vectors.flush()
+        del vectors
+
+        np.save(self._path(f'ids-{generation}.npy'), np.concatenate(ids) if ids else np.empty(0, dtype=np.int64))
+        np.savez(self._path(f'model-{generation}.npz'), idf=idf, components=components)
+
+        previous = self._read_meta()
+        tmp_path = self._path('index.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'generation': generation, 'count': count}, f)
+        os.replace(tmp_path, self._path('index.json'))
+
+        # Workers still switching over may be about to open the previous files,
+        # so only generations older than that one go
+        keep = {generation, previous['generation'] if previous else None}
+        for name in os.listdir(self.directory):
+            match = GENERATION_FILE.match(name)
+            if match and (match.group(1) or match.group(2)) not in keep:
+                self._remove(name)
+        return count
+
+    def _remove(self, name):
+        try:
+            os.remove(self._path(name))
+        except OSError:
+            pass
+
+    def _read_meta(self):
+        try:
+            with open(self._path('index.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _load(self, version):
+        meta = self._read_meta()
+        generation, count = meta['generation'], meta['count']
+        model = np.load(self._path(f'model-{generation}.npz'))
+        self._idf, self._components = model['idf'], model['components']
+        self.vectors = np.load(self._path(f'vectors-{generation}.npy'), mmap_mode='r')[:count]
+        self.ids = np.load(self._path(f'ids-{generation}.npy'))
+        self._overlay = {}
+        self.rebuild_due = False
+        self._version = version
+        self.loaded = True
+
+    def _current_version(self):
+        try:
+            return os.stat(self._path('index.json')).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _ensure(self):
+        version = self._current_version()
+        if self.loaded and version == self._version:
+            return
+        with self._lock:
+            version = self._current_version()
+            if version is None:
+                raise IndexNotBuilt(f'No similarity index in {self.directory}')
+            if version != self._version:
+                self._load(version)
+
+    def mark_stale(self, reason='more NGOs changed at once than are re-embedded one by one'):
+        """
+        Some changes were not re-embedded; requests never rebuild, so flag and
+        log that the index needs a build to reflect them
+        """
+        if self.loaded and not self.rebuild_due:
+            self.rebuild_due = True
+            print(f"Similar NGOs index is behind ({reason}), run similarity.py to rebuild it")
+
+    def _embed(self, ngo):
+        return embed([ngo_text(ngo.name, ngo.mission, ngo.description)], self._idf, self._components)[0]
+
+    def update_ngo(self, ngo):
+        """Re-embed an NGO after a change was committed, while the overlay has room"""
+        if not self.loaded:
+            return
+        vector = self._embed(ngo)
+        with self._lock:
+            if ngo.id in self._overlay or len(self._overlay) < self.overlay_max:
+                self._overlay[ngo.id] = vector
+                return
+        self.mark_stale(f'{self.overlay_max} NGOs changed since the last build')
+
+    def vector_for(self, ngo):
+        if ngo.id in self._overlay:
+            return self._overlay[ngo.id]
+        position = np.searchsorted(self.ids, ngo.id)
+        if position < len(self.ids) and self.ids[position] == ngo.id:
+            return self.vectors[position]
+        # Created after the last build; embedded for this query even when the overlay is full
+        self.update_ngo(ngo)
+        vector = self._overlay.get(ngo.id)
+        return vector if vector is not None else self._embed(ngo)
+
+    def search(self, queries, k):
+        """
+        The k most similar NGOs for each row of `queries`, as (ids, scores)
+        arrays of shape (queries, k), best first
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        with self._lock:
+            ids, vectors, overlay = self.ids, self.vectors, dict(self._overlay)
+        stale = np.fromiter(overlay, dtype=np.int64, count=len(overlay))
+
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+        def merge(chunk_ids, scores):
+            nonlocal best_ids, best_scores
+            chunk_ids, scores = _top_k(np.broadcast_to(chunk_ids, scores.shape), scores, k)
+            best_ids, best_scores = _top_k(
+                np.concatenate([best_ids, chunk_ids], axis=1),
+                np.concatenate([best_scores, scores], axis=1), k
+            )
+
+        for start in range(0, len(ids), SEARCH_CHUNK):
+            chunk_ids = ids[start:start + SEARCH_CHUNK]
+            # chunk @ queries.T runs as a matrix-vector product for a single query
+            scores = (vectors[start:start + SEARCH_CHUNK] @ queries.T).T
+            if len(stale):
+                scores[:, np.isin(chunk_ids, stale)] = -np.inf
+            merge(chunk_ids, scores)
+        if overlay:
+            merge(stale, queries @ np.stack(list(overlay.values())).T)
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_ids, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def similar(self, ngo, k):
+        """
+        [(ngo id, cosine similarity)] of the k NGOs closest to `ngo`, itself
+        excluded; raises IndexNotBuilt before the first build
+        """
+        self._ensure()
+        ids, scores = self.search(self.vector_for(ngo), k + 1)
+        return [
+            (int(ngo_id), float(score))
+            for ngo_id, score in zip(ids[0], scores[0])
+            if ngo_id != ngo.id and np.isfinite(score)
+        ][:k]
+
+similar_ngos = SimilarityIndex(
+    Config.SIMILARITY_INDEX_DIR,
+    Config.SIMILARITY_FEATURES,
+    Config.SIMILARITY_DIMENSIONS,
+    Config.SIMILARITY_SVD_SAMPLE,
+    Config.SIMILARITY_OVERLAY_MAX
+)
+
+def benchmark(sizes=(100000, 1000000), queries=200, batch=32):
+    """Search latency over synthetic indexes; needs about 0.5 GB of disk per million NGOs"""
+    dimensions = Config.SIMILARITY_DIMENSIONS
+    rng = np.random.default_rng(0)
+    directory = tempfile.mkdtemp(prefix='similarity-benchmark-')
+    try:
+        for size in sizes:
+            index = SimilarityIndex(directory, Config.SIMILARITY_FEATURES, dimensions, 0, Config.SIMILARITY_OVERLAY_MAX)
+
+            def chunks():
+                for start in range(0, size, SEARCH_CHUNK):
+                    rows = min(SEARCH_CHUNK, size - start)
+                    yield (np.arange(start + 1, start + rows + 1, dtype=np.int64),
+                           _normalize(rng.standard_normal((rows, dimensions), dtype=np.float32)))
+
+            start = time.perf_counter()
+            index.write(np.ones(Config.SIMILARITY_FEATURES, dtype=np.float32),
+                        np.zeros((Config.SIMILARITY_FEATURES, dimensions), dtype=np.float32),
+                        size, chunks())
+            index._ensure()
+            print(f"{size} NGOs x {dimensions} dims: wrote index in {time.perf_counter() - start:.1f}s")
+
+            probes = _normalize(rng.standard_normal((queries, dimensions), dtype=np.float32))
+            index.search(probes[:1], 10)  # fault the matrix into the page cache
+
+            latencies = []
+            for probe in probes:
+                start = time.perf_counter()
+                index.search(probe, 10)
+                latencies.append(time.perf_counter() - start)
+            latencies = np.array(latencies) * 1000
+            print(f"  single query: p50 {np.percentile(latencies, 50):.1f} ms, "
+                  f"p95 {np.percentile(latencies, 95):.1f} ms")
+
+            start = time.perf_counter()
+            for offset in range(0, queries, batch):
+                index.search(probes[offset:offset + batch], 10)
+            elapsed = time.perf_counter() - start
+            print(f"  batches of {batch}: {queries / elapsed:.0f} queries/sec")
+            del index
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or benchmark the similar-NGOs index')
+    parser.add_argument('--benchmark', action='store_true', help='time searches over synthetic indexes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000],
+                        help='synthetic index sizes for --benchmark')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.sizes)
+        return
+
+    from app import app
+    with app.app_context():
+        start = time.time()
+        count = similar_ngos.build()
+        elapsed = max(time.time() - start, 1e-6)
+        print(f"Indexed {count} NGOs in {elapsed:.1f}s, {count / elapsed:.0f} NGOs/sec")
+
+if __name__ == '__main__':
+    main()
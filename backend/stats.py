@@ -0,0 +1,156 @@
+"""
+Directory statistics
+In-process counters behind /api/stats. They are filled from grouped
+aggregates, adjusted by the write routes as NGOs change, and reconciled
+against the database every Config.STATS_RECONCILE_SECONDS to correct drift
+(events moving into the past, races), and whenever the data versions the
+response is tagged with moved since the last reconcile (writes made by
+other workers), so a body always reflects at least the versions in its ETag.
+"""
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from models import db, NGO, Category, VolunteerPost, Event, ngo_categories
+from config import Config
+
+def ngo_snapshot(ngo):
+    """
+    What an NGO contributes to the counters; take one before and one after a change
+    """
+    return (
+        ngo.id,
+        bool(ngo.active),
+        bool(ngo.verified),
+        bool(ngo.blacklisted),
+        ngo.state,
+        tuple(cat.name for cat in ngo.categories)
+    )
+
+def naive_utc(value):
+    """A datetime as naive UTC, the way the database stores them"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class StatsCounters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reconciled_at = None
+        self._versions = None  # the data versions the last reconcile saw
+        self.total_ngos = 0
+        self.verified_ngos = 0
+        self.blacklisted_ngos = 0
+        self.total_volunteers = 0
+        self.upcoming_events = 0
+        self.categories = Counter()
+        self.states = Counter()
+
+    def reconcile(self, versions=None):
+        """Recompute every counter from the database, as of `versions` read just before"""
+        listed = db.and_(NGO.active == True, NGO.blacklisted == False)
+
+        total, verified, blacklisted = db.session.query(
+            db.func.count(db.case((listed, NGO.id))),
+            db.func.count(db.case((db.and_(listed, NGO.verified == True), NGO.id))),
+            db.func.count(db.case((NGO.blacklisted == True, NGO.id)))
+        ).one()
+
+        categories = db.session.query(
+            Category.name, db.func.count(ngo_categories.c.ngo_id)
+        ).join(
+            ngo_categories, ngo_categories.c.category_id == Category.id
+        ).join(
+            NGO, NGO.id == ngo_categories.c.ngo_id
+        ).filter(listed).group_by(Category.id, Category.name).order_by(Category.id).all()
+
+        states = db.session.query(
+            NGO.state, db.func.count(NGO.id)
+        ).filter(listed, NGO.state.isnot(None)).group_by(NGO.state).all()
+
+        volunteers = VolunteerPost.query.join(NGO).filter(
+            VolunteerPost.active == True,
+            NGO.blacklisted == False
+        ).count()
+        events = Event.query.join(NGO).filter(
+            Event.event_date >= datetime.utcnow(),
+            NGO.blacklisted == False
+        ).count()
+
+        with self._lock:
+            self.total_ngos = total
+            self.verified_ngos = verified
+            self.blacklisted_ngos = blacklisted
+            self.total_volunteers = volunteers
+            self.upcoming_events = events
+            self.categories = Counter(dict(categories))
+            self.states = Counter(dict(states))
+            self._reconciled_at = time.monotonic()
+            self._versions = versions
+
+    def reconcile_if_stale(self, versions=None):
+        if (self._reconciled_at is None
+                or time.monotonic() - self._reconciled_at >= Config.STATS_RECONCILE_SECONDS
+                or (versions is not None and versions != self._versions)):
+            self.reconcile(versions)
+
+    def _apply(self, snapshot, sign):
+        ngo_id, active, verified, blacklisted, state, categories = snapshot
+
+        if active and not blacklisted:
+            self.total_ngos += sign
+            if verified:
+                self.verified_ngos += sign
+            if state:
+                self.states[state] += sign
+            for name in categories:
+                self.categories[name] += sign
+
+        if blacklisted:
+            self.blacklisted_ngos += sign
+
+    def record_ngo_change(self, before, after):
+        """
+        Move an NGO's contribution from one snapshot to another
+        `before` is None for a new NGO
+        """
+        # Volunteer posts and events only count for NGOs that are not blacklisted
+        volunteers = events = 0
+        if before is not None and before[3] != after[3]:
+            ngo_id, blacklisted = after[0], after[3]
+            volunteers = VolunteerPost.query.filter_by(ngo_id=ngo_id, active=True).count()
+            events = Event.query.filter(Event.ngo_id == ngo_id, Event.event_date >= datetime.utcnow()).count()
+            if blacklisted:
+                volunteers, events = -volunteers, -events
+
+        with self._lock:
+            if before is not None:
+                self._apply(before, -1)
+            self._apply(after, +1)
+            self.total_volunteers += volunteers
+            self.upcoming_events += events
+
+    def record_volunteer_post(self, post):
+        if post.active and not post.ngo.blacklisted:
+            with self._lock:
+                self.total_volunteers += 1
+
+    def record_event(self, event):
+        # Clients may post offset-aware dates, which cannot be compared with utcnow()
+        if naive_utc(event.event_date) >= datetime.utcnow() and not event.ngo.blacklisted:
+            with self._lock:
+                self.upcoming_events += 1
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'total_ngos': self.total_ngos,
+                'verified_ngos': self.verified_ngos,
+                'blacklisted_ngos': self.blacklisted_ngos,
+                'total_volunteers': self.total_volunteers,
+                'upcoming_events': self.upcoming_events,
+                'categories': [{'name': name, 'count': count} for name, count in self.categories.items() if count > 0],
+                'states': [{'name': name, 'count': count} for name, count in self.states.items() if count > 0]
+            }
+
+stats_counters = StatsCounters()
@@ -0,0 +1,47 @@
+"""
+Text features for the local NLP helpers
+Tokenizes NGO text and maps it into a fixed-width hashed bag of words, so
+models need no stored vocabulary and unseen words never change the feature
+space. Hashing uses crc32, which unlike hash() is stable across processes.
+"""
+import re
+import zlib
+from functools import lru_cache
+import numpy as np
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+STOPWORDS = frozenset('''
+a an and are as at be by for from has have in into is it its of on or our
+that the their this to was we were which who will with through across all
+also more most other over such than them they these those very india ngo
+ngos foundation trust society organization organisation
+'''.split())
+
+def tokenize(text):
+    """Lowercased words of a text, without stopwords and single characters"""
+    if not text:
+        return []
+    return [token for token in TOKEN_RE.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+@lru_cache(maxsize=200000)
+def _bucket(token, dim):
+    return zlib.crc32(token.encode()) % dim
+
+def ngo_text(name=None, mission=None, description=None):
+    return ' '.join(part for part in (name, mission, description) if part)
+
+def hashed_counts(texts, dim):
+    """
+    Term counts of each text in `dim` hashed buckets, as a dense float32
+    (len(texts), dim) matrix; callers feed it chunks of a few thousand texts
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    rows, columns = [], []
+    for row, text in enumerate(texts):
+        for token in tokenize(text):
+            rows.append(row)
+            columns.append(_bucket(token, dim))
+    if rows:
+        np.add.at(matrix, (np.array(rows), np.array(columns)), 1.0)
+    return matrix
@@ -6,6 +6,9 @@ import { ngoAPI, categoryAPI, type NGO, type Category } from '@/lib/api';
 import { MapPin, CheckCircle, ExternalLink, Mail, Phone, Search, Filter, Heart } from 'lucide-react';
 import Link from 'next/link';
 
+// Only what the directory cards render; keeps list payloads small
+const LIST_FIELDS = 'id,name,mission,city,state,email,phone,website,verified,transparency_score,categories';
+
 export default function NGOsPage() {
   const searchParams = useSearchParams();
   const [ngos, setNgos] = useState<NGO[]>([]);
@@ -43,7 +46,7 @@ export default function NGOsPage() {
   const loadNGOs = async () => {
     setLoading(true);
     try {
-      const params: any = { page: pagination.current };
+      const params: any = { page: pagination.current, fields: LIST_FIELDS };
       if (filters.search) params.search = filters.search;
       if (filters.category) params.category = filters.category;
       if (filters.state) params.state = filters.state;
@@ -42,6 +42,7 @@ export interface NGO {
   verified: boolean;
   blacklisted: boolean;
   transparency_score: number;
+  enrichment_status?: 'pending' | 'running' | 'done' | 'failed' | 'skipped' | null;
   categories: Category[];
   office_bearers?: OfficeBearer[];
   blacklist_info?: BlacklistInfo;
@@ -128,8 +129,29 @@ export const authAPI = {
 export const ngoAPI = {
   getAll: (params?: any) => api.get<{ ngos: NGO[]; total: number; pages: number }>('/ngos', { params }),
   getById: (id: number) => api.get<NGO>(`/ngos/${id}`),
+  getEnrichment: (id: number) =>
+    api.get<{ id: number; status: NGO['enrichment_status']; error: string | null }>(`/ngos/${id}/enrichment`),
   getMapData: (params?: any) => api.get<MapNGO[]>('/ngos/map', { params }),
+  getNearby: (params: { lat: number; lng: number; radius_km?: number; k?: number; [key: string]: any }) =>
+    api.get<{ ngos: (NGO & { distance_km: number })[] }>('/ngos/nearby', { params }),
+  getSimilar: (id: number, params?: { limit?: number; [key: string]: any }) =>
+    api.get<{ ngos: (NGO & { similarity: number })[] }>(`/ngos/${id}/similar`, { params }),
+  export: (params: { format: 'csv' | 'ndjson'; [key: string]: any }) =>
+    api.get<Blob>('/ngos/export', { params, responseType: 'blob' }),
   create: (data: any) => api.post<NGO>('/ngos', data),
+  import: (file: Blob, format: 'csv' | 'ndjson') =>
+    api.post<{
+      rows: number;
+      saved: number;
+      failed: number;
+      errors: { line: number; message: string }[];
+      errors_truncated: boolean;
+      seconds: number;
+      rows_per_sec: number;
+    }>('/ngos/import', file, {
+      params: { format },
+      headers: { 'Content-Type': format === 'csv' ? 'text/csv' : 'application/x-ndjson' },
+    }),
   update: (id: number, data: any) => api.put<NGO>(`/ngos/${id}`, data),
   verify: (id: number) => api.post(`/ngos/${id}/verify`),
   blacklist: (id: number, data: any) => api.post(`/ngos/${id}/blacklist`, data),
@@ -168,4 +190,15 @@ export const searchAPI = {
   search: (query: string) => api.get<{ results: NGO[] }>('/search', { params: { q: query } }),
 };
 
+// Autocomplete
+export interface Suggestion {
+  id: number | null;
+  label: string;
+  type: 'ngo' | 'darpan_id' | 'state' | 'city' | 'district';
+}
+
+export const autocompleteAPI = {
+  suggest: (query: string) => api.get<{ results: Suggestion[] }>('/autocomplete', { params: { q: query } }),
+};
+
 export default api;
\ No newline at end of file
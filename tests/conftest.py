@@ -0,0 +1,103 @@
+"""
+Shared fixtures: the Flask app on a throwaway SQLite database, with every
+per-process cache reset between tests
+
+    pip install -r backend/requirements-dev.txt
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+# Config reads the environment on import, so this has to come first
+TMP_DIR = tempfile.mkdtemp(prefix='ngo-tests-')
+os.environ.update(
+    DATABASE_URL='sqlite:///' + os.path.join(TMP_DIR, 'ngo.db'),
+    GROQ_API_KEY='',
+    PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+    LLM_CACHE_PATH=os.path.join(TMP_DIR, 'llm_cache.db'),
+    SCORING_STATE_PATH=os.path.join(TMP_DIR, 'scoring_state.json'),
+    SIMILARITY_INDEX_DIR=os.path.join(TMP_DIR, 'similarity_index'),
+    SCRAPER_CHECKPOINT_DIR=os.path.join(TMP_DIR, 'scrape_checkpoints'),
+    INDEX_SYNC_SECONDS='0',
+)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+import pytest
+from app import app as flask_app, ngo_index_sync
+from models import db, NGO, Category, User
+from auth import claims_cache, issue_token
+from autocomplete import autocomplete_index
+from geo import map_clusters
+from stats import stats_counters
+from similarity import similar_ngos
+from fragment_cache import fragment_cache
+from category_classifier import category_classifier
+from config import Config
+
+CATEGORY_NAMES = ('Education', 'Health', 'Environment', 'Child Welfare')
+
+def _reset_caches():
+    fragment_cache.clear()
+    claims_cache.clear()
+    autocomplete_index.loaded = False
+    if map_clusters._building is not None:
+        map_clusters._building.join(5)
+    map_clusters.loaded = False
+    ngo_index_sync._version = ngo_index_sync._checked_at = None
+    stats_counters._reconciled_at = None
+    similar_ngos.loaded = False
+    if category_classifier._training is not None:
+        category_classifier._training.join(5)
+    category_classifier.weights = None
+    category_classifier._trained_at = 0
+    shutil.rmtree(Config.SIMILARITY_INDEX_DIR, ignore_errors=True)
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        _reset_caches()
+        db.session.add_all([
+            Category(name=name, slug=name.lower().replace(' ', '-')) for name in CATEGORY_NAMES
+        ])
+        db.session.commit()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def make_ngo(name, categories=(), **fields):
+    """Add and commit one NGO"""
+    ngo = NGO(name=name, **fields)
+    if categories:
+        ngo.categories = Category.query.filter(Category.name.in_(categories)).all()
+    db.session.add(ngo)
+    db.session.commit()
+    return ngo
+
+def make_user(email, password='password123', role='user'):
+    user = User(email=email, name=email.split('@')[0], role=role)
+    user.set_password(password)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def get_clusters(client, query):
+    """Map clusters once the background build the first request starts has finished"""
+    response = client.get(f'/api/ngos/map?{query}')
+    if response.status_code == 503:
+        map_clusters._building.join(5)
+        response = client.get(f'/api/ngos/map?{query}')
+    assert response.status_code == 200
+    return response.get_json()['clusters']
+
+@pytest.fixture
+def admin_headers(app):
+    admin = make_user('admin@example.com', role='admin')
+    return {'Authorization': 'Bearer ' + issue_token(admin, app.config['SECRET_KEY'])}
@@ -0,0 +1,65 @@
+from conftest import make_user
+
+def login(client, email, password='password123'):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return response.status_code, response.get_json()
+
+def test_logout_revokes_issued_tokens(client):
+    make_user('volunteer@example.com')
+    _, first = login(client, 'volunteer@example.com')
+    _, second = login(client, 'volunteer@example.com')
+    headers = {'Authorization': 'Bearer ' + first['token']}
+
+    assert client.post('/api/auth/logout', headers=headers).status_code == 200
+
+    # Both tokens predate the logout
+    assert client.post('/api/auth/logout', headers=headers).status_code == 401
+    assert client.post('/api/auth/logout', headers={'Authorization': 'Bearer ' + second['token']}).status_code == 401
+
+    _, fresh = login(client, 'volunteer@example.com')
+    assert client.post('/api/auth/logout', headers={'Authorization': 'Bearer ' + fresh['token']}).status_code == 200
+
+def test_wrong_password_is_rejected(client):
+    make_user('volunteer@example.com')
+    status, _ = login(client, 'volunteer@example.com', 'wrong')
+    assert status == 401
+
+def test_demoted_admin_loses_access_before_the_token_expires(client, admin_headers):
+    from models import db, User
+    assert client.get('/api/ngos/1/enrichment').status_code == 404
+    assert client.post('/api/ngos/1/verify', headers=admin_headers).status_code == 404
+
+    User.query.filter_by(email='admin@example.com').one().role = 'user'
+    db.session.commit()
+    assert client.post('/api/ngos/1/verify', headers=admin_headers).status_code == 403
+
+def test_claims_cache_sweeps_expired_entries(monkeypatch):
+    import auth
+    clock = [1000.0]
+    monkeypatch.setattr(auth.time, 'monotonic', lambda: clock[0])
+    cache = auth.ClaimsCache(ttl=60)
+
+    for user_id in range(100):
+        cache.put(user_id, 'user', 0)
+    assert len(cache) == 100
+
+    clock[0] += 61
+    assert cache.get(1) is None
+    cache.put(1000, 'user', 0)
+    assert len(cache) == 1
+    assert cache.get(1000) == ('user', 0)
+
+def test_full_hashing_queue_answers_503(client, monkeypatch):
+    import models
+    from hashing import PasswordHasher
+    make_user('volunteer@example.com')
+
+    monkeypatch.setattr(models, 'password_hasher', PasswordHasher(1, 0, 'pbkdf2:sha256:1000', 1))
+    response = client.post('/api/auth/login', json={'email': 'volunteer@example.com', 'password': 'password123'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+    # Without a pool hashes run inline and are never turned away
+    monkeypatch.setattr(models, 'password_hasher', PasswordHasher(0, 0, 'pbkdf2:sha256:1000', 1))
+    status, _ = login(client, 'volunteer@example.com')
+    assert status == 200
@@ -0,0 +1,120 @@
+import csv
+import io
+import pytest
+from models import db, NGO, FetchState
+import bulk_writer
+from bulk_writer import NGOBatchWriter, StagedNGOWriter, UnsupportedDialect
+from fetch_state import FetchStateStore
+
+RECORD = {
+    'name': 'Goonj',
+    'darpan_id': 'DL/2017/0123456',
+    'mission': 'Clothing as a tool for development',
+    'city': 'New Delhi',
+    'state': 'Delhi',
+    'categories': ['Health'],
+}
+
+def write(*records, source='test'):
+    writer = NGOBatchWriter(batch_size=10)
+    for record in records:
+        writer.add(dict(record), source)
+    writer.flush()
+    return writer
+
+def stored():
+    db.session.expire_all()
+    return NGO.query.filter_by(darpan_id=RECORD['darpan_id']).one()
+
+def test_upsert_inserts_then_updates_on_the_natural_key(app):
+    write(RECORD)
+    first = stored()
+    assert [category.name for category in first.categories] == ['Health']
+    assert first.transparency_score > 0
+
+    write(dict(RECORD, city='Mumbai', categories=['Education']))
+    assert NGO.query.count() == 1
+    ngo = stored()
+    assert ngo.city == 'Mumbai'
+    assert sorted(category.name for category in ngo.categories) == ['Education', 'Health']
+
+def test_unchanged_rows_keep_their_updated_at(app):
+    write(RECORD)
+    updated_at = stored().updated_at
+
+    write(RECORD)
+    assert stored().updated_at == updated_at
+
+    write(dict(RECORD, mission='Disaster relief'))
+    assert stored().updated_at > updated_at
+
+def test_missing_fields_leave_stored_values_alone(app):
+    write(RECORD)
+    write({'name': 'Goonj', 'darpan_id': RECORD['darpan_id'], 'city': None})
+    assert stored().city == 'New Delhi'
+
+def test_records_without_keys_match_on_name(app):
+    write({'name': 'Nanhi Kali', 'city': 'Mumbai'}, {'name': 'Nanhi Kali', 'city': 'Pune'})
+    write({'name': 'Nanhi Kali', 'state': 'Maharashtra'})
+    ngo = NGO.query.filter_by(name='Nanhi Kali').one()
+    assert (ngo.city, ngo.state) == ('Pune', 'Maharashtra')
+
+def test_a_bad_row_only_loses_itself(app):
+    errors = []
+    writer = NGOBatchWriter(batch_size=10, on_error=lambda ngo_data, e: errors.append(ngo_data['name']))
+    writer.add(dict(RECORD), 'test')
+    writer.add({'name': None, 'registration_no': 'REG-1'}, 'test')
+    writer.flush()
+    assert (writer.saved, writer.failed) == (1, 1)
+    assert errors == [None]
+    assert NGO.query.count() == 1
+
+def test_unsupported_databases_fail_the_batch_once(app, monkeypatch):
+    monkeypatch.setattr(bulk_writer, '_DIALECT_INSERTS', {})
+    errors = []
+    writer = NGOBatchWriter(batch_size=10, on_error=lambda ngo_data, e: errors.append(e))
+    writer.add(dict(RECORD), 'test')
+    with pytest.raises(UnsupportedDialect):
+        writer.flush()
+    assert errors == [] and writer.failed == 0
+    assert NGO.query.count() == 0
+
+def test_page_state_is_saved_only_when_all_its_records_are(app):
+    fetch_state = FetchStateStore()
+    writer = NGOBatchWriter(batch_size=10, fetch_state=fetch_state)
+    for page in ('/good', '/bad', '/empty'):
+        fetch_state.stage(page, 'digest', etag=f'"{page}"')
+    writer.add_page('/good', [dict(RECORD)], 'test')
+    writer.add_page('/bad', [{'name': 'Pratham', 'registration_no': 'REG-2'}, {'name': None, 'registration_no': 'REG-1'}], 'test')
+    writer.add_page('/empty', [], 'test')
+    writer.flush()
+
+    assert (writer.saved, writer.failed) == (2, 1)
+    assert sorted(writer.take_committed_pages()) == ['/empty', '/good']
+    assert writer.take_committed_pages() == []
+    assert {key for key, in db.session.query(FetchState.key) if key.startswith('/')} == {'/empty', '/good'}
+    # The failed page is fetched unconditionally next time
+    assert fetch_state.conditional_headers('/bad') == {}
+    assert fetch_state.conditional_headers('/good') == {'If-None-Match': '"/good"'}
+
+class FakeCopyCursor:
+    def copy_expert(self, sql, buffer):
+        self.sql, self.data = sql, buffer.read()
+
+    def close(self):
+        pass
+
+def test_staged_writer_copies_rows_as_csv(app):
+    # The COPY and merge need Postgres; this checks what is sent to it
+    cursor = FakeCopyCursor()
+    connection = type('Connection', (), {'connection': type('Raw', (), {'cursor': lambda self: cursor})()})()
+    writer = StagedNGOWriter()
+    row = dict.fromkeys(StagedNGOWriter.STAGED_FIELDS)
+    row.update(name='Goonj, "Delhi"', description='Two\nlines', founded_year=1999)
+    writer._copy(connection, [row])
+
+    assert cursor.sql.startswith('COPY ngo_import_staging (name, registration_no, ')
+    assert cursor.sql.endswith('FROM STDIN WITH (FORMAT csv)')
+    fields = next(csv.reader(io.StringIO(cursor.data)))
+    assert fields[:2] == ['Goonj, "Delhi"', '']
+    assert dict(zip(StagedNGOWriter.STAGED_FIELDS, fields))['description'] == 'Two\nlines'
@@ -0,0 +1,58 @@
+import threading
+import numpy as np
+import pytest
+from category_classifier import category_classifier
+from conftest import make_ngo
+
+def categorized():
+    for i in range(3):
+        make_ngo(f'Clinic {i}', ['Health'], mission='Free health camps, clinics and medicines for patients')
+        make_ngo(f'School {i}', ['Education'], mission='Schools, teachers and books for children to read')
+
+def test_requests_never_wait_for_training(app, monkeypatch):
+    categorized()
+    started, release = threading.Event(), threading.Event()
+    real_rebuild = category_classifier.rebuild
+    rebuilds = []
+    def slow_rebuild():
+        rebuilds.append(1)
+        started.set()
+        release.wait(5)
+        real_rebuild()
+    monkeypatch.setattr(category_classifier, 'rebuild', slow_rebuild)
+
+    # Training runs on its own thread; until it publishes, there is no answer
+    assert category_classifier.suggest('Health camps') == ([], 0.0)
+    assert started.wait(5)
+    assert category_classifier.suggest('Health camps') == ([], 0.0)
+    release.set()
+    category_classifier._training.join(5)
+
+    assert category_classifier.suggest('Clinics and medicines')[0][0] == 'Health'
+    assert len(rebuilds) == 1
+
+def test_an_empty_training_set_is_not_retrained_on_every_call(app, monkeypatch):
+    make_ngo('Uncategorized', mission='Health camps in villages')
+    category_classifier.rebuild()
+    monkeypatch.setattr(category_classifier, 'rebuild', lambda: pytest.fail('retrained'))
+    for _ in range(3):
+        assert category_classifier.suggest('Health camps') == ([], 0.0)
+
+def test_published_weights_are_immutable(app):
+    categorized()
+    category_classifier.rebuild()
+    weights = category_classifier.weights
+    assert 'Health' in weights.names
+    with pytest.raises(ValueError):
+        weights.log_prior[0] = np.float32(0)
+
+def test_new_ngos_are_categorized_locally_without_an_llm(client, admin_headers):
+    categorized()
+    category_classifier.rebuild()
+
+    response = client.post('/api/ngos', headers=admin_headers, json={
+        'name': 'Village Health Trust', 'mission': 'Mobile clinics and medicines for rural patients'
+    })
+    assert response.status_code == 201
+    assert response.get_json()['enrichment_status'] == 'skipped'
+    assert [category['name'] for category in response.get_json()['categories']] == ['Health']
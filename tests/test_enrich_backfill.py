@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from groq import Groq
+from models import db, NGO
+from ai_service import ai_service
+from enrich_backfill import Backfill
+from conftest import make_ngo
+
+class FakeGroq:
+    """
+    The chat completions endpoint, answering batched enrichment prompts; it
+    fails the first `failures` calls and never answers for NGOs named 'Ignored'
+    """
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.prompts = []  # NGO ids of each answered prompt
+
+        fake = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                if fake.failures > 0:
+                    fake.failures -= 1
+                    self.send_response(500)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                prompt = body['messages'][-1]['content']
+                ngos = json.loads(prompt.split('NGOs:\n', 1)[1].split('\n\nReturn', 1)[0])
+                fake.prompts.append([ngo['id'] for ngo in ngos])
+                items = [
+                    {'id': ngo['id'], 'summary': f"Summary {ngo['id']}", 'categories': ['Health', 'Unknown']}
+                    for ngo in ngos if 'Ignored' not in (ngo['mission'] or '')
+                ]
+                reply = {
+                    'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': int(time.time()),
+                    'model': body['model'],
+                    'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {
+                        'role': 'assistant', 'content': 'Here you go:\n```json\n' + json.dumps(items) + '\n```'
+                    }}],
+                    'usage': {'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15}
+                }
+                data = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def fake_groq(monkeypatch):
+    fake = FakeGroq(failures=1)
+    monkeypatch.setattr(ai_service, 'client', Groq(api_key='test', base_url=fake.url, max_retries=0))
+    yield fake
+    fake.close()
+
+def backfill():
+    return Backfill(workers=2, rate=1000, tokens_per_minute=10 ** 6, per_prompt=2,
+                    max_prompt_tokens=6000, write_batch=2, max_attempts=3, retry_delay=0)
+
+def test_backfill_enriches_imported_and_failed_ngos(app, fake_groq):
+    imported = make_ngo('Goonj', description='Clothing drives', mission='Relief').id
+    failed = make_ngo('Pratham', mission='Reading classes', enrichment_status='failed').id
+    ignored = make_ngo('Smile', mission='Ignored by the model').id
+    make_ngo('Skipped', enrichment_status='skipped', mission='No LLM then')
+    make_ngo('Done', enrichment_status='done', mission='Already enriched')
+
+    run = backfill()
+    run.run()
+    db.session.expire_all()
+    assert (run.enriched, run.failed) == (2, 1)
+    assert sorted(ngo_id for prompt in fake_groq.prompts for ngo_id in prompt) == sorted([imported, failed, ignored])
+
+    goonj = db.session.get(NGO, imported)
+    assert (goonj.enrichment_status, goonj.description) == ('done', f'Summary {imported}')
+    assert [category.name for category in goonj.categories] == ['Health']
+    # Without a description there is nothing to replace with the summary
+    assert db.session.get(NGO, failed).description is None
+    assert db.session.get(NGO, ignored).enrichment_status == 'failed'
+
+def test_backfill_leaves_the_live_queue_alone(app, fake_groq):
+    make_ngo('Queued', mission='Health camps', enrichment_status='pending')
+    make_ngo('Enriching', mission='Health camps', enrichment_status='running')
+
+    run = backfill()
+    run.run()
+    assert fake_groq.prompts == []
+    assert {ngo.enrichment_status for ngo in NGO.query} == {'pending', 'running'}
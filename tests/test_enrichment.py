@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+import pytest
+from models import db, NGO
+from ai_service import ai_service
+from enrichment import EnrichmentQueue
+from conftest import make_ngo
+
+@pytest.fixture
+def llm(monkeypatch):
+    """A configured LLM that answers instantly and counts its calls"""
+    calls = []
+    monkeypatch.setattr(ai_service, 'client', object())
+    monkeypatch.setattr(ai_service, 'generate_summary', lambda text, strict=False: calls.append(text) or 'Summary')
+    monkeypatch.setattr(ai_service, 'suggest_categories', lambda mission, strict=False: ['Health'])
+    return calls
+
+def queue(app, on_enriched=None):
+    enrichment_queue = EnrichmentQueue(workers=1, max_attempts=3, retry_delay=0, stale_after=600)
+    enrichment_queue.init_app(app, on_enriched)
+    return enrichment_queue
+
+def status(ngo_id):
+    db.session.expire_all()
+    return db.session.get(NGO, ngo_id).enrichment_status
+
+def test_a_failing_callback_does_not_redo_the_enrichment(app, llm):
+    ngo_id = make_ngo('Goonj', description='Clothing drives', mission='Health camps', enrichment_status='pending').id
+    callbacks = []
+    def on_enriched(ngo, before):
+        callbacks.append(ngo.id)
+        raise RuntimeError('index refresh failed')
+
+    queue(app, on_enriched)._run(ngo_id)
+    assert (status(ngo_id), llm, callbacks) == ('done', ['Clothing drives'], [ngo_id])
+    assert [category.name for category in db.session.get(NGO, ngo_id).categories] == ['Health']
+
+def test_an_ngo_is_enriched_once_however_often_it_is_queued(app, llm):
+    ngo_id = make_ngo('Goonj', description='Clothing drives', enrichment_status='pending').id
+    enrichment_queue = queue(app)
+    enrichment_queue._run(ngo_id)
+    enrichment_queue._run(ngo_id)
+    assert llm == ['Clothing drives']
+
+def test_pending_and_abandoned_ngos_are_queued_again_once(app, llm, monkeypatch):
+    long_ago = datetime.utcnow() - timedelta(hours=1)
+    pending = make_ngo('Pending', enrichment_status='pending').id
+    abandoned = make_ngo('Abandoned', enrichment_status='running', updated_at=long_ago).id
+    make_ngo('Running', enrichment_status='running')
+    make_ngo('Done', enrichment_status='done', updated_at=long_ago)
+
+    enrichment_queue = queue(app)
+    submitted = []
+    monkeypatch.setattr(enrichment_queue, 'submit', submitted.append)
+    enrichment_queue.resume_pending()
+    enrichment_queue.resume_pending()
+    assert submitted == [pending, abandoned]
+    assert status(abandoned) == 'pending'
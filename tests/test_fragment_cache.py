@@ -0,0 +1,76 @@
+import json
+from models import db, Category, OfficeBearer
+from fragment_cache import FragmentCache, fragment_cache, render_ngos
+from conftest import make_ngo
+
+def cached_ngo_ids():
+    return set(fragment_cache._keys_by_ngo)
+
+def rendered(ngos):
+    return [json.loads(fragment) for fragment in render_ngos(ngos)]
+
+def test_least_recently_used_fragments_go_first():
+    cache = FragmentCache(max_bytes=10)
+    cache.put((1, 'a'), b'1111')
+    cache.put((2, 'a'), b'2222')
+    assert cache.get((1, 'a')) == b'1111'
+
+    cache.put((3, 'a'), b'3333')
+    assert cache.get((2, 'a')) is None
+    assert cache.get((1, 'a')) == b'1111' and cache.get((3, 'a')) == b'3333'
+    assert cache._size == 8 and set(cache._keys_by_ngo) == {1, 3}
+
+def test_fragments_larger_than_the_cache_are_not_kept():
+    cache = FragmentCache(max_bytes=10)
+    cache.put((1, 'a'), b'1111')
+    cache.put((2, 'a'), b'x' * 11)
+    assert cache.get((2, 'a')) is None
+    assert cache.get((1, 'a')) == b'1111'
+
+def test_replacing_and_invalidating_keep_the_size_right():
+    cache = FragmentCache(max_bytes=10)
+    cache.put((1, 'a'), b'1111')
+    cache.put((1, 'a'), b'11')
+    cache.put((1, 'b'), b'111')
+    assert cache._size == 5
+
+    cache.invalidate(1)
+    assert cache._size == 0 and cache.get((1, 'b')) is None
+    assert cache._keys_by_ngo == {}
+
+def test_ngo_change_drops_its_fragments(app):
+    goonj, pratham = make_ngo('Goonj'), make_ngo('Pratham')
+    rendered([goonj, pratham])
+    assert cached_ngo_ids() == {goonj.id, pratham.id}
+
+    goonj.city = 'Delhi'
+    db.session.commit()
+    assert cached_ngo_ids() == {pratham.id}
+    assert rendered([goonj])[0]['city'] == 'Delhi'
+
+def test_office_bearer_change_drops_its_ngos_fragments(app):
+    goonj, pratham = make_ngo('Goonj'), make_ngo('Pratham')
+    rendered([goonj, pratham])
+
+    db.session.add(OfficeBearer(ngo_id=goonj.id, name='Anshu Gupta', designation='Founder'))
+    db.session.commit()
+    assert cached_ngo_ids() == {pratham.id}
+    assert [bearer['name'] for bearer in rendered([goonj])[0]['office_bearers']] == ['Anshu Gupta']
+
+def test_category_change_drops_every_fragment(app):
+    goonj, pratham = make_ngo('Goonj', categories=('Health',)), make_ngo('Pratham')
+    rendered([goonj, pratham])
+
+    Category.query.filter_by(name='Health').one().name = 'Public Health'
+    db.session.commit()
+    assert cached_ngo_ids() == set()
+    assert [cat['name'] for cat in rendered([goonj])[0]['categories']] == ['Public Health']
+
+def test_rolled_back_changes_keep_the_fragments(app):
+    goonj = make_ngo('Goonj')
+    rendered([goonj])
+
+    goonj.city = 'Delhi'
+    db.session.flush()
+    db.session.rollback()
+    assert cached_ngo_ids() == {goonj.id}
@@ -0,0 +1,83 @@
+import pytest
+from conftest import make_ngo, get_clusters
+from geo import map_clusters
+from config import Config
+
+DELHI = (28.61, 77.21)
+
+def nearby(client, **params):
+    query = '&'.join(f'{key}={value}' for key, value in params.items())
+    return client.get(f'/api/ngos/nearby?lat={DELHI[0]}&lng={DELHI[1]}&{query}')
+
+def test_nearby_orders_by_distance_and_respects_the_radius(client):
+    make_ngo('Noida', latitude=28.54, longitude=77.39)       # ~19 km
+    make_ngo('Connaught Place', latitude=28.63, longitude=77.22)
+    make_ngo('Jaipur', latitude=26.91, longitude=75.79)      # ~235 km
+
+    names = [ngo['name'] for ngo in nearby(client, radius_km=50).get_json()['ngos']]
+    assert names == ['Connaught Place', 'Noida']
+
+    ngos = nearby(client, k=3).get_json()['ngos']
+    assert [ngo['name'] for ngo in ngos] == ['Connaught Place', 'Noida', 'Jaipur']
+    assert 200 < ngos[-1]['distance_km'] < 270
+
+def test_radius_is_capped(client):
+    make_ngo('Mumbai', latitude=19.08, longitude=72.88)      # ~1150 km
+    assert nearby(client, radius_km=20000).get_json()['ngos'] == []
+    assert nearby(client, k=5).get_json()['ngos'] == []
+
+def test_radius_must_be_positive(client):
+    assert nearby(client, radius_km=0).status_code == 400
+    assert nearby(client, radius_km=-5).status_code == 400
+
+def map_data(client, **params):
+    query = '&'.join(f'{key}={value}' for key, value in params.items())
+    return client.get(f'/api/ngos/map?{query}')
+
+def clusters(client, **params):
+    return get_clusters(client, '&'.join(f'{key}={value}' for key, value in params.items()))
+
+def test_low_zoom_clusters_points_by_cell(client):
+    make_ngo('Noida', latitude=28.54, longitude=77.39)
+    make_ngo('Connaught Place', latitude=28.63, longitude=77.22)
+    make_ngo('Mumbai', latitude=19.08, longitude=72.88)
+    make_ngo('Barred', latitude=28.60, longitude=77.20, blacklisted=True)
+
+    cells = clusters(client, zoom=3)
+    assert sorted(cell['count'] for cell in cells) == [1, 2]
+    delhi = next(cell for cell in cells if cell['count'] == 2)
+    assert delhi['lat'] == pytest.approx((28.54 + 28.63) / 2)
+
+    cells = clusters(client, zoom=3, exclude_blacklisted='false')
+    assert sorted(cell['count'] for cell in cells) == [1, 3]
+
+def test_clusters_are_filtered_by_bbox(client):
+    make_ngo('Noida', latitude=28.54, longitude=77.39)
+    make_ngo('Mumbai', latitude=19.08, longitude=72.88)
+
+    cells = clusters(client, zoom=6, bbox='76,27,79,30')
+    assert [cell['count'] for cell in cells] == [1]
+    assert cells[0]['lat'] == pytest.approx(28.54)
+
+def test_cluster_build_does_not_run_in_the_request(client):
+    make_ngo('Noida', latitude=28.54, longitude=77.39)
+
+    response = map_data(client, zoom=3)
+    assert response.status_code == 503
+    map_clusters._building.join(5)
+    assert map_clusters.loaded
+
+def test_points_from_the_cluster_zoom_on_need_a_bbox(client):
+    make_ngo('Noida', latitude=28.54, longitude=77.39)
+    make_ngo('Mumbai', latitude=19.08, longitude=72.88)
+    zoom = Config.MAP_CLUSTER_MAX_ZOOM
+
+    assert map_data(client, zoom=zoom).status_code == 400
+
+    body = map_data(client, zoom=zoom, bbox='76,27,79,30').get_json()
+    assert body['clusters'] == []
+    assert [point['name'] for point in body['points']] == ['Noida']
+
+def test_invalid_bbox_is_rejected(client):
+    for bbox in ('nan,5,90,35', '60,5,inf,35', '60,-95,90,35', '-200,5,90,35', '90,5,60,35', '1,2,3'):
+        assert map_data(client, zoom=3, bbox=bbox).status_code == 400
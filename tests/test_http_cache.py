@@ -0,0 +1,85 @@
+from models import db, Category
+from conftest import make_ngo
+
+def test_categories_answer_304_until_a_category_changes(client):
+    first = client.get('/api/categories')
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+
+    cached = client.get('/api/categories', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+    db.session.add(Category(name='Sports', slug='sports'))
+    db.session.commit()
+
+    changed = client.get('/api/categories', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert 'Sports' in [category['name'] for category in changed.get_json()]
+
+def test_ngo_etag_follows_its_updated_at(client, admin_headers):
+    ngo_id = make_ngo('Goonj', city='Delhi').id
+    etag = client.get(f'/api/ngos/{ngo_id}').headers['ETag']
+    assert client.get(f'/api/ngos/{ngo_id}', headers={'If-None-Match': etag}).status_code == 304
+
+    # Another NGO changing leaves this one's tag alone
+    make_ngo('Smile Foundation')
+    assert client.get(f'/api/ngos/{ngo_id}', headers={'If-None-Match': etag}).status_code == 304
+
+    client.put(f'/api/ngos/{ngo_id}', json={'city': 'Mumbai'}, headers=admin_headers)
+    response = client.get(f'/api/ngos/{ngo_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['city'] == 'Mumbai'
+
+def test_if_modified_since(client):
+    first = client.get('/api/categories')
+    response = client.get('/api/categories', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert response.status_code == 304
+
+def test_versions_move_once_per_commit(app):
+    from http_cache import data_versions
+    (before, _), = data_versions('ngos')
+
+    ngo = make_ngo('Goonj')
+    ngo.city = 'Delhi'
+    db.session.flush()
+    ngo.state = 'Delhi'
+    db.session.flush()
+    db.session.commit()
+
+    (after, updated_at), = data_versions('ngos')
+    assert after == before + 2  # make_ngo() committed once already
+    assert updated_at is not None
+
+def test_rolled_back_changes_do_not_bump(app):
+    from http_cache import data_versions
+    (before, _), = data_versions('categories')
+    db.session.add(Category(name='Sports', slug='sports'))
+    db.session.flush()
+    db.session.rollback()
+    db.session.commit()
+    assert data_versions('categories')[0][0] == before
+
+def test_versions_are_summed_over_shards(app):
+    from http_cache import bump_data_versions, data_versions
+    from models import DataVersion
+    assert DataVersion.query.filter(DataVersion.scope.like('ngos#%')).count() > 0
+
+    for _ in range(20):
+        bump_data_versions(db.session.connection(), {'ngos'})
+    db.session.commit()
+    assert data_versions('ngos')[0][0] == 20
+
+def test_missing_shard_rows_fall_back_to_the_scope_row(app):
+    from http_cache import bump_data_versions, data_versions
+    from models import DataVersion
+
+    # A database seeded before versions were sharded
+    DataVersion.query.filter(DataVersion.scope.like('events#%')).delete(synchronize_session=False)
+    db.session.commit()
+    for _ in range(5):
+        bump_data_versions(db.session.connection(), {'events'})
+    db.session.commit()
+    assert data_versions('events')[0][0] == 5
+    assert db.session.get(DataVersion, 'events').version == 5
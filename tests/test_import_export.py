@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+from models import NGO
+from bulk_writer import SCRAPED_FIELDS
+
+RECORDS = [
+    {'name': 'Goonj', 'darpan_id': 'DL/2017/0123456', 'city': 'New Delhi', 'founded_year': 1999,
+     'latitude': 28.61, 'longitude': 77.21, 'categories': ['Health', 'Education']},
+    {'name': 'Nanhi Kali', 'registration_no': 'MH-42', 'mission': 'Girls\' education, "every" child',
+     'registration_date': '2001-04-01', 'categories': 'Education'},
+    {'name': 'Green Earth Trust', 'description': 'Trees,\nrivers and lakes'},
+]
+
+def ndjson(records):
+    return '\n'.join(json.dumps(record) for record in records).encode()
+
+def import_body(client, headers, body, import_format):
+    response = client.post(f'/api/ngos/import?format={import_format}', data=body, headers=headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+def snapshot():
+    return sorted(
+        (ngo.name, ngo.darpan_id, ngo.registration_no, ngo.city, ngo.mission, ngo.description,
+         ngo.founded_year, ngo.latitude, ngo.registration_date, sorted(c.name for c in ngo.categories))
+        for ngo in NGO.query.all()
+    )
+
+def test_import_reports_invalid_rows(client, admin_headers):
+    body = ndjson(RECORDS) + b'\n{"name": ""}\nnot json\n{"name": "X", "categories": ["Nope"]}'
+    report = import_body(client, admin_headers, body, 'ndjson')
+    assert (report['rows'], report['saved'], report['failed']) == (6, 3, 3)
+    assert [error['line'] for error in report['errors']] == [4, 5, 6]
+
+def test_csv_export_imports_back_unchanged(client, admin_headers):
+    import_body(client, admin_headers, ndjson(RECORDS), 'ndjson')
+    before = snapshot()
+
+    exported = client.get('/api/ngos/export?format=csv')
+    assert exported.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(exported.get_data(as_text=True))))
+    assert len(rows) == len(RECORDS)
+
+    report = import_body(client, admin_headers, exported.data, 'csv')
+    assert (report['saved'], report['failed']) == (3, 0)
+    assert snapshot() == before
+
+def test_ndjson_export_imports_back_unchanged(client, admin_headers):
+    import_body(client, admin_headers, ndjson(RECORDS), 'ndjson')
+    before = snapshot()
+
+    exported = client.get('/api/ngos/export?format=ndjson')
+    lines = exported.get_data(as_text=True).splitlines()
+    assert len(lines) == len(RECORDS)
+    assert json.loads(lines[0])['categories'][0]['name']
+
+    # Categories come out as objects, the import takes names
+    records = [dict(json.loads(line)) for line in lines]
+    for record in records:
+        record['categories'] = [category['name'] for category in record['categories']]
+    report = import_body(client, admin_headers, ndjson(records), 'ndjson')
+    assert (report['saved'], report['failed']) == (3, 0)
+    assert snapshot() == before
+
+def test_invalid_utf8_fails_only_its_row(client, admin_headers):
+    body = b'\n'.join([
+        '{"name": "Café Seva"}'.encode('utf-8'),
+        b'{"name": "Caf\xe9 Latin-1"}',
+        b'{"name": "Goonj"}',
+    ])
+    report = import_body(client, admin_headers, body, 'ndjson')
+    assert (report['saved'], report['failed']) == (2, 1)
+    assert report['errors'] == [{'line': 2, 'message': 'Invalid UTF-8'}]
+    assert sorted(ngo.name for ngo in NGO.query) == ['Café Seva', 'Goonj']
+
+    body = b'name,description\r\n"Pratham","Two\r\nlines"\r\n"Caf\xe9","Latin-1"\r\nSmile,ok\r\n'
+    report = import_body(client, admin_headers, body, 'csv')
+    assert (report['saved'], report['failed']) == (2, 1)
+    assert report['errors'] == [{'line': 4, 'message': 'Invalid UTF-8'}]
+    assert NGO.query.filter_by(name='Pratham').one().description == 'Two\r\nlines'
+
+def test_exports_only_carry_what_the_import_reads(client, admin_headers):
+    import_body(client, admin_headers, ndjson(RECORDS), 'ndjson')
+    header = client.get('/api/ngos/export?format=csv').get_data(as_text=True).splitlines()[0]
+    assert header.split(',') == list(SCRAPED_FIELDS) + ['categories']
+
+    record = json.loads(client.get('/api/ngos/export?format=ndjson').get_data(as_text=True).splitlines()[0])
+    assert set(record) == set(SCRAPED_FIELDS) | {'categories'}
+
+    # An explicit fieldset is still honored
+    header = client.get('/api/ngos/export?format=csv&fields=id,name').get_data(as_text=True).splitlines()[0]
+    assert header == 'id,name'
@@ -0,0 +1,70 @@
+import json
+from models import db
+from bulk_writer import NGOBatchWriter
+from index_sync import NGOIndexSync
+from autocomplete import autocomplete_index
+from geo import map_clusters
+from similarity import similar_ngos
+from conftest import make_ngo, get_clusters
+
+def write_elsewhere(*records):
+    """Bulk writes skip the routes that update this worker's indexes"""
+    writer = NGOBatchWriter(batch_size=100)
+    for record in records:
+        writer.add(dict(record), 'elsewhere')
+    writer.flush()
+
+def labels(client, prefix):
+    return [result['label'] for result in client.get(f'/api/autocomplete?q={prefix}').get_json()['results']]
+
+def cluster_count(client):
+    clusters = get_clusters(client, 'zoom=2')
+    return sum(cluster['count'] for cluster in clusters)
+
+def test_autocomplete_and_map_pick_up_writes_made_elsewhere(client):
+    make_ngo('Goonj', latitude=28.6, longitude=77.2)
+    assert labels(client, 'go') == ['Goonj']
+    assert cluster_count(client) == 1
+
+    write_elsewhere({'name': 'Goodwill Trust', 'darpan_id': 'DL/1', 'latitude': 19.0, 'longitude': 72.8})
+    assert labels(client, 'go') == ['Goodwill Trust', 'Goonj']
+    assert cluster_count(client) == 2
+
+    write_elsewhere({'name': 'Goodwill Trust', 'darpan_id': 'DL/1', 'latitude': None, 'longitude': None, 'city': 'Gorakhpur'})
+    assert labels(client, 'go') == ['Goodwill Trust', 'Goonj', 'Gorakhpur']
+
+def test_large_changes_rebuild_instead(app):
+    sync = NGOIndexSync([autocomplete_index, map_clusters], 0, 60, max_rows=2)
+    sync.sync()
+    autocomplete_index.rebuild()
+    map_clusters.rebuild()
+
+    write_elsewhere(*[{'name': f'NGO {i}', 'darpan_id': f'D/{i}'} for i in range(3)])
+    sync.sync()
+    assert not autocomplete_index.loaded and not map_clusters.loaded
+
+def test_nothing_is_read_while_the_version_stands_still(app):
+    make_ngo('Goonj')
+    sync = NGOIndexSync([autocomplete_index], 0, 60, 100)
+    sync.sync()
+    autocomplete_index.rebuild()
+
+    # A row stamped without a version bump is not looked for
+    db.session.execute(db.text("INSERT INTO ngos (name, active, blacklisted, updated_at) VALUES ('Gone', 1, 0, CURRENT_TIMESTAMP)"))
+    db.session.commit()
+    sync.sync()
+    assert [entry['label'] for entry in autocomplete_index.lookup('go')] == ['Goonj']
+
+def test_imports_reach_every_index(client, admin_headers):
+    clinic = make_ngo('Clinic Trust', mission='Free health camps, clinics and medicines for patients').id
+    make_ngo('Reading Room', mission='Schools, teachers and books for children')
+    similar_ngos.build()
+    assert labels(client, 'cl') == ['Clinic Trust']
+    assert client.get(f'/api/ngos/{clinic}/similar').get_json()['ngos'][0]['name'] == 'Reading Room'
+
+    body = json.dumps({'name': 'Clinic Helpers', 'mission': 'Mobile clinics and medicines for patients'}).encode()
+    response = client.post('/api/ngos/import?format=ndjson', data=body, headers=admin_headers)
+    assert response.get_json()['saved'] == 1
+
+    assert labels(client, 'cl') == ['Clinic Helpers', 'Clinic Trust']
+    assert client.get(f'/api/ngos/{clinic}/similar').get_json()['ngos'][0]['name'] == 'Clinic Helpers'
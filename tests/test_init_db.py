@@ -0,0 +1,35 @@
+from sqlalchemy import inspect
+from models import db, User, DataVersion
+from init_db import upgrade_database
+from http_cache import data_versions
+
+def test_upgrade_adds_what_older_databases_lack(app):
+    db.session.add(User(email='old@example.com', password_hash='x', name='Old'))
+    db.session.commit()
+
+    # The schema as it was before revocable tokens, background enrichment,
+    # data versions and fetch state
+    for statement in (
+        'DROP TABLE data_versions',
+        'DROP TABLE fetch_states',
+        'DROP INDEX ix_ngos_lat_lng',
+        'ALTER TABLE users DROP COLUMN token_version',
+        'ALTER TABLE ngos DROP COLUMN enrichment_status',
+        'ALTER TABLE ngos DROP COLUMN enrichment_error',
+    ):
+        db.session.execute(db.text(statement))
+    db.session.commit()
+
+    upgrade_database()
+    db.session.remove()
+
+    inspector = inspect(db.engine)
+    assert {'data_versions', 'fetch_states'} <= set(inspector.get_table_names())
+    assert {'enrichment_status', 'enrichment_error'} <= {c['name'] for c in inspector.get_columns('ngos')}
+    assert 'ix_ngos_lat_lng' in {index['name'] for index in inspector.get_indexes('ngos')}
+    assert User.query.filter_by(email='old@example.com').one().token_version == 0
+    assert DataVersion.query.count() > 4
+    assert data_versions('ngos')[0][0] == 0
+
+    # Running it again changes nothing
+    upgrade_database()
@@ -0,0 +1,33 @@
+import threading
+from llm_cache import LLMCache
+
+def test_entries_survive_a_new_worker(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    LLMCache(path, 10, 100).put('key', ['Health'])
+    cache = LLMCache(path, 10, 100)
+    assert cache.get('key') == ['Health'] and cache.get('missing') is None
+    assert (cache.disk_hits, cache.misses) == (1, 1)
+
+def test_disk_lookups_do_not_hold_the_lock(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path / 'cache.db'), 10, 100)
+    cache.put('cold', 'on disk')
+    cache._memory.clear()
+    cache.put('hot', 'in memory')
+
+    # One thread is stuck in a slow disk read...
+    reading, release = threading.Event(), threading.Event()
+    real_db = cache._db
+    def slow_db():
+        reading.set()
+        release.wait(5)
+        return real_db()
+    monkeypatch.setattr(cache, '_db', slow_db)
+    reader = threading.Thread(target=cache.get, args=('cold',))
+    reader.start()
+    assert reading.wait(5)
+
+    # ...while memory hits still go through
+    assert cache.get('hot') == 'in memory'
+    release.set()
+    reader.join()
+    assert cache.disk_hits == 1
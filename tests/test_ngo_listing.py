@@ -0,0 +1,139 @@
+import base64
+import json
+from sqlalchemy import event
+from models import db, OfficeBearer, BlacklistRecord
+from fragment_cache import fragment_cache
+from pagination import encode_cursor
+from conftest import make_ngo
+
+def add_ngos(count, start=0):
+    for i in range(start, start + count):
+        ngo = make_ngo(f'NGO {i:03d}', categories=('Education', 'Health'), transparency_score=i % 7)
+        db.session.add(OfficeBearer(ngo_id=ngo.id, name=f'Bearer {i}', designation='President'))
+    db.session.commit()
+
+def capture_queries(client, url):
+    """The response to `url` and the SQL statements it ran, with a cold fragment cache"""
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    fragment_cache.clear()
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert response.status_code == 200
+    return response, statements
+
+def count_queries(client, url):
+    return len(capture_queries(client, url)[1])
+
+def test_list_query_count_does_not_grow_with_page_size(client):
+    add_ngos(3)
+    small = count_queries(client, '/api/ngos?per_page=50')
+    add_ngos(30, start=3)
+    large = count_queries(client, '/api/ngos?per_page=50')
+
+    assert len(client.get('/api/ngos?per_page=50').get_json()['ngos']) == 33
+    assert small == large
+
+def walk(client, order, per_page=7):
+    seen = []
+    url = f'/api/ngos?cursor=&order={order}&per_page={per_page}'
+    while True:
+        body = client.get(url).get_json()
+        seen += [ngo['id'] for ngo in body['ngos']]
+        if body['next_cursor'] is None:
+            return seen
+        url = f"/api/ngos?cursor={body['next_cursor']}&order={order}&per_page={per_page}"
+
+def test_cursor_pagination_visits_every_ngo_once_in_order(client):
+    add_ngos(30)
+    listed = client.get('/api/ngos?per_page=100').get_json()['ngos']
+
+    by_name = walk(client, 'name')
+    assert by_name == [ngo['id'] for ngo in sorted(listed, key=lambda ngo: (ngo['name'], ngo['id']))]
+
+    by_score = walk(client, 'transparency')
+    assert by_score == [ngo['id'] for ngo in sorted(listed, key=lambda ngo: (-ngo['transparency_score'], -ngo['id']))]
+
+def test_cursor_for_another_order_is_rejected(client):
+    add_ngos(3)
+    response = client.get(f"/api/ngos?order=transparency&cursor={encode_cursor('name', ['NGO 000', 1])}")
+    assert response.status_code == 400
+
+def test_garbage_cursor_is_rejected(client):
+    cursor = base64.urlsafe_b64encode(json.dumps({'o': 'name'}).encode()).decode()
+    assert client.get(f'/api/ngos?cursor={cursor}').status_code == 400
+    assert client.get('/api/ngos?cursor=not-base64!').status_code == 400
+
+def test_cursor_values_must_match_their_columns(client):
+    add_ngos(3)
+    bad = [
+        ('name', [{'a': 1}, 'x']),
+        ('name', ['NGO 000', 'x']),
+        ('name', ['NGO 000', True]),
+        ('transparency', ['high', 1]),
+        ('transparency', [3, None]),
+    ]
+    for order, values in bad:
+        response = client.get(f'/api/ngos?order={order}&cursor={encode_cursor(order, values)}')
+        assert response.status_code == 400, values
+
+    assert client.get(f"/api/ngos?order=transparency&cursor={encode_cursor('transparency', [3.5, 2])}").status_code == 200
+
+FIELDSET_URLS = {
+    '/api/ngos?': 'ngos',
+    '/api/ngos/{id}?': None,
+    '/api/search?q=NGO&': 'results',
+    '/api/blacklisted?': 'ngos',
+}
+
+def fieldset_payloads(client, query):
+    """(NGO payload, SQL) of every fieldset-aware endpoint for one query string"""
+    listed = make_ngo('NGO Listed', categories=('Health',), mission='Listed mission')
+    barred = make_ngo('NGO Barred', categories=('Health',), mission='Barred mission', blacklisted=True)
+    for ngo in (listed, barred):
+        db.session.add(OfficeBearer(ngo_id=ngo.id, name='Bearer', designation='President'))
+    db.session.add(BlacklistRecord(ngo_id=barred.id, blacklisted_by='Ministry', reason='Fraud'))
+    db.session.commit()
+
+    for url, list_key in FIELDSET_URLS.items():
+        response, statements = capture_queries(client, url.format(id=listed.id) + query)
+        body = response.get_json()
+        ngos = body[list_key] if list_key else [body]
+        assert len(ngos) == 1, url
+        # The page count wraps the query in a subquery whose column list the planner drops
+        rows = [statement for statement in statements if not statement.startswith('SELECT count(*)')]
+        yield url, ngos[0], '\n'.join(rows)
+
+def test_fields_trim_the_payload_and_the_select(client):
+    for url, ngo, sql in fieldset_payloads(client, 'fields=id,name'):
+        assert set(ngo) == {'id', 'name'}, url
+        assert 'AS ngos_mission' not in sql and 'AS ngos_description' not in sql, url
+        for table in ('ngo_categories', 'office_bearers', 'blacklist_records'):
+            assert table not in sql, (url, table)
+
+def test_fields_can_name_relationships(client):
+    for url, ngo, sql in fieldset_payloads(client, 'fields=id,mission,office_bearers'):
+        assert set(ngo) == {'id', 'mission', 'office_bearers'}, url
+        assert [bearer['name'] for bearer in ngo['office_bearers']] == ['Bearer'], url
+        assert 'AS ngos_mission' in sql and 'AS ngos_description' not in sql, url
+        assert 'ngo_categories' not in sql and 'blacklist_records' not in sql, url
+
+def test_include_trims_the_relationships(client):
+    for url, ngo, sql in fieldset_payloads(client, 'include=categories'):
+        assert 'categories' in ngo and 'mission' in ngo, url
+        assert 'office_bearers' not in ngo and 'blacklist_info' not in ngo, url
+        assert 'ngo_categories' in sql, url
+        assert 'office_bearers' not in sql and 'blacklist_records' not in sql, url
+
+def test_unknown_fieldset_names_are_rejected(client):
+    ngo = make_ngo('NGO Barred', blacklisted=True)
+    for url in FIELDSET_URLS:
+        url = url.format(id=ngo.id)
+        assert client.get(url + 'fields=id,password').status_code == 400, url
+        assert client.get(url + 'include=volunteers').status_code == 400, url
+        assert client.get(url + 'include=name').status_code == 400, url
@@ -0,0 +1,26 @@
+import pytest
+from parsers import Parser, PARSERS, SYNTHETIC_SPEC, FIXTURE_SPEC, FIXTURE_PAGES, get_parser, read_pages, synthetic_pages
+
+PAGE = synthetic_pages(1, rows=3)[0]
+
+def test_parser_backends_must_implement_parse():
+    with pytest.raises(TypeError):
+        Parser()
+
+@pytest.mark.parametrize('name', PARSERS)
+@pytest.mark.parametrize('html', [PAGE, PAGE.decode('utf-8')], ids=['bytes', 'text'])
+def test_backends_read_pages_with_an_encoding_declaration(name, html):
+    records = get_parser(name).parse(html, SYNTHETIC_SPEC)
+    assert [record['name'] for record in records] == ['Seva Trust 0', 'Seva Trust 1', 'Seva Trust 2']
+    assert records[1]['website'] == 'https://ngo1.org'
+    assert 'café' in records[0]['mission']
+
+def test_backends_agree_on_the_fixture_pages():
+    pages = read_pages(FIXTURE_PAGES)
+    assert len(pages) == 3
+
+    for html in pages:
+        soup, lxml = (get_parser(name).parse(html, FIXTURE_SPEC) for name in ('bs4', 'lxml'))
+        assert len(soup) == 150 and soup == lxml
+        assert all(record['name'] and record['city'] for record in soup)
+        assert any(record['mission'] is None for record in soup)
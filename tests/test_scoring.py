@@ -0,0 +1,49 @@
+import itertools
+import random
+from sqlalchemy import select
+from models import db, NGO
+from scoring import SCORE_RULES, MAX_SCORE, score_ngo, score_expression, rescore_table
+
+COLUMNS = sorted({column for _, columns in SCORE_RULES for column in columns})
+
+def random_values(rng, i):
+    values = {}
+    for column in COLUMNS:
+        if column == 'verified':
+            values[column] = rng.choice([True, False, None])
+        elif column == 'registration_no':
+            # Unique, so it can only be empty once
+            values[column] = rng.choice([f'x{i}', None])
+        elif column != 'name':
+            values[column] = rng.choice(['x', '', None])
+    return values
+
+def test_python_and_sql_scores_agree(app):
+    rng = random.Random(42)
+    for i in range(200):
+        db.session.add(NGO(name=f'NGO {i}', **random_values(rng, i)))
+    db.session.commit()
+
+    sql_scores = dict(db.session.execute(select(NGO.__table__.c.id, score_expression())).all())
+    for ngo in NGO.query.all():
+        assert sql_scores[ngo.id] == score_ngo(ngo), ngo.id
+
+def test_every_rule_is_reachable(app):
+    full = {column: True if column == 'verified' else 'x' for column in COLUMNS}
+    ngo = NGO(**full)
+    assert score_ngo(ngo) == min(sum(points for points, _ in SCORE_RULES), MAX_SCORE)
+
+    for points, columns in SCORE_RULES:
+        for column in columns:
+            partial = NGO(**dict(full, **{column: None}))
+            assert score_ngo(partial) == score_ngo(ngo) - points
+
+def test_rescore_table_writes_only_changed_rows(app):
+    for name, email in itertools.product(['A', 'B'], ['a@x.org', None]):
+        db.session.add(NGO(name=name, email=email, transparency_score=0))
+    db.session.commit()
+
+    assert rescore_table(chunk=2) == (4, 4)
+    assert rescore_table(chunk=2) == (4, 0)
+    db.session.expire_all()
+    assert sorted(ngo.transparency_score for ngo in NGO.query.all()) == [5, 5, 15, 15]
@@ -0,0 +1,102 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from scrape_engine import FetchEngine, TokenBucket
+
+class StubServer:
+    """A local site that answers every GET after `delay` seconds, recording what it saw"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []  # (arrival time, path, headers)
+
+        stub = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests.append((time.monotonic(), self.path, dict(self.headers)))
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.in_flight -= 1
+                body = f'<html>{self.path}</html>'.encode()
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def url(self, path, host='127.0.0.1'):
+        return f'http://{host}:{self.port}{path}'
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def stub():
+    server = StubServer()
+    yield server
+    server.close()
+
+def engine(**kwargs):
+    options = dict(workers=8, max_in_flight=8, rate_per_host=1000.0, burst=1, timeout=5)
+    options.update(kwargs)
+    return FetchEngine(requests.Session(), **options)
+
+def test_fetch_all_returns_every_page(stub):
+    urls = [stub.url(f'/page/{i}') for i in range(20)]
+    results = dict(engine().fetch_all(url for url in urls))
+    assert set(results) == set(urls)
+    assert all(results[url].text == f'<html>/page/{i}</html>' for i, url in enumerate(urls))
+
+def test_one_host_is_rate_limited(stub):
+    rate = 20.0
+    list(engine(rate_per_host=rate).fetch_all([stub.url(f'/{i}') for i in range(6)]))
+    arrivals = sorted(arrival for arrival, _, _ in stub.requests)
+    gaps = [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+    assert min(gaps) >= 1 / rate * 0.8
+
+def test_hosts_are_limited_separately(stub):
+    # 127.0.0.1 and localhost are two hosts to the limiter, one server to us
+    urls = [stub.url(f'/{i}') for i in range(3)] + [stub.url(f'/{i}', host='localhost') for i in range(3)]
+    start = time.monotonic()
+    list(engine(rate_per_host=5.0).fetch_all(urls))
+    # Serially six requests would need 1 s; two hosts in parallel need 0.4 s
+    assert time.monotonic() - start < 0.9
+
+def test_requests_in_flight_are_bounded():
+    stub = StubServer(delay=0.1)
+    try:
+        list(engine(max_in_flight=3).fetch_all([stub.url(f'/{i}') for i in range(12)]))
+    finally:
+        stub.close()
+    assert stub.max_in_flight == 3
+
+def test_per_url_headers_and_errors(stub):
+    urls = [stub.url('/a'), 'http://127.0.0.1:1/unreachable']
+    results = dict(engine().fetch_all(urls, headers_for=lambda url: {'If-None-Match': f'"{url[-1]}"'}))
+
+    assert results[urls[0]].status_code == 200
+    assert stub.requests[0][2]['If-None-Match'] == '"a"'
+    assert isinstance(results[urls[1]], requests.ConnectionError)
+
+def test_token_bucket_allows_bursts():
+    bucket = TokenBucket(rate=10.0, burst=3)
+    start = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+    assert 0.07 <= elapsed < 0.3
@@ -0,0 +1,106 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from models import NGO
+from config import Config
+from scrapper import NGOScraper, run_scraper
+from scrape_jobs import checkpoint_path
+from conftest import make_ngo
+
+def giveindia_page(*names):
+    cards = ''.join(
+        f'<div class="ngo-card"><h3 class="ngo-name">{name}</h3><span class="ngo-city">Pune</span>'
+        f'<a class="ngo-website" href="https://{name.lower()}.org">Visit</a></div>'
+        for name in names
+    )
+    return f'<html><body>{cards}</body></html>'
+
+def darpan_page(*rows):
+    cells = ''.join(
+        f'<tr><td>{i}</td><td>{name}</td><td>{darpan_id}</td><td>{registration_no}</td><td>Delhi</td><td>Trust</td></tr>'
+        for i, (name, darpan_id, registration_no) in enumerate(rows, 1)
+    )
+    return f'<html><body><table id="example"><thead><tr><th>Name</th></tr></thead><tbody>{cells}</tbody></table></body></html>'
+
+@pytest.fixture
+def site(monkeypatch):
+    """Both sources served from one local server; tests fill in `pages`"""
+    pages = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = pages.get(self.path)
+            self.send_response(200 if body is not None else 404)
+            body = (body or '').encode()
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{httpd.server_address[1]}'
+    monkeypatch.setattr(Config, 'GIVEINDIA_LISTING_URL', base + '/giveindia/{page}')
+    monkeypatch.setattr(Config, 'GIVEINDIA_PAGES', 2)
+    monkeypatch.setattr(Config, 'NGO_DARPAN_LISTING_URL', base + '/darpan/{page}')
+    monkeypatch.setattr(Config, 'NGO_DARPAN_PAGES', 2)
+    monkeypatch.setattr(Config, 'SCRAPER_DELAY', 0.01)
+    yield pages
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_live_run_saves_both_sources(app, site):
+    site['/giveindia/1'] = giveindia_page('Goonj', 'Pratham')
+    site['/giveindia/2'] = giveindia_page('Smile')
+    site['/darpan/1'] = darpan_page(('Helpage India', 'DL/2010/1', 'REG-1'))
+    site['/darpan/2'] = darpan_page(('Nanhi Kali', 'MH/2011/2', 'REG-2'))
+
+    run_scraper(app, workers=1, live=True)
+    saved = {ngo.name: ngo for ngo in NGO.query}
+    assert set(saved) == {'Goonj', 'Pratham', 'Smile', 'Helpage India', 'Nanhi Kali'}
+    assert saved['Goonj'].website == 'https://goonj.org'
+    assert saved['Nanhi Kali'].darpan_id == 'MH/2011/2'
+    assert saved['Nanhi Kali'].source == 'NGO Darpan'
+
+def test_a_page_with_a_failed_record_is_not_checkpointed(app, site):
+    site['/darpan/1'] = darpan_page(('Helpage India', 'DL/2010/1', 'REG-1'))
+    # Same registration number as page 1 under another Darpan id
+    site['/darpan/2'] = darpan_page(('Nanhi Kali', 'MH/2011/2', 'REG-3'), ('Duplicate', 'MH/2011/3', 'REG-1'))
+
+    scraper = NGOScraper(app)
+    darpan = scraper.jobs()[1]
+    scraper.run_job(darpan, workers=1)
+    assert scraper.writer.failed == 1
+    assert os.path.exists(checkpoint_path(darpan))
+
+    # Page 2 was not marked done, so a resumed run fetches and parses it again
+    site['/darpan/2'] = darpan_page(('Nanhi Kali', 'MH/2011/2', 'REG-3'), ('Duplicate', 'MH/2011/3', 'REG-4'))
+    scraper = NGOScraper(app)
+    scraper.run_job(darpan, workers=1, resume=True)
+    assert scraper.writer.failed == 0 and scraper.not_modified == 0
+    assert not os.path.exists(checkpoint_path(darpan))
+    assert NGO.query.filter_by(registration_no='REG-4').one().name == 'Duplicate'
+
+def test_sample_sources_stay_the_default(app, site):
+    run_scraper(app, workers=1)
+    goonj = NGO.query.filter_by(name='Goonj').one()
+    assert goonj.source == 'NGO Darpan'
+    assert [category.name for category in NGO.query.filter_by(name='Pratham Education Foundation').one().categories] == ['Education']
+
+def test_live_records_are_categorized_locally(app, site):
+    for i in range(3):
+        make_ngo(f'Clinic {i}', ['Health'], mission='Free health camps, clinics and medicines for patients')
+        make_ngo(f'School {i}', ['Education'], mission='Schools, teachers and books for children to read')
+    site['/darpan/1'] = darpan_page(('Helpage India', 'DL/2010/1', 'REG-1'))
+    site['/giveindia/1'] = (
+        '<html><body><div class="ngo-card"><h3 class="ngo-name">Village Clinics</h3>'
+        '<p class="ngo-mission">Mobile clinics and medicines for patients</p></div></body></html>'
+    )
+
+    run_scraper(app, workers=1, live=True)
+    clinics = NGO.query.filter_by(name='Village Clinics').one()
+    assert [category.name for category in clinics.categories] == ['Health']
+    assert NGO.query.filter_by(name='Helpage India').one().categories == []
@@ -0,0 +1,74 @@
+import os
+from models import db, NGO
+from similarity import similar_ngos
+from config import Config
+from conftest import make_ngo
+
+def seed():
+    ids = {}
+    for name, mission in [
+        ('Clinic Trust', 'Free health camps, clinics and medicines for patients'),
+        ('Rural Health', 'Mobile clinics and medicines for rural patients'),
+        ('Reading Room', 'Schools, teachers and books for children'),
+    ]:
+        ids[name] = make_ngo(name, mission=mission).id
+    return ids
+
+def test_requests_never_build_the_index(client):
+    ids = seed()
+    response = client.get(f"/api/ngos/{ids['Clinic Trust']}/similar")
+    assert response.status_code == 503
+    assert 'message' in response.get_json()
+    assert not os.path.exists(os.path.join(similar_ngos.directory, 'index.json'))
+
+    similar_ngos.build()
+    response = client.get(f"/api/ngos/{ids['Clinic Trust']}/similar?limit=1")
+    assert response.status_code == 200
+    assert [ngo['name'] for ngo in response.get_json()['ngos']] == ['Rural Health']
+
+def test_rebuilds_keep_the_previous_generation(app):
+    seed()
+    generations = []
+    for _ in range(3):
+        similar_ngos.build()
+        generations.append(similar_ngos._read_meta()['generation'])
+
+    files = set(os.listdir(similar_ngos.directory))
+    for generation in generations[1:]:
+        assert {f'vectors-{generation}.npy', f'ids-{generation}.npy', f'model-{generation}.npz'} <= files
+    assert not any(generations[0] in name for name in files)
+
+def test_overlay_is_capped_and_flags_a_rebuild(app):
+    ids = seed()
+    similar_ngos.build()
+    similar_ngos._ensure()
+    similar_ngos.overlay_max = 2
+    try:
+        ngos = [db.session.get(NGO, ngo_id) for ngo_id in ids.values()]
+        for ngo in ngos[:2]:
+            similar_ngos.update_ngo(ngo)
+        assert not similar_ngos.rebuild_due
+
+        similar_ngos.update_ngo(ngos[2])
+        assert set(similar_ngos._overlay) == {ngos[0].id, ngos[1].id}
+        assert similar_ngos.rebuild_due
+
+        # Created after the build and past the cap: still searchable
+        extra = make_ngo('Health Camp', mission='Free health camps and medicines for patients')
+        assert similar_ngos.similar(extra, 1)[0][0] == ids['Clinic Trust']
+
+        similar_ngos.build()
+        similar_ngos._ensure()
+        assert not similar_ngos.rebuild_due and similar_ngos._overlay == {}
+    finally:
+        similar_ngos.overlay_max = Config.SIMILARITY_OVERLAY_MAX
+
+def test_large_catch_ups_flag_a_rebuild(client):
+    ids = seed()
+    similar_ngos.build()
+    response = client.get(f"/api/ngos/{ids['Clinic Trust']}/similar")
+    assert response.get_json()['index_behind'] is False
+
+    similar_ngos.mark_stale()
+    response = client.get(f"/api/ngos/{ids['Clinic Trust']}/similar")
+    assert response.get_json()['index_behind'] is True
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+from stats import stats_counters, naive_utc
+from conftest import make_ngo
+
+def test_naive_utc():
+    ist = timezone(timedelta(hours=5, minutes=30))
+    assert naive_utc(datetime(2026, 1, 1, 5, 30, tzinfo=ist)) == datetime(2026, 1, 1)
+    assert naive_utc(datetime(2026, 1, 1)) == datetime(2026, 1, 1)
+
+def test_events_with_an_offset_are_counted(client, admin_headers):
+    ngo_id = make_ngo('Goonj').id
+    stats_counters.reconcile()
+
+    future = (datetime.now(timezone.utc) + timedelta(days=3)).astimezone(timezone(timedelta(hours=5, minutes=30)))
+    past = datetime.now(timezone.utc) - timedelta(days=3)
+    for when in (future, past):
+        response = client.post('/api/events', json={
+            'ngo_id': ngo_id, 'title': 'Drive', 'event_date': when.isoformat()
+        }, headers=admin_headers)
+        assert response.status_code == 201
+
+    assert stats_counters.upcoming_events == 1
+
+def test_blacklisting_moves_volunteers_and_events(client, admin_headers):
+    ngo_id = make_ngo('Goonj').id
+    client.post('/api/volunteer-posts', json={'ngo_id': ngo_id, 'title': 'Teach'}, headers=admin_headers)
+    client.post('/api/events', json={
+        'ngo_id': ngo_id, 'title': 'Drive', 'event_date': (datetime.utcnow() + timedelta(days=3)).isoformat()
+    }, headers=admin_headers)
+    stats_counters.reconcile()
+    assert (stats_counters.total_volunteers, stats_counters.upcoming_events) == (1, 1)
+
+    client.post(f'/api/ngos/{ngo_id}/blacklist', json={'reason': 'Fraud'}, headers=admin_headers)
+    assert (stats_counters.total_volunteers, stats_counters.upcoming_events) == (0, 0)
+    assert stats_counters.blacklisted_ngos == 1
+
+    client.post(f'/api/ngos/{ngo_id}/unblacklist', headers=admin_headers)
+    assert (stats_counters.total_volunteers, stats_counters.upcoming_events) == (1, 1)
+
+def test_writes_made_elsewhere_are_reconciled_before_answering(client):
+    make_ngo('Goonj')
+    assert client.get('/api/stats').get_json()['total_ngos'] == 1
+
+    # Another worker's write: the version moves, this worker's counters do not
+    make_ngo('Pratham')
+    body = client.get('/api/stats').get_json()
+    assert body['total_ngos'] == 2